@@ -11,6 +11,7 @@ from core.database import get_session
 from core.depends import depends as deps
 from app.tokens import schemas as schemas_t
 from .. import services
+from app.offers.services import offers_cache
 
 
 logger = logging.getLogger("uvicorn")
@@ -72,9 +73,12 @@ async def create_upload_files_offer(
     token_data, user_context = current_session
     user = await user_context.get_current_active_user(db_session, token_data)
 
-    return await services.offer_attachment_manager.create_new_attachment(
+    attachment = await services.offer_attachment_manager.create_new_attachment(
         db_session, files, user.id, offer_id
     )
+    await offers_cache.invalidate_offers(offer_id)
+
+    return attachment
 
 
 @router.delete("/deletefiles/offer")
@@ -88,9 +92,12 @@ async def delete_offer_attachment(
     token_data, user_context = current_session
     user = await user_context.get_current_active_user(db_session, token_data)
 
-    return await services.offer_attachment_manager.delete_attachment_by_offer_id(
+    deleted_attachment = await services.offer_attachment_manager.delete_attachment_by_offer_id(
         db_session, user.id, offer_id
     )
+    await offers_cache.invalidate_offers(offer_id)
+
+    return deleted_attachment
 
 
 @router.post("/uploadfiles/user")
@@ -107,6 +114,7 @@ async def create_upload_files_user(
     attachment_json = await services.user_attachment_manager.create_new_attachment(
         db_session, file, user.id
     )
+    await offers_cache.invalidate_user_offers(db_session, user.id)
     
     return {"user_files": await services.user_attachment_manager.get_only_files(db_session, user.id)}
 
@@ -121,9 +129,12 @@ async def delete_user_attachment(
     token_data, user_context = current_session
     user = await user_context.get_current_active_user(db_session, token_data)
 
-    return await services.user_attachment_manager.delete_attachment_by_user_id(
+    deleted_attachment = await services.user_attachment_manager.delete_attachment_by_user_id(
         db_session, user.id
     )
+    await offers_cache.invalidate_user_offers(db_session, user.id)
+
+    return deleted_attachment
 
 
 @router.post("/uploadfiles/message")
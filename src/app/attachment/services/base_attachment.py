@@ -130,9 +130,37 @@ class BaseAttachmentManager(FileManager):
         result = (
             await db_session.execute(stmt)
         ).scalar_one_or_none()
-        
+
         return result
-    
+
+    async def get_only_files_many(
+        self, db_session: AsyncSession, model: Any, entity_id_column: Any, entity_ids: list[int]
+    ) -> dict[int, list[str]]:
+        """
+        Пакетный вариант get_only_files: один запрос на весь список сущностей
+        Возвращает {entity_id: [file_url, ...]}, сущности без файлов в словарь не попадают
+        """
+        _result: dict[int, list[str]] = {}
+
+        if not entity_ids:
+            return _result
+
+        stmt = (
+            select(entity_id_column, models.File.hash, models.File.attachment_id)
+            .where(model.id == models.File.attachment_id)
+            .where(entity_id_column.in_(set(entity_ids)))
+            .order_by(models.File.id)
+        )
+
+        rows = (await db_session.execute(stmt)).all()
+
+        for entity_id, file_hash, attachment_id in rows:
+            _result.setdefault(entity_id, []).append(
+                config.BASE_FILE_URL.format(file_hash=file_hash, attachment_id=attachment_id)
+            )
+
+        return _result
+
     async def create_new_attachment(
         self, db_session: AsyncSession, attachment_id: int, files: list[UploadFile]
     ):
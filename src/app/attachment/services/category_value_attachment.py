@@ -62,4 +62,8 @@ class CategoryValueAttachmentManager(BaseAttachmentManager):
         
         return _result
 
+    async def get_only_files_many(self, db_session: AsyncSession, category_value_ids: list[int]):
+        model = models.CategoryValueAttachemnt
+        return await super().get_only_files_many(db_session, model, model.category_value_id, category_value_ids)
+
 category_value_attachment_manager = CategoryValueAttachmentManager()
@@ -1,4 +1,5 @@
-from typing import Any
+import logging
+from typing import Any, Awaitable, Callable
 from fastapi import UploadFile
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
@@ -8,7 +9,20 @@ from .base_attachment import BaseAttachmentManager
 from .. import models
 
 
+logger = logging.getLogger("uvicorn")
+
+
 class MessageAttachmentManager(BaseAttachmentManager):
+    # async callback(db_session, message_id, author_id) - вызываются после commit файлов сообщения,
+    #  на уровне класса, т.к. менеджер не хранит состояние экземпляра
+    files_attached_callbacks: list[Callable[[AsyncSession, int, int], Awaitable[None]]] = []
+
+    @classmethod
+    def add_files_attached_callback(
+        cls, callback: Callable[[AsyncSession, int, int], Awaitable[None]]
+    ) -> None:
+        cls.files_attached_callbacks.append(callback)
+
     async def create_new_attachment(
         self, db_session: AsyncSession, files: list[UploadFile], user_id: int, message_id: int
     ):
@@ -18,6 +32,13 @@ class MessageAttachmentManager(BaseAttachmentManager):
 
         await super().create_new_attachment(db_session, attachment.id, files)
 
+        for callback in self.files_attached_callbacks:
+            try:
+                await callback(db_session, message_id, user_id)
+            except Exception as e:
+                # Файлы уже сохранены, клиент получит их со следующей загрузкой истории
+                logger.warning(f"Message {message_id} files attached callback failed: {e}")
+
         return attachment.to_dict()
     
     async def get_attachment(self, db_session: AsyncSession, message_id: int):
@@ -50,4 +71,8 @@ class MessageAttachmentManager(BaseAttachmentManager):
         
         return _result
 
+    async def get_only_files_many(self, db_session: AsyncSession, message_ids: list[int]):
+        model = models.MessageAttachment
+        return await super().get_only_files_many(db_session, model, model.message_id, message_ids)
+
 message_attachment_manager = MessageAttachmentManager()
\ No newline at end of file
@@ -62,6 +62,10 @@ class OfferAttachmentManager(BaseAttachmentManager):
         
         return _result
 
+    async def get_only_files_many(self, db_session: AsyncSession, offer_ids: list[int]):
+        model = models.OfferAttachment
+        return await super().get_only_files_many(db_session, model, model.offer_id, offer_ids)
+
 
 
 offer_attachment_manager = OfferAttachmentManager()
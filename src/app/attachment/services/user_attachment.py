@@ -62,5 +62,9 @@ class UserAttachmentManager(BaseAttachmentManager):
         
         return _result
 
+    async def get_only_files_many(self, db_session: AsyncSession, user_ids: list[int]):
+        model = models.UserAttachment
+        return await super().get_only_files_many(db_session, model, model.user_id, user_ids)
+
 
 user_attachment_manager = UserAttachmentManager()
@@ -25,12 +25,16 @@ async def get_by_id(
     if need_subvalues:
         category_dict = category.to_dict()
         category_dict["values"] = []
+        category_values = category.values if category.values else []
+        files = await category_value_attachment_manager.get_only_files_many(
+            db_session, [category_value.id for category_value in category_values]
+        )
         
-        for category_value in category.values if category.values else []:
+        for category_value in category_values:
             subvalues = await get_associated_by_id(db_session, [category_value.id])
             
             category_value_dict = category_value.to_dict()
-            category_value_dict["files"] = await category_value_attachment_manager.get_only_files(db_session=db_session, category_value_id=category_value.id)
+            category_value_dict["files"] = files.get(category_value.id)
             category_value_dict["subvalues"] = subvalues
             
             category_dict["values"].append(category_value_dict)
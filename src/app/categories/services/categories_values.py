@@ -33,8 +33,11 @@ async def get_many_by_ids(
         for option in options:
             stmt = stmt.options(option[0](option[1]))
     values = (await db_session.execute(stmt)).scalars().all()
-    
-    return [{**v.to_dict(lazy_load_v), "files": await category_value_attachment_manager.get_only_files(db_session, v.id)} for v in values]
+    files = await category_value_attachment_manager.get_only_files_many(
+        db_session, [v.id for v in values]
+    )
+
+    return [{**v.to_dict(lazy_load_v), "files": files.get(v.id)} for v in values]
 
 
 
@@ -61,8 +64,12 @@ async def get_associated_by_id(
         .distinct()
         .join(stmt, models.CategoryValue.id == stmt.c.id)
     )
-    
-    return [{**m.to_dict(), "files": await category_value_attachment_manager.get_only_files(db_session, m.id)} for m in result.scalars().all()]
+    values = result.scalars().all()
+    files = await category_value_attachment_manager.get_only_files_many(
+        db_session, [m.id for m in values]
+    )
+
+    return [{**m.to_dict(), "files": files.get(m.id)} for m in values]
 
 
 async def get_by_carcass_id(
@@ -165,10 +172,44 @@ async def get_all(db_session: AsyncSession):
     return (await db_session.execute(stmt)).all()
 
 
-#не передавать одинаковые id. Если id на одной ветке, но между ними есть "пробой" вернет False
+async def get_branch_info_by_ids(
+    db_session: AsyncSession, ids: list[int]
+) -> dict[int, Any]:
+    """
+    {id: (id, carcass_id, next_carcass_id, is_offer_with_delivery)} одним запросом,
+     чтобы проверять сразу много наборов через check_one_branch
+    """
+    stmt = select(
+        models.CategoryValue.id,
+        models.CategoryValue.carcass_id,
+        models.CategoryValue.next_carcass_id,
+        models.CategoryValue.is_offer_with_delivery,
+    ).where(models.CategoryValue.id.in_(set(ids)))
+    return {row[0]: row for row in (await db_session.execute(stmt)).all()}
+
+
+def check_one_branch(values: dict[int, Any], ids: list[int]) -> bool:
+    """
+    values - результат get_branch_info_by_ids, порядок ids не важен
+    """
+    if not ids or len(set(ids)) != len(ids) or any(id not in values for id in ids):
+        return False
+
+    by_carcass_id = {values[id][1]: values[id] for id in ids}
+    next_carcass_ids = {values[id][2] for id in ids}
+    heads = [value for value in by_carcass_id.values() if value[1] not in next_carcass_ids]
+    if len(by_carcass_id) != len(ids) or len(heads) != 1:
+        return False
+
+    value, chain_length = heads[0], 1
+    while value[2] in by_carcass_id and chain_length < len(ids):
+        value = by_carcass_id[value[2]]
+        chain_length += 1
+
+    return chain_length == len(ids)
+
+
+# Если id на одной ветке, но между ними есть "пробой" вернет False
 async def is_on_one_branch(db_session: AsyncSession, ids: list[models.category_values.CategoryValue.id]) -> bool:
-    categories = await get_many_by_ids(db_session=db_session, ids=ids)
-    for i in range(0, len(ids) - 1):
-        if categories[i]["next_carcass_id"] != categories[i + 1]["carcass_id"]:
-            return False
-    return True
+    values = await get_branch_info_by_ids(db_session, ids)
+    return check_one_branch(values, ids)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Integer, Boolean, ForeignKey, UniqueConstraint, VARCHAR
+from sqlalchemy import Column, String, Integer, Boolean, ForeignKey, UniqueConstraint, Index, VARCHAR
 from sqlalchemy.orm import relationship, Mapped
 
 from core.database import Base
@@ -24,6 +24,10 @@ class ChatMember(Base):
 
 class Message(Base):
     __tablename__ = 'message'
+    __table_args__ = (
+        # История чата и последнее сообщение: (участник, created_at, id)
+        Index("ix_message_chat_member_id_created_at_id", "chat_member_id", "created_at", "id"),
+    )
 
     id = Column(Integer, primary_key=True)
     chat_member_id = Column(Integer, ForeignKey('chat_member.id', ondelete="CASCADE"), nullable=False)
@@ -32,7 +36,10 @@ class Message(Base):
 
 class SystemMessage(Base):
     __tablename__ = 'system_message'
-    
+    __table_args__ = (
+        Index("ix_system_message_chat_id_created_at_id", "chat_id", "created_at", "id"),
+    )
+
     id = Column(Integer, primary_key=True)
     chat_id = Column(Integer, ForeignKey("chat.id", ondelete="CASCADE"), nullable=False)
     content = Column(VARCHAR(4096), nullable=False)
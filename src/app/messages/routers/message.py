@@ -8,6 +8,7 @@ from core.depends import depends as deps
 from core.database import get_session
 from .. import models, schemas, services
 from app.tokens import schemas as schemas_t
+from app.attachment.services import message_attachment_manager
 
 
 logger = logging.getLogger("uvicorn")
@@ -15,6 +16,9 @@ router = APIRouter()
 ws_router = APIRouter()
 base_session = deps.UserSession()
 base_connection_manager = services.ChatConnectionManager()
+message_attachment_manager.add_files_attached_callback(
+    base_connection_manager.files_attached_callback
+)
 
 
 @router.get("/my/getdialog")
@@ -89,20 +93,22 @@ async def create_dialog_by_user_id(
 
 @router.get("/my/getall")
 async def get_all_dialogs_without_offset_limit(
+    offset: int = 0,
+    limit: int | None = None,
     db_session: AsyncSession = Depends(get_session),
     current_session: tuple[schemas_t.JwtPayload, deps.UserSession] = Depends(
         base_session
     ),
 ) -> JSONResponse:
     """
-    Получаем все чаты текущего пользователя
+    Получаем чаты текущего пользователя, отсортированные по последнему сообщению<br>
+    Без limit - все чаты
     """
     token_data, user_context = current_session
     user = await user_context.get_current_active_user(db_session, token_data)
 
-
     dialogs_data = await services.message_manager.get_all_user_dialogs_ids_by_user_id_with_last_message_with_sort(
-        db_session, user.id
+        db_session, user.id, offset, limit
     )
 
     if not dialogs_data:
@@ -116,16 +122,26 @@ async def get_all_messages_with_offset_limit(
     chat_id: int,
     offset: int = 0,
     limit: int = 10,
+    before_id: int = None,
+    after_id: int = None,
     db_session: AsyncSession = Depends(get_session),
     current_session: tuple[schemas_t.JwtPayload, deps.UserSession] = Depends(
         base_session
     ),
 ):
+    """
+    Сообщения от старых к новым, у системных сообщений id отрицательный<br>
+    before_id - limit сообщений перед сообщением с этим id (прокрутка вверх),
+     after_id - limit сообщений после него, offset с курсорами не используется
+    """
     token_data, user_context = current_session
     user = await user_context.get_current_active_user(db_session, token_data)
 
+    if before_id is not None and after_id is not None:
+        raise HTTPException(400, "Only one of before_id and after_id can be used")
+
     messages = await services.message_manager.get_messages_by_chat_id_user_id(
-        db_session, chat_id, user.id, offset, limit
+        db_session, chat_id, user.id, offset, limit, before_id, after_id
     )
 
     if not messages:
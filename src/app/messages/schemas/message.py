@@ -1,3 +1,5 @@
+from typing import Literal
+
 from pydantic import field_validator, Field, BaseModel
 from fastapi import UploadFile
 
@@ -39,6 +41,8 @@ class MessageCreateTemp(BaseModel):
 
 
 class MessageCreate(BaseModel):
+    # Устарело и игнорируется: сообщение отправляется сразу,
+    #  о загруженных позже файлах приходит событие files_attached
     need_wait: int = 0
     chat_id: int
     content: str = Field(min_length=0, max_length=4096)
@@ -73,3 +77,14 @@ class MessageBroadcast(BaseModel):
     content: str
     files: list[str] | None = None
     created_at: int
+
+
+class MessageFilesBroadcast(BaseModel):
+    """
+    Файлы загружены к уже отправленному сообщению id
+    """
+    event: Literal["files_attached"] = "files_attached"
+    id: int
+    chat_id: int
+    user_id: int
+    files: list[str] | None = None
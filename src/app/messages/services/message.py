@@ -1,29 +1,37 @@
-import time
 import json
-import asyncio
-from typing import cast, Any, NoReturn, Sequence
+import logging
+from functools import partial
+from typing import Any, NoReturn, Sequence
 from json.decoder import JSONDecodeError
 from dataclasses import dataclass
 
 from pydantic import ValidationError
-from fastapi import Depends, WebSocket, WebSocketException, UploadFile, status
+from fastapi import Depends, HTTPException, WebSocket, WebSocketException, UploadFile, status
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, union_all, desc, or_, and_, text, func
+from sqlalchemy import select, union_all, desc, or_, and_, text, func, literal, case, true, tuple_
+from sqlalchemy.dialects.postgresql import aggregate_order_by, JSONB
 from sqlalchemy.orm import aliased
 import sqlalchemy
+from redis.exceptions import RedisError
 
 from core import depends as deps
 from core.database import context_get_session
-from core.redis import get_redis_client, get_redis_pipeline
+from core.redis import get_redis_client, get_redis_pipeline, redis_broker
+from core.settings import BASE_FILE_URL
+from core.ws import WsSender
 from app.messages import models as models_m
 from app.messages import schemas as schemas_m
 from app.messages import services as services_m
 from app.users.routers.users_notifications import user_notification_manager
 from app.users import models as models_u, services as services_u
+from app.attachment import models as models_a
 from app.attachment.services import message_attachment_manager, user_attachment_manager
 from app.tokens import schemas as schemas_t
 
 
+logger = logging.getLogger("uvicorn")
+
+
 class BaseChatManager:
     def __init__(self) -> None:
         pass
@@ -62,62 +70,6 @@ class BaseChatManager:
 
         return chat
 
-    async def get_all_user_dialogs_ids_by_user_id_with_sort(
-        self, db_session: AsyncSession, user_id: int
-    ):
-        """
-        Непубличный метод для подгрузки диалогов пользователя с сортировкой
-        """
-        FirstChatMember = aliased(models_m.ChatMember)
-        SecondChatMember = aliased(models_m.ChatMember)
-
-        stmt = (
-            select(
-                FirstChatMember.chat_id,
-                models_u.User.username,
-                models_u.User.id,
-                func.count(models_m.Message.id).label("message_count"),
-            )
-            .join(SecondChatMember, SecondChatMember.chat_id == FirstChatMember.chat_id)
-            .join(models_u.User, models_u.User.id == SecondChatMember.user_id)
-            .join(models_m.Chat, models_m.Chat.id == FirstChatMember.chat_id)
-            .join(
-                models_m.Message,
-                and_(
-                    models_m.Message.chat_member_id == FirstChatMember.id,
-                ),
-                isouter=True,
-            )
-            .where(
-                and_(
-                    models_m.Chat.is_dialog == True,
-                    FirstChatMember.user_id == user_id,
-                    SecondChatMember.user_id != user_id,
-                )
-            )
-            .group_by(
-                FirstChatMember.chat_id,
-                models_u.User.username,
-                models_u.User.id,
-            )
-        )
-
-        rows = (await db_session.execute(stmt)).fetchall()
-        dialogs_data = []
-        for row in rows:
-            dialog_data = {
-                "chat_id": row[0],
-                "message_count": row[3],
-                "interlocutor_id": row[2],
-                "interlocutor_username": row[1],
-                "interlocutor_files": await user_attachment_manager.get_only_files(
-                    db_session, row[2]
-                ),
-            }
-            dialogs_data.append(dialog_data)
-
-        return dialogs_data
-
     async def get_dialog_id_by_user_id(
         self, db_session: AsyncSession, user_id: int, interlocutor_id: int
     ):
@@ -209,7 +161,7 @@ class BaseChatMemberManager(BaseChatManager):
             return member
 
     async def create_new_chat_with_members(
-        self, db_session: AsyncSession, *users_ids: int
+        self, db_session: AsyncSession, *users_ids: int, need_commit: bool = True
     ):
         chat = await self.create_chat(db_session, need_commit=False)
         for user_id in users_ids:
@@ -217,18 +169,25 @@ class BaseChatMemberManager(BaseChatManager):
                 db_session, user_id, chat.id, need_commit=False
             )
 
-        await db_session.commit()
+        if need_commit:
+            await db_session.commit()
         return chat.id
 
     async def create_dialog(
-        self, db_session: AsyncSession, user_id: int, interlocutor_id: int
+        self,
+        db_session: AsyncSession,
+        user_id: int,
+        interlocutor_id: int,
+        need_commit: bool = True,
     ):
         interlocutor = await services_u.get_by_id(db_session, id=interlocutor_id)
         if not interlocutor:
             return None
 
         chat_data = {
-            "chat_id": await self.create_new_chat_with_members(db_session, user_id, interlocutor_id),
+            "chat_id": await self.create_new_chat_with_members(
+                db_session, user_id, interlocutor_id, need_commit=need_commit
+            ),
             "interlocutor_id": interlocutor_id,
             "interlocutor_username": interlocutor.username,
             "interlocutor_files": await user_attachment_manager.get_only_files(db_session, interlocutor_id)
@@ -266,12 +225,10 @@ class BaseMessageManager(BaseChatMemberManager):
         db_session: AsyncSession,
         chat_member_id: int,
         content: str,
-        need_wait: int = 0,
     ) -> models_m.Message:
         new_message = models_m.Message(
             chat_member_id=chat_member_id,
             content=content,
-            created_at=int(time.time()) + need_wait,
         )
         db_session.add(new_message)
         await db_session.commit()
@@ -303,13 +260,53 @@ class BaseMessageManager(BaseChatMemberManager):
             await db_session.commit()
             return message
     
-    async def create_system_message(self, db_session: AsyncSession, message: schemas_m.SystemMessageCreate):
+    async def create_system_message(
+        self,
+        db_session: AsyncSession,
+        message: schemas_m.SystemMessageCreate,
+        need_commit: bool = True,
+    ):
         new_message = models_m.SystemMessage(chat_id=message.chat_id, content=message.content)
         db_session.add(new_message)
-        await db_session.commit()
+
+        if need_commit:
+            await db_session.commit()
+        else:
+            await db_session.flush()
+
         await db_session.refresh(new_message)
         return new_message
 
+    async def __get_message_cursor(
+        self, db_session: AsyncSession, chat_id: int, message_id: int
+    ) -> tuple[int, int, int]:
+        """
+        Позиция сообщения (created_at, тип, id) для курсора, id < 0 - системное сообщение
+        Тип: 0 - системное, 1 - обычное (в одну секунду системные идут раньше)
+        """
+        if message_id > 0:
+            stmt = (
+                select(models_m.Message.created_at)
+                .join(
+                    models_m.ChatMember,
+                    models_m.Message.chat_member_id == models_m.ChatMember.id,
+                )
+                .where(models_m.Message.id == message_id)
+                .where(models_m.ChatMember.chat_id == chat_id)
+            )
+        else:
+            stmt = (
+                select(models_m.SystemMessage.created_at)
+                .where(models_m.SystemMessage.id == -message_id)
+                .where(models_m.SystemMessage.chat_id == chat_id)
+            )
+
+        created_at = (await db_session.execute(stmt)).scalar_one_or_none()
+        if created_at is None:
+            raise HTTPException(400, "Invalid cursor")
+
+        return created_at, int(message_id > 0), abs(message_id)
+
     async def get_messages_by_chat_id_user_id(
         self,
         db_session: AsyncSession,
@@ -317,7 +314,16 @@ class BaseMessageManager(BaseChatMemberManager):
         user_id: int,
         offset: int,
         limit: int,
+        before_id: int | None = None,
+        after_id: int | None = None,
     ) -> Sequence[models_m.Message]:
+        """
+        Сообщения чата от старых к новым, порядок (created_at, тип, id): в одну секунду
+         сначала системные, затем обычные.
+        id системных сообщений в ответе отрицательные, чтобы id были уникальны в пределах чата
+        before_id - limit сообщений перед данным, after_id - limit сообщений после данного,
+         без курсоров - последние сообщения со смещением offset
+        """
         user_in_chat_stmt = select(models_m.ChatMember).where(
             and_(
                 models_m.ChatMember.chat_id == chat_id,
@@ -328,40 +334,102 @@ class BaseMessageManager(BaseChatMemberManager):
         if not user_in_chat.scalar_one_or_none():
             return None
 
-        messages_stmt = (
-            select(models_m.Message.id, models_m.Message.content, models_m.Message.created_at, models_m.ChatMember.user_id)
+        cursor_id = after_id if after_id is not None else before_id
+        cursor = None
+        if cursor_id is not None:
+            cursor = await self.__get_message_cursor(db_session, chat_id, cursor_id)
+            offset = 0
+
+        is_forward = after_id is not None
+        order = (lambda column: column) if is_forward else desc
+
+        def page(
+            stmt: sqlalchemy.Select, created_at: Any, id: Any, kind: int
+        ) -> sqlalchemy.Select:
+            """
+            Каждая ветка union ограничена offset + limit и идёт по своему индексу
+             (..., created_at, id), тип ветки сравнивается с типом курсора здесь
+            """
+            if cursor:
+                cursor_created_at, cursor_kind, cursor_id = cursor
+                if kind == cursor_kind:
+                    row_key = tuple_(created_at, id)
+                    stmt = stmt.where(
+                        row_key > (cursor_created_at, cursor_id)
+                        if is_forward
+                        else row_key < (cursor_created_at, cursor_id)
+                    )
+                elif kind < cursor_kind:
+                    stmt = stmt.where(
+                        created_at > cursor_created_at
+                        if is_forward
+                        else created_at <= cursor_created_at
+                    )
+                else:
+                    stmt = stmt.where(
+                        created_at >= cursor_created_at
+                        if is_forward
+                        else created_at < cursor_created_at
+                    )
+            return stmt.order_by(order(created_at), order(id)).limit(offset + limit)
+
+        messages_stmt = page(
+            select(
+                models_m.Message.id.label("id"),
+                models_m.Message.content.label("content"),
+                models_m.Message.created_at.label("created_at"),
+                models_m.ChatMember.user_id.label("user_id"),
+                literal(1).label("kind"),
+                models_m.Message.id.label("sort_id"),
+            )
             .join(
                 models_m.ChatMember,
                 models_m.Message.chat_member_id == models_m.ChatMember.id,
             )
-            .where(models_m.ChatMember.chat_id == chat_id)
+            .where(models_m.ChatMember.chat_id == chat_id),
+            models_m.Message.created_at,
+            models_m.Message.id,
+            1,
         )
-        system_message_stmt = (
-            cast(sqlalchemy.Select, select(models_m.SystemMessage.id, models_m.SystemMessage.content, models_m.SystemMessage.created_at, -1))
-            .where(models_m.SystemMessage.chat_id == chat_id)
+        system_message_stmt = page(
+            select(
+                -models_m.SystemMessage.id,
+                models_m.SystemMessage.content,
+                models_m.SystemMessage.created_at,
+                literal(-1),
+                literal(0),
+                models_m.SystemMessage.id,
+            )
+            .where(models_m.SystemMessage.chat_id == chat_id),
+            models_m.SystemMessage.created_at,
+            models_m.SystemMessage.id,
+            0,
         )
         all_messages_stmt = (
             union_all(messages_stmt, system_message_stmt)
-            .order_by(desc(text("created_at")))
+            .order_by(order(text("created_at")), order(text("kind")), order(text("sort_id")))
             .offset(offset)
             .limit(limit)
         )
         
-        rows = await db_session.execute(all_messages_stmt)
+        rows = (await db_session.execute(all_messages_stmt)).all()
+        # У системных сообщений (user_id = -1) вложений нет
+        files = await message_attachment_manager.get_only_files_many(
+            db_session, [row.id for row in rows if row.user_id != -1]
+        )
         
         result = []
-        for id, content, created_at, user_id_ in rows:
+        for id, content, created_at, user_id_, _, _ in rows:
             data = {
+                "id": id,
                 "content": content,
                 "created_at": created_at,
                 "user_id": user_id_,
-                "files":  await message_attachment_manager.get_only_files(
-                    db_session, id
-                ),
+                "files": files.get(id) if user_id_ != -1 else None,
             }
             result.append(data)
         
-        return result[::-1]
+        return result if is_forward else result[::-1]
     
     async def create_message_by_sender_id(
         self, db_session: AsyncSession, sender_id: int, message: schemas_m.MessageCreate
@@ -373,22 +441,155 @@ class BaseMessageManager(BaseChatMemberManager):
         if not chat_member_id:
             return None
         
-        return await self.create_message(
-            db_session, chat_member_id, message.content, message.need_wait
-        )
+        return await self.create_message(db_session, chat_member_id, message.content)
     
+    def __render_files(self, files: list | None) -> list[str] | None:
+        """
+        [[hash, attachment_id], ...] в ссылки, None если файлов нет (как get_only_files)
+        """
+        if not files:
+            return None
+
+        return [
+            BASE_FILE_URL.format(file_hash=file_hash, attachment_id=attachment_id)
+            for file_hash, attachment_id in files
+        ]
+
+    def __files_subquery(self, table: sqlalchemy.Table, entity_id_column: str, entity_id: Any):
+        """
+        Файлы сущности для подзапроса, join сразу с таблицей наследника без base_attachment
+        """
+        return (
+            select(
+                func.jsonb_agg(
+                    aggregate_order_by(
+                        func.jsonb_build_array(models_a.File.hash, models_a.File.attachment_id),
+                        models_a.File.id,
+                    ),
+                    type_=JSONB,
+                )
+            )
+            .join(table, table.c.id == models_a.File.attachment_id)
+            .where(table.c[entity_id_column] == entity_id)
+            .scalar_subquery()
+        )
+
     async def get_all_user_dialogs_ids_by_user_id_with_last_message_with_sort(
-        self, db_session: AsyncSession, user_id: int
+        self,
+        db_session: AsyncSession,
+        user_id: int,
+        offset: int = 0,
+        limit: int | None = None,
     ):
-        dialogs = await self.get_all_user_dialogs_ids_by_user_id_with_sort(db_session, user_id)
-        
-        for i, dialog in enumerate(dialogs):
-            last_message = await self.get_messages_by_chat_id_user_id(db_session, dialog["chat_id"], user_id, 0, 1)
-            dialogs[i]["last_message"] = last_message[0]
+        """
+        Диалоги пользователя одним запросом: собеседник, его файлы, количество сообщений
+         пользователя и последнее сообщение (обычное или системное) через LATERAL.
+        Сортировка по последнему сообщению, диалоги без сообщений в конце
+        """
+        FirstChatMember = aliased(models_m.ChatMember)
+        SecondChatMember = aliased(models_m.ChatMember)
+        MessageChatMember = aliased(models_m.ChatMember)
+
+        last_user_message = (
+            select(
+                models_m.Message.id.label("id"),
+                models_m.Message.content.label("content"),
+                models_m.Message.created_at.label("created_at"),
+                MessageChatMember.user_id.label("user_id"),
+            )
+            .join(MessageChatMember, MessageChatMember.id == models_m.Message.chat_member_id)
+            .where(MessageChatMember.chat_id == FirstChatMember.chat_id)
+            .order_by(desc(models_m.Message.created_at), desc(models_m.Message.id))
+            .limit(1)
+        )
+        last_system_message = (
+            select(
+                models_m.SystemMessage.id,
+                models_m.SystemMessage.content,
+                models_m.SystemMessage.created_at,
+                literal(-1),
+            )
+            .where(models_m.SystemMessage.chat_id == FirstChatMember.chat_id)
+            .order_by(desc(models_m.SystemMessage.created_at), desc(models_m.SystemMessage.id))
+            .limit(1)
+        )
+        last_message = (
+            union_all(last_user_message, last_system_message)
+            .order_by(desc(text("created_at")))
+            .limit(1)
+            .subquery()
+            .lateral("last_message")
+        )
+
+        message_count = (
+            select(func.count(models_m.Message.id))
+            .where(models_m.Message.chat_member_id == FirstChatMember.id)
+            .scalar_subquery()
+        )
+        interlocutor_files = self.__files_subquery(
+            models_a.UserAttachment.__table__, "user_id", models_u.User.id
+        )
+        # У системных сообщений (user_id = -1) вложений нет, их id из другой таблицы
+        last_message_files = case(
+            (
+                last_message.c.user_id != -1,
+                self.__files_subquery(
+                    models_a.MessageAttachment.__table__, "message_id", last_message.c.id
+                ),
+            ),
+        )
+
+        stmt = (
+            select(
+                FirstChatMember.chat_id,
+                models_u.User.username,
+                models_u.User.id,
+                message_count,
+                interlocutor_files,
+                last_message.c.content,
+                last_message.c.created_at,
+                last_message.c.user_id,
+                last_message_files,
+            )
+            .join(SecondChatMember, SecondChatMember.chat_id == FirstChatMember.chat_id)
+            .join(models_u.User, models_u.User.id == SecondChatMember.user_id)
+            .join(models_m.Chat, models_m.Chat.id == FirstChatMember.chat_id)
+            .join(last_message, true(), isouter=True)
+            .where(
+                and_(
+                    models_m.Chat.is_dialog == True,
+                    FirstChatMember.user_id == user_id,
+                    SecondChatMember.user_id != user_id,
+                )
+            )
+            .order_by(
+                last_message.c.created_at.desc().nulls_last(),
+                desc(FirstChatMember.chat_id),
+            )
+            .offset(offset)
+            .limit(limit)
+        )
 
-        dialogs.sort(key=lambda x: x["last_message"]["created_at"], reverse=True)
+        dialogs_data = []
+        for (
+            chat_id, username, interlocutor_id, message_count, interlocutor_files,
+            content, created_at, message_user_id, message_files,
+        ) in (await db_session.execute(stmt)).all():
+            dialogs_data.append({
+                "chat_id": chat_id,
+                "message_count": message_count,
+                "interlocutor_id": interlocutor_id,
+                "interlocutor_username": username,
+                "interlocutor_files": self.__render_files(interlocutor_files),
+                "last_message": {
+                    "content": content,
+                    "created_at": created_at,
+                    "user_id": message_user_id,
+                    "files": self.__render_files(message_files),
+                } if created_at is not None else None,
+            })
 
-        return dialogs
+        return dialogs_data
     
     async def create_dialog_with_message(
         self,
@@ -424,9 +625,12 @@ class BaseMessageManager(BaseChatMemberManager):
         message_create = message.get_message_create(dialog_data["chat_id"])
         message_broadcast = await chat_conn_manager._ChatConnectionManager__send_message(conn_context, message_create)
         if message.message_image:
-            await message_attachment_manager.create_new_attachment(db_session, [message.message_image], user_id)
-            message_broadcast["files"] = await message_attachment_manager.get_only_files(
-                db_session, message_broadcast["message_id"]
+            # Участникам файлы придут событием files_attached
+            await message_attachment_manager.create_new_attachment(
+                db_session, [message.message_image], user_id, message_broadcast.id
+            )
+            message_broadcast.files = await message_attachment_manager.get_only_files(
+                db_session, message_broadcast.id
             )
         
         dialog_data["last_message"] = message_broadcast
@@ -450,6 +654,8 @@ class ConnectionContext:
 class ChatConnectionManager:
     # ws_connections: {user_id, set[ws_connection]}
     ws_connections: dict[int, set[WebSocket]] = {}
+    # ws_senders: {ws_connection, WsSender} - очередь отправки каждого сокета
+    ws_senders: dict[WebSocket, WsSender] = {}
 
     def __init__(self) -> None:
         pass
@@ -482,72 +688,82 @@ class ChatConnectionManager:
         await conn_context.websocket.accept()
         if conn_context.user_id not in self.ws_connections:
             self.ws_connections[conn_context.user_id] = set()
+            await redis_broker.subscribe(
+                f"chat:{conn_context.user_id}",
+                partial(self.__deliver, conn_context.user_id),
+            )
 
         self.ws_connections[conn_context.user_id].add(conn_context.websocket)
+        self.ws_senders[conn_context.websocket] = WsSender(conn_context.websocket)
 
     async def disconnect(self, conn_context: ConnectionContext) -> None:
-        all_current_connections = self.ws_connections[conn_context.user_id]
-        all_current_connections.remove(conn_context.websocket)
-        if len(all_current_connections) == 0:
+        if sender := self.ws_senders.pop(conn_context.websocket, None):
+            sender.close()
+
+        all_current_connections = self.ws_connections.get(conn_context.user_id, set())
+        all_current_connections.discard(conn_context.websocket)
+        if len(all_current_connections) == 0 and conn_context.user_id in self.ws_connections:
             del self.ws_connections[conn_context.user_id]
+            await redis_broker.unsubscribe(f"chat:{conn_context.user_id}")
 
     async def broadcast(
         self, message: schemas_m.MessageBroadcast | Any, target_users_ids: list[int | bytes]
     ):
+        """
+        Публикует сообщение в каналы пользователей, сокеты пользователя
+         могут быть в любом процессе - доставляет тот, где они подключены
+        """
+        data = message.model_dump_json()
         for user_id in target_users_ids:
-            if not (user_websockets := self.ws_connections.get(int(user_id))):
-                continue
+            try:
+                await redis_broker.publish(f"chat:{int(user_id)}", data)
+            except RedisError as e:
+                logger.warning(f"Chat broadcast to {int(user_id)} failed: {e}")
 
-            msg_json = message.model_dump()
-            for ws in user_websockets:
-                await ws.send_json(msg_json)
+    async def __deliver(self, user_id: int, data: bytes) -> None:
+        """
+        Только ставит сообщение в очереди сокетов, одна строка на все сокеты
+        """
+        text_data = data.decode()
+        for ws in self.ws_connections.get(user_id, ()):
+            if sender := self.ws_senders.get(ws):
+                sender.send(text_data)
+
+    async def __get_chat_users_ids(
+        self, db_session: AsyncSession, chat_id: int
+    ) -> Sequence[int | bytes]:
+        async with get_redis_client() as redis:
+            users_ids = await redis.smembers(f"chat_members:{chat_id}")
+            if not users_ids:
+                users_ids = await message_manager.get_users_ids_by_chat_id(
+                    db_session, chat_id
+                )
+                await redis.sadd(f"chat_members:{chat_id}", *users_ids)
+                await redis.expire(f"chat_members:{chat_id}", 60 * 10)
+
+        return users_ids
 
     async def __send_message(
         self, conn_context: ConnectionContext, new_message: schemas_m.MessageCreate
     ):
-        users_ids = None
-        files = None
+        """
+        Сообщение сохраняется и рассылается сразу, сессия не удерживается до загрузки файлов
+        """
+        async with context_get_session() as db_session:
+            message = await message_manager.create_message_by_sender_id(
+                db_session, conn_context.user_id, new_message
+            )
 
-        async with get_redis_client() as redis:
-            users_ids = await redis.smembers(f"chat_members:{new_message.chat_id}")
+            if not message:
+                await self.__raise(conn_context, status.WS_1002_PROTOCOL_ERROR, "Not real chat_id")
 
-            async with context_get_session() as db_session:
-                message = await message_manager.create_message_by_sender_id(
-                    db_session, conn_context.user_id, new_message
-                )
-                
-                if not message:
-                    await self.__raise(conn_context, status.WS_1002_PROTOCOL_ERROR, "Not real chat_id")
-                
-                # todo сюда можно придумать решение получше, конечно
-                #  а-ля проверять появился ли файл или нет или
-                #  добавить pg listener на таблицу и уже там чекать
-                #  но в pg listener могут быть проблемы, а проверка создаст ненужные? запросы
-                if new_message.need_wait:
-                    # Временный костыль (if ws) (надеюсь) пока не перепишем файлы 
-                    # (убейте меня, ахах) :(
-                    if conn_context.websocket:
-                        await conn_context.websocket.send_json(
-                            {"message_id": message.id, "waiting": new_message.need_wait}
-                        )
-                        await asyncio.sleep(new_message.need_wait)
-                        files = await message_attachment_manager.get_only_files(
-                            db_session, message.id
-                        )
-
-                if not users_ids:
-                    users_ids = await message_manager.get_users_ids_by_chat_id(
-                        db_session, new_message.chat_id
-                    )
-                    await redis.sadd(f"chat_members:{new_message.chat_id}", *users_ids)
-                    await redis.expire(f"chat_members:{new_message.chat_id}", 60 * 10)
+            users_ids = await self.__get_chat_users_ids(db_session, new_message.chat_id)
 
         message_broadcast = schemas_m.MessageBroadcast(
             **{
                 **message.to_dict(),
                 "chat_id": new_message.chat_id,
                 "user_id": conn_context.user_id,
-                "files": files,
             }
         )
         await self.broadcast(message_broadcast, users_ids)
@@ -555,6 +771,32 @@ class ChatConnectionManager:
         # Ещё один костыль 😭
         if not conn_context.websocket:
             return message_broadcast
+
+    async def files_attached_callback(
+        self, db_session: AsyncSession, message_id: int, author_id: int
+    ) -> None:
+        """
+        Вызывается message_attachment_manager после commit файлов сообщения
+        """
+        stmt = (
+            select(models_m.ChatMember.chat_id, models_m.ChatMember.user_id)
+            .join(models_m.Message, models_m.Message.chat_member_id == models_m.ChatMember.id)
+            .where(models_m.Message.id == message_id)
+        )
+        row = (await db_session.execute(stmt)).one_or_none()
+        # Рассылаем только если файлы прикрепил автор сообщения
+        if not row or row.user_id != author_id:
+            return
+
+        files_broadcast = schemas_m.MessageFilesBroadcast(
+            id=message_id,
+            chat_id=row.chat_id,
+            user_id=author_id,
+            files=await message_attachment_manager.get_only_files(db_session, message_id),
+        )
+        await self.broadcast(
+            files_broadcast, await self.__get_chat_users_ids(db_session, row.chat_id)
+        )
     
     async def send_and_create_system_message(
         self,
@@ -1,2 +1,3 @@
 from .offers import Offer, OfferCategoryValue
-from .delivery import Delivery
\ No newline at end of file
+from .delivery import Delivery
+from . import offer_card
@@ -1,7 +1,9 @@
 from typing import TYPE_CHECKING
 
-from sqlalchemy import Column, Integer, String, Text, Enum, ForeignKey, VARCHAR
+from sqlalchemy import text, event, Column, Integer, String, Text, Enum, ForeignKey, VARCHAR
 from sqlalchemy.orm import relationship, Mapped
+import sqlalchemy
+
 from core.database import Base
 
 if TYPE_CHECKING:
@@ -15,4 +17,44 @@ class Delivery(Base):
     offer_id = Column(Integer, ForeignKey('offer.id', ondelete="CASCADE"))
     value = Column(VARCHAR(500))
 
-    offer: Mapped["Offer"] = relationship(back_populates="deliveries", lazy="noload")
\ No newline at end of file
+    offer: Mapped["Offer"] = relationship(back_populates="deliveries", lazy="noload")
+
+
+# offer.delivery_count = кол-во delivery оффера, statement-level, поэтому
+#  COPY/массовый DELETE обновляют счётчик одним UPDATE на оффер
+delivery_count_sql_func = """
+CREATE OR REPLACE FUNCTION offer_delivery_count_update()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('DELETE', 'UPDATE') THEN
+        UPDATE offer o SET delivery_count = o.delivery_count - d.cnt
+        FROM (SELECT offer_id, count(*) AS cnt FROM old_rows GROUP BY offer_id) d
+        WHERE o.id = d.offer_id;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        UPDATE offer o SET delivery_count = o.delivery_count + d.cnt
+        FROM (SELECT offer_id, count(*) AS cnt FROM new_rows GROUP BY offer_id) d
+        WHERE o.id = d.offer_id;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+
+@event.listens_for(Delivery.__table__, "after_create")
+def create_delivery_count_triggers(
+    target: Delivery.__table__, connection: sqlalchemy.engine.base.Connection, **kw
+):
+    connection.execute(text(delivery_count_sql_func))
+    for event_sql, transition in (
+        ("INSERT", "NEW TABLE AS new_rows"),
+        ("DELETE", "OLD TABLE AS old_rows"),
+        ("UPDATE", "OLD TABLE AS old_rows NEW TABLE AS new_rows"),
+    ):
+        connection.execute(text(f"""
+        CREATE OR REPLACE TRIGGER delivery_count_after_{event_sql.lower()}_trigger
+        AFTER {event_sql} ON delivery
+        REFERENCING {transition}
+        FOR EACH STATEMENT EXECUTE FUNCTION offer_delivery_count_update();
+        """))
@@ -0,0 +1,150 @@
+"""
+Карточка оффера (offer.card) - собранные заранее данные для отображения оффера:
+ username продавца, файлы продавца и оффера (пары [hash, attachment_id]), значения категорий.
+Поддерживается триггерами на всех таблицах-источниках, поэтому листинг
+ читает только таблицу offer. Ссылки на файлы собираются уже в питоне через BASE_FILE_URL
+"""
+from sqlalchemy import text, event
+import sqlalchemy
+
+from core.database import Base
+
+
+offer_card_refresh_sql_func = """
+CREATE OR REPLACE FUNCTION offer_card_refresh(offer_ids INTEGER[])
+RETURNS VOID AS $$
+BEGIN
+    UPDATE offer o SET card = jsonb_build_object(
+        'username', (SELECT u.username FROM "user" u WHERE u.id = o.user_id),
+        'user_files', COALESCE((
+            SELECT jsonb_agg(jsonb_build_array(f.hash, f.attachment_id) ORDER BY f.id)
+            FROM file f JOIN user_attachment ua ON ua.id = f.attachment_id
+            WHERE ua.user_id = o.user_id
+        ), '[]'::jsonb),
+        'offer_files', COALESCE((
+            SELECT jsonb_agg(jsonb_build_array(f.hash, f.attachment_id) ORDER BY f.id)
+            FROM file f JOIN offer_attachment oa ON oa.id = f.attachment_id
+            WHERE oa.offer_id = o.id
+        ), '[]'::jsonb),
+        'category_values', COALESCE((
+            SELECT jsonb_agg(jsonb_build_object('id', cv.id, 'value', cv.value) ORDER BY cv.id)
+            FROM offer_category_value ocv JOIN category_value cv ON cv.id = ocv.category_value_id
+            WHERE ocv.offer_id = o.id
+        ), '[]'::jsonb)
+    )
+    WHERE o.id = ANY(offer_ids);
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+
+# Все функции ниже statement-level, changed_rows - NEW или OLD TABLE в зависимости от триггера,
+#  для UPDATE changed_rows - NEW TABLE, old_rows - OLD TABLE (UPDATE OF с transition tables нельзя)
+offer_card_trigger_sql_funcs = """
+CREATE OR REPLACE FUNCTION offer_card_by_offer()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM offer_card_refresh(ARRAY(SELECT DISTINCT id FROM changed_rows));
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION offer_card_by_offer_id()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM offer_card_refresh(ARRAY(SELECT DISTINCT offer_id FROM changed_rows));
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION offer_card_by_user_id()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM offer_card_refresh(ARRAY(
+        SELECT o.id FROM offer o WHERE o.user_id IN (SELECT user_id FROM changed_rows)
+    ));
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION offer_card_by_user()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM offer_card_refresh(ARRAY(
+        SELECT o.id FROM offer o WHERE o.user_id IN (
+            SELECT n.id FROM changed_rows n JOIN old_rows p ON p.id = n.id
+            WHERE n.username IS DISTINCT FROM p.username
+        )
+    ));
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION offer_card_by_category_value()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM offer_card_refresh(ARRAY(
+        SELECT DISTINCT ocv.offer_id FROM offer_category_value ocv
+        WHERE ocv.category_value_id IN (
+            SELECT n.id FROM changed_rows n JOIN old_rows p ON p.id = n.id
+            WHERE n.value IS DISTINCT FROM p.value
+        )
+    ));
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION offer_card_by_file()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM offer_card_refresh(ARRAY(
+        SELECT oa.offer_id FROM offer_attachment oa
+        WHERE oa.id IN (SELECT attachment_id FROM changed_rows)
+        UNION
+        SELECT o.id FROM offer o JOIN user_attachment ua ON ua.user_id = o.user_id
+        WHERE ua.id IN (SELECT attachment_id FROM changed_rows)
+    ));
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+
+def __create_trigger(
+    connection: sqlalchemy.engine.base.Connection,
+    trigger_name: str,
+    event_sql: str,
+    table_name: str,
+    function_name: str,
+):
+    transition = {
+        "INSERT": "NEW TABLE AS changed_rows",
+        "DELETE": "OLD TABLE AS changed_rows",
+        "UPDATE": "OLD TABLE AS old_rows NEW TABLE AS changed_rows",
+    }[event_sql]
+    trigger_sql = f"""
+    CREATE OR REPLACE TRIGGER {trigger_name}_trigger
+    AFTER {event_sql} ON {table_name}
+    REFERENCING {transition}
+    FOR EACH STATEMENT EXECUTE FUNCTION {function_name}();
+    """
+    connection.execute(text(trigger_sql))
+
+
+# Триггеры затрагивают сразу несколько таблиц, поэтому создаются после всех
+@event.listens_for(Base.metadata, "after_create")
+def create_offer_card_triggers(
+    target: sqlalchemy.MetaData, connection: sqlalchemy.engine.base.Connection, **kw
+):
+    connection.execute(text(offer_card_refresh_sql_func))
+    connection.execute(text(offer_card_trigger_sql_funcs))
+
+    __create_trigger(connection, "offer_card_offer_insert", "INSERT", "offer", "offer_card_by_offer")
+    __create_trigger(connection, "offer_card_ocv_insert", "INSERT", "offer_category_value", "offer_card_by_offer_id")
+    __create_trigger(connection, "offer_card_ocv_delete", "DELETE", "offer_category_value", "offer_card_by_offer_id")
+    __create_trigger(connection, "offer_card_offer_attachment_delete", "DELETE", "offer_attachment", "offer_card_by_offer_id")
+    __create_trigger(connection, "offer_card_user_attachment_delete", "DELETE", "user_attachment", "offer_card_by_user_id")
+    __create_trigger(connection, "offer_card_file_insert", "INSERT", "file", "offer_card_by_file")
+    __create_trigger(connection, "offer_card_file_delete", "DELETE", "file", "offer_card_by_file")
+    __create_trigger(connection, "offer_card_user_update", "UPDATE", '"user"', "offer_card_by_user")
+    __create_trigger(connection, "offer_card_category_value_update", "UPDATE", "category_value", "offer_card_by_category_value")
@@ -1,23 +1,38 @@
 import time
 from typing import List
 
-from sqlalchemy import func, select, Column, Integer, String, Text, Enum, ForeignKey, CheckConstraint, Boolean
+from sqlalchemy import func, select, case, text, event, Column, Integer, String, Text, Enum, ForeignKey, CheckConstraint, Boolean, Index, Computed, Float
+from sqlalchemy.dialects.postgresql import TSVECTOR, ARRAY, JSONB
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import relationship, Mapped
+from sqlalchemy.ext.hybrid import hybrid_property
 
 from core.database import Base
 from app.users.models import User
 from .delivery import Delivery
 
 
-# Попытки в автоматическую замену count через hybrid
-# Оставил на будущее, чтоб не забыть направление в котором
-# Можно искать инфу
-# from sqlalchemy.ext.hybrid import hybrid_property
-
-
 class Offer(Base):
     __tablename__ = "offer"
+    __table_args__ = (
+        # Под keyset пагинацию публичного списка: (status, ключ сортировки, id)
+        Index("ix_offer_status_upped_at_id", "status", "upped_at", "id"),
+        Index("ix_offer_status_price_id", "status", "price", "id"),
+        Index("ix_offer_status_rating_id", "status", "rating", "id"),
+        # Поиск: полнотекстовый по search_vector и триграммный (опечатки, подстроки) по name
+        Index("ix_offer_search_vector", "search_vector", postgresql_using="gin"),
+        Index(
+            "ix_offer_name_trgm", "name",
+            postgresql_using="gin", postgresql_ops={"name": "gin_trgm_ops"},
+        ),
+        # Фильтр по значениям категорий одной проверкой category_value_ids @> [...]
+        Index("ix_offer_category_value_ids", "category_value_ids", postgresql_using="gin"),
+        # Офферы продавца: мои офферы и join покупка -> оффер в списке продаж
+        Index("ix_offer_user_id", "user_id"),
+    )
+    # Служебные колонки, которые поддерживает сама бд, в ORM объект не грузим
+    __mapper_args__ = {"exclude_properties": ["search_vector", "card", "rating"]}
+
     id = Column(Integer, primary_key=True, index=True)
     # About ondelete arg:
     # https://docs.sqlalchemy.org/en/20/core/constraints.html#sqlalchemy.schema.ForeignKey.params.ondelete
@@ -34,6 +49,29 @@ class Offer(Base):
     is_autogive_enabled = Column(Boolean, nullable=True, default=None)
     is_autoup_enabled = Column(Boolean, nullable=True, default=False)
     upped_at = Column(Integer, nullable=False, default=int(time.time()))
+    # Денормализованная копия offer_category_value, меняется вместе с ней в create_offer/update_offer
+    category_value_ids = Column(ARRAY(Integer), nullable=False, default=list, server_default="{}")
+    # Кол-во delivery оффера, поддерживается триггерами на delivery (см. delivery.py)
+    delivery_count = Column(Integer, nullable=False, default=0, server_default="0")
+    # Сумма и кол-во оценок отзывов, поддерживаются триггерами на review (см. app/purchase/models)
+    rating_sum = Column(Integer, nullable=False, default=0, server_default="0")
+    rating_count = Column(Integer, nullable=False, default=0, server_default="0")
+    # Средняя оценка (0 без отзывов) для сортировки листинга без join, обращаться через Offer.__table__.c.rating
+    rating = Column(
+        Float,
+        Computed("CASE WHEN rating_count > 0 THEN rating_sum::float8 / rating_count ELSE 0 END", persisted=True),
+    )
+    # Собранная карточка для листинга, см. offer_card.py, обращаться через Offer.__table__.c.card
+    card = Column(JSONB)
+    # Название весит больше описания, обращаться через Offer.__table__.c.search_vector
+    search_vector = Column(
+        TSVECTOR,
+        Computed(
+            "setweight(to_tsvector('russian', name), 'A') || "
+            "setweight(to_tsvector('russian', description), 'B')",
+            persisted=True,
+        ),
+    )
 
     user: Mapped["User"] = relationship(back_populates="offers", lazy="noload")
     category_values: Mapped[list["OfferCategoryValue"]] = relationship(
@@ -43,16 +81,30 @@ class Offer(Base):
         back_populates="offer", lazy="noload"
     )
 
+    def to_dict(self, base_dict: dict = {}):
+        main_dict = {c.key: getattr(self, c.key) for c in self.__mapper__.column_attrs}
+        return main_dict | base_dict
+
+    @hybrid_property
+    def real_count(self) -> int:
+        """
+        Доступное кол-во: для автовыдачи - сколько есть delivery, иначе count
+        """
+        return self.delivery_count if self.is_autogive_enabled else self.count
+
+    @real_count.inplace.expression
+    @classmethod
+    def _real_count_expression(cls):
+        return case((cls.is_autogive_enabled == True, cls.delivery_count), else_=cls.count)
+
     async def get_real_count(self, db_session: AsyncSession):
-        if not self.is_autogive_enabled:
-            return self.count
-        
-        value_count_stmt = select(func.count(Delivery.id)).where(
-            Delivery.offer_id == self.id
-        )
-        result = await db_session.execute(value_count_stmt)
+        # Значение уже лежит в строке оффера, db_session оставлен для совместимости
+        return self.real_count
+
 
-        return result.scalar_one()
+@event.listens_for(Offer.__table__, "before_create")
+def create_offer_extensions(target, connection, **kw):
+    connection.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
 
 
 class OfferCategoryValue(Base):
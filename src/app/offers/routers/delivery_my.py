@@ -1,6 +1,6 @@
 import logging
 
-from fastapi import Depends, APIRouter, HTTPException, status
+from fastapi import Depends, APIRouter, HTTPException, Query, UploadFile, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from core.database import get_session
@@ -100,6 +100,64 @@ async def create_delivery(
     return created_deliveries
 
 
+@router.post(
+    path="/my/import", responses=deps.build_response(deps.UserSession.get_current_active_user)
+)
+async def import_deliveries(
+        offer_id: int,
+        file: UploadFile,
+        current_session: tuple[schemas_t.JwtPayload, deps.UserSession] = Depends(
+            base_session
+        ),
+        db_session: AsyncSession = Depends(get_session),
+):
+    """
+    Массовая загрузка автовыдачи в оффер из файла<br>
+    &nbsp;- текстовый файл: одна строка - одно значение<br>
+    &nbsp;- .csv: берётся первая колонка каждой строки<br>
+    Пустые строки пропускаются, значения длиннее 500 символов не загружаются и считаются в rejected
+    """
+    token_data, user_context = current_session
+    user: models_u.User = await user_context.get_current_active_user(
+        db_session, token_data
+    )
+    offer = await services_f.get_raw_offer_by_user_id(db_session, user.id, offer_id)
+    if not offer:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
+
+    elif not offer.is_autogive_enabled:
+        raise HTTPException(403, detail="Offer does not support delivery")
+
+    return await services_f.import_deliveries(db_session, offer_id=offer_id, file=file)
+
+
+@router.delete(
+    path="/my/", responses=deps.build_response(deps.UserSession.get_current_active_user)
+)
+async def delete_deliveries(
+        delivery_ids: list[int] = Query(alias="id"),
+        current_session: tuple[schemas_t.JwtPayload, deps.UserSession] = Depends(
+            base_session
+        ),
+        db_session: AsyncSession = Depends(get_session),
+):
+    """
+    Удаляет сразу несколько значений автовыдачи по id, чужие id игнорируются
+    """
+    if len(delivery_ids) > services_f.DELIVERY_BULK_DELETE_LIMIT:
+        raise HTTPException(400, f"No more than {services_f.DELIVERY_BULK_DELETE_LIMIT} ids per request")
+
+    token_data, user_context = current_session
+    user: models_u.User = await user_context.get_current_active_user(
+        db_session, token_data
+    )
+    deleted_ids = await services_f.delete_deliveries_many(
+        db_session, user_id=user.id, delivery_ids=delivery_ids
+    )
+
+    return {"deleted": len(deleted_ids), "ids": deleted_ids}
+
+
 @router.put(
     path="/my/{delivery_id}/",
     responses={
@@ -46,6 +46,60 @@ async def create_offfer(
     return offer
 
 
+@router.post(
+    path="/my/bulk", responses=deps.build_response(deps.UserSession.get_current_active_user)
+)
+async def create_offers_bulk(
+    offers_in: list[schemas_f.CreateOffer],
+    current_session: tuple[schemas_t.JwtPayload, deps.UserSession] = Depends(
+        base_session
+    ),
+    db_session: AsyncSession = Depends(get_session),
+):
+    """
+    Создаётся сразу много офферов у авторизованного пользователя одной транзакцией<br>
+    Если хотя бы один оффер некорректен, не создаётся ни один
+    """
+    token_data, user_context = current_session
+    user: models_u.User = await user_context.get_current_active_user(
+        db_session, token_data
+    )
+    offers = await services_f.create_offers_many(
+        db_session, user_id=user.id, offers_in=offers_in
+    )
+
+    return [offer.to_dict() for offer in offers]
+
+
+@router.put(
+    path="/my/bulk",
+    responses={
+        **{404: {"model": schemas_f.OfferError}},
+        **deps.build_response(deps.UserSession.get_current_active_user),
+    },
+)
+async def update_offers_bulk(
+    offers_in: list[schemas_f.BulkUpdateOffer],
+    current_session: tuple[schemas_t.JwtPayload, deps.UserSession] = Depends(
+        base_session
+    ),
+    db_session: AsyncSession = Depends(get_session),
+):
+    """
+    Обновляется сразу много офферов авторизованного пользователя по их id одной транзакцией<br>
+    Если хотя бы один оффер не найден или некорректен, не обновляется ни один
+    """
+    token_data, user_context = current_session
+    user: models_u.User = await user_context.get_current_active_user(
+        db_session, token_data
+    )
+    offers = await services_f.update_offers_many(
+        db_session, user_id=user.id, offers_in=offers_in
+    )
+
+    return [offer.to_dict() for offer in offers]
+
+
 @router.get(
     path="/my/getall/",
     responses={
@@ -58,6 +112,7 @@ async def get_mini_with_offset_limit(
     limit: int = 10,
     search_query: str = None,
     is_descending: bool = None,
+    by_relevance: bool = False,
     statuses: list[Literal["active", "hidden", "deleted"]] = fastapi.Query(default=["active", "hidden", "deleted"], alias="status"),
     category_value_ids: list[int] = fastapi.Query(default=None, examples=["[1, 2]"]),
     current_session: tuple[schemas_t.JwtPayload, deps.UserSession] = Depends(
@@ -70,7 +125,8 @@ async def get_mini_with_offset_limit(
     &nbsp;- если offset == 10, то первые 10 строк будут пропущены, и выборка начнется с 11-й строки<br>
     &nbsp;- если limit == 20, то запрос вернёт только первые 20 строк результата
 
-    Соритрует результат по дате создания от старых к новым (id могут идти не по порядку)
+    Соритрует результат по дате создания от старых к новым (id могут идти не по порядку)<br>
+    by_relevance == true и задан search_query - сортировка по релевантности поиска (is_descending игнорируется)
     """
     token_data, user_context = current_session
     user: models_u.User = await user_context.get_current_active_user(
@@ -83,6 +139,7 @@ async def get_mini_with_offset_limit(
         limit=abs(limit),
         search_query=search_query,
         is_descending=is_descending,
+        by_relevance=by_relevance,
         category_value_ids=category_value_ids,
         statuses=statuses
     )
@@ -27,7 +27,11 @@ async def test_get_mini_with_offset_limit(
     limit: int = 10,
     search_query: str = None,
     is_descending: bool = None,
+    by_relevance: bool = False,
+    by_rating: bool = False,
     category_value_ids: list[int] = fastapi.Query(default=None, examples=["[1, 2]"]),
+    cursor: str = None,
+    use_cursor: bool = False,
     db_session: AsyncSession = Depends(get_session),
 ):
     """
@@ -36,27 +40,66 @@ async def test_get_mini_with_offset_limit(
     &nbsp;- если offset == 10, то первые 10 строк будут пропущены, и выборка начнется с 11-й строки<br>
     &nbsp;- если limit == 20, то запрос вернёт только первые 20 строк результата
 
-    Соритрует результат по дате создания от старых к новым (id могут идти не по порядку)
+    Соритрует результат по дате создания от старых к новым (id могут идти не по порядку)<br>
+    by_relevance == true и задан search_query - сортировка по релевантности поиска (is_descending игнорируется)<br>
+    by_rating == true - сортировка по средней оценке отзывов, от лучших (is_descending игнорируется)
+
+    Режим курсора (use_cursor == true или передан cursor), offset игнорируется:<br>
+    &nbsp;- ответ имеет вид {"offers": [...], "next_cursor": "..."}<br>
+    &nbsp;- для следующей страницы передайте next_cursor в cursor с теми же фильтрами и сортировкой<br>
+    &nbsp;- next_cursor == null значит, что страниц больше нет
     """
 
-    offers = await services_f.get_mini_by_offset_limit(
-        db_session,
-        offset=abs(offset),
+    use_cursor = bool(use_cursor or cursor)
+
+    async def get_offers():
+        if use_cursor:
+            offers, next_cursor = await services_f.get_mini_by_cursor_limit(
+                db_session,
+                cursor=cursor,
+                limit=abs(limit),
+                category_value_ids=category_value_ids,
+                is_descending=is_descending,
+                by_relevance=by_relevance,
+                by_rating=by_rating,
+                search_query=search_query,
+            )
+
+            return {"offers": offers, "next_cursor": next_cursor}
+
+        return await services_f.get_mini_by_offset_limit(
+            db_session,
+            offset=abs(offset),
+            limit=abs(limit),
+            category_value_ids=category_value_ids,
+            is_descending=is_descending,
+            by_relevance=by_relevance,
+            by_rating=by_rating,
+            search_query=search_query,
+        )
+
+    return await services_f.offers_cache.get_offer_list(
+        get_offers,
+        offset=None if use_cursor else abs(offset),
         limit=abs(limit),
+        cursor=cursor,
+        use_cursor=use_cursor,
         category_value_ids=category_value_ids,
         is_descending=is_descending,
+        by_relevance=by_relevance,
+        by_rating=by_rating,
         search_query=search_query,
     )
 
-    return offers
-
 
 @router.get(path="/{offer_id}/")
 async def get_by_id(
     offer_id: int,
     db_session: AsyncSession = Depends(get_session),
 ):
-    offer = await services_f.get_offer_by_id(db_session, id=offer_id)
+    offer = await services_f.offers_cache.get_offer_detail(
+        offer_id, lambda: services_f.get_offer_by_id(db_session, id=offer_id)
+    )
 
     if not offer:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
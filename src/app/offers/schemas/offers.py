@@ -48,6 +48,10 @@ class UpdateOffer(OfferBase):
     pass
 
 
+class BulkUpdateOffer(CreateOffer):
+    id: int
+
+
 class OfferInfo(BaseModel):
     detail: str
 
@@ -1,3 +1,4 @@
 from .offers_my import *
 from .offers_public import *
 from .delivery_my import *
+from . import offers_cache
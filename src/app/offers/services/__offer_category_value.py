@@ -4,9 +4,10 @@ from typing import List, Optional
 from fastapi import Depends
 from fastapi.encoders import jsonable_encoder
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, update, exists, delete, and_, asc
+from sqlalchemy import select, update, exists, delete, insert, and_, asc, tuple_
 
 from ..models import OfferCategoryValue
+from app.categories.models import CategoryValue
 
 
 async def create_offer_category_value(
@@ -22,6 +23,51 @@ async def create_offer_category_value(
     return offer_category_value
 
 
+async def create_offer_category_values_many(
+    db_session: AsyncSession, rows: list[tuple[int, int]]
+) -> None:
+    """
+    rows - [(offer_id, category_value_id), ...], один многострочный INSERT без commit
+    """
+    if not rows:
+        return
+
+    stmt = insert(OfferCategoryValue).values(
+        [{"offer_id": offer_id, "category_value_id": value_id} for offer_id, value_id in rows]
+    )
+    await db_session.execute(stmt)
+
+
+async def delete_offer_category_values_many(
+    db_session: AsyncSession, rows: list[tuple[int, int]]
+) -> None:
+    """
+    rows - [(offer_id, category_value_id), ...], один DELETE без commit
+    """
+    if not rows:
+        return
+
+    stmt = (
+        delete(OfferCategoryValue)
+        .where(tuple_(OfferCategoryValue.offer_id, OfferCategoryValue.category_value_id).in_(rows))
+        .execution_options(synchronize_session=False)
+    )
+    await db_session.execute(stmt)
+
+
+def diff_offer_category_values(
+    offer_id: int, old_ids: list[int] | None, new_ids: list[int]
+) -> tuple[list[tuple[int, int]], list[tuple[int, int]]]:
+    """
+    (строки на добавление, строки на удаление) для create/delete_offer_category_values_many
+    """
+    old_ids, new_ids = set(old_ids or []), set(new_ids)
+    return (
+        [(offer_id, value_id) for value_id in sorted(new_ids - old_ids)],
+        [(offer_id, value_id) for value_id in sorted(old_ids - new_ids)],
+    )
+
+
 async def get_offer_category_value_by_ids(
     db_session: AsyncSession, *, category_value_id: int, offer_id: int
 ) -> Optional[OfferCategoryValue]:
@@ -58,3 +104,29 @@ async def delete_offer_category_value(
     offer_category_value: OfferCategoryValue = (await db_session.execute(stmt)).scalar_one()
     await db_session.delete(offer_category_value)
     await db_session.commit()
+
+
+async def get_category_values_by_offer_ids(
+    db_session: AsyncSession, offer_ids: list[int]
+) -> dict[int, list[dict]]:
+    """
+    Значения категорий для целой страницы офферов одним запросом
+    Возвращает {offer_id: [{"id": ..., "value": ...}, ...]}
+    """
+    result: dict[int, list[dict]] = {offer_id: [] for offer_id in offer_ids}
+
+    if not offer_ids:
+        return result
+
+    stmt = (
+        select(OfferCategoryValue.offer_id, CategoryValue.id, CategoryValue.value)
+        .join(CategoryValue, CategoryValue.id == OfferCategoryValue.category_value_id)
+        .where(OfferCategoryValue.offer_id.in_(offer_ids))
+        .order_by(OfferCategoryValue.offer_id, asc(CategoryValue.id))
+    )
+    rows = (await db_session.execute(stmt)).all()
+
+    for offer_id, value_id, value in rows:
+        result[offer_id].append({"id": value_id, "value": value})
+
+    return result
@@ -0,0 +1,34 @@
+from sqlalchemy import func, or_, literal
+from sqlalchemy.sql.elements import ColumnElement
+
+from ..models import Offer
+
+
+SEARCH_CONFIG = "russian"
+
+
+def __ts_query(search_query: str) -> ColumnElement:
+    return func.websearch_to_tsquery(SEARCH_CONFIG, search_query)
+
+
+def get_search_filter(search_query: str) -> ColumnElement:
+    """
+    Полнотекстовое совпадение по search_vector, либо (опечатки, части слов)
+     триграммное по name, оба варианта покрыты GIN индексами
+    """
+    return or_(
+        Offer.__table__.c.search_vector.bool_op("@@")(__ts_query(search_query)),
+        literal(search_query).bool_op("<%")(Offer.name),
+        Offer.name.ilike(f"%{search_query}%"),
+    )
+
+
+def get_search_rank(search_query: str) -> ColumnElement:
+    """
+    Релевантность: ранг полнотекстового совпадения (name весит больше description)
+     плюс похожесть запроса на название, чтобы триграммные совпадения тоже упорядочивались
+    """
+    return (
+        func.ts_rank_cd(Offer.__table__.c.search_vector, __ts_query(search_query))
+        + func.word_similarity(search_query, Offer.name)
+    ).label("search_rank")
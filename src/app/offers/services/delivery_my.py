@@ -1,9 +1,16 @@
+import csv
+import time
+import codecs
+from typing import AsyncIterator
+
+from fastapi import UploadFile
 from fastapi.encoders import jsonable_encoder
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, delete
 
 from .. import schemas as schemas_f
 from .. import models as models_f
+from . import offers_cache
 
 
 async def get_deliveries_by_offer_id(
@@ -41,6 +48,7 @@ async def create_delivery(
     )
     db_session.add(db_obj)
     await db_session.commit()
+    await offers_cache.invalidate_offers(db_obj.offer_id)
     return db_obj
 
 
@@ -48,6 +56,7 @@ async def update_delivery(
         db_session: AsyncSession, db_obj: models_f.Delivery, obj_in: schemas_f.Delivery
 ):
     obj_data = jsonable_encoder(db_obj)
+    old_offer_id = db_obj.offer_id
     if isinstance(obj_in, dict):
         update_data = obj_in
     else:
@@ -59,6 +68,8 @@ async def update_delivery(
 
     db_session.add(db_obj)
     await db_session.commit()
+    # Автовыдача могла перейти в другой оффер - меняется количество у обоих
+    await offers_cache.invalidate_offers(old_offer_id, db_obj.offer_id)
 
     return db_obj
 
@@ -83,5 +94,114 @@ async def delete_delivery(db_session: AsyncSession, delivery_id: int):
 
     await db_session.delete(delivery)
     await db_session.commit()
+    await offers_cache.invalidate_offers(delivery.offer_id)
 
     return delivery
+
+
+# Максимальная длина значения, совпадает с VARCHAR(500) в модели
+DELIVERY_VALUE_MAX_LENGTH = models_f.Delivery.value.type.length
+DELIVERY_IMPORT_CHUNK_SIZE = 64 * 1024
+DELIVERY_BULK_DELETE_LIMIT = 1000
+
+
+async def __read_lines(file: UploadFile) -> AsyncIterator[str]:
+    """
+    Читает загруженный файл кусками, не держа его целиком в памяти
+    """
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    tail = ""
+    while chunk := await file.read(DELIVERY_IMPORT_CHUNK_SIZE):
+        lines = (tail + decoder.decode(chunk)).split("\n")
+        tail = lines.pop()
+        for line in lines:
+            yield line.rstrip("\r")
+
+    tail += decoder.decode(b"", final=True)
+    if tail:
+        yield tail.rstrip("\r")
+
+
+async def __read_csv_values(file: UploadFile, counters: dict) -> AsyncIterator[str]:
+    """
+    Первая колонка каждой записи csv. Запись может занимать несколько строк,
+     если перевод строки внутри кавычек: строки копятся, пока число кавычек нечётное
+     (экранированная "" не меняет чётность). Незакрытая кавычка в конце файла - rejected
+    """
+    record = None
+    async for line in __read_lines(file):
+        record = line if record is None else f"{record}\n{line}"
+        if record.count('"') % 2:
+            continue
+
+        # Пустая строка - пустая запись []
+        yield (next(csv.reader([record]), None) or [""])[0]
+        record = None
+
+    if record is not None:
+        counters["rejected"] += 1
+
+
+async def import_deliveries(
+    db_session: AsyncSession, offer_id: int, file: UploadFile
+) -> dict:
+    """
+    Импорт автовыдачи из файла: одна строка - одно значение, для .csv - первая колонка
+     каждой записи (значение в кавычках может содержать переводы строк)
+    Пустые строки пропускаются, слишком длинные отбрасываются (rejected)
+    Загрузка через COPY одной транзакцией сессии, commit тоже здесь
+    """
+    is_csv = (file.filename or "").lower().endswith(".csv") or file.content_type == "text/csv"
+    counters = {"inserted": 0, "rejected": 0}
+
+    async def records():
+        created_at = int(time.time())
+        values = __read_csv_values(file, counters) if is_csv else __read_lines(file)
+        async for value in values:
+            value = value.strip()
+            if not value:
+                continue
+            if len(value) > DELIVERY_VALUE_MAX_LENGTH:
+                counters["rejected"] += 1
+                continue
+
+            counters["inserted"] += 1
+            yield offer_id, value, created_at, created_at
+
+    # Первый запрос открывает транзакцию на соединении сессии, COPY идёт в ней же
+    await db_session.execute(select(models_f.Offer.id).where(models_f.Offer.id == offer_id))
+    connection = await (await db_session.connection()).get_raw_connection()
+    await connection.driver_connection.copy_records_to_table(
+        models_f.Delivery.__tablename__,
+        records=records(),
+        columns=["offer_id", "value", "created_at", "updated_at"],
+    )
+    await db_session.commit()
+    await offers_cache.invalidate_offers(offer_id)
+
+    return counters
+
+
+async def delete_deliveries_many(
+    db_session: AsyncSession, user_id: int, delivery_ids: list[int]
+) -> list[int]:
+    """
+    Удаляет только автовыдачу офферов пользователя, возвращает id удалённых
+    """
+    stmt = (
+        delete(models_f.Delivery)
+        .where(models_f.Delivery.id.in_(delivery_ids))
+        .where(
+            models_f.Delivery.offer_id.in_(
+                select(models_f.Offer.id).where(models_f.Offer.user_id == user_id)
+            )
+        )
+        .returning(models_f.Delivery.id, models_f.Delivery.offer_id)
+        .execution_options(synchronize_session=False)
+    )
+    deleted = (await db_session.execute(stmt)).all()
+    await db_session.commit()
+    if deleted:
+        await offers_cache.invalidate_offers(*{offer_id for _, offer_id in deleted})
+
+    return [delivery_id for delivery_id, _ in deleted]
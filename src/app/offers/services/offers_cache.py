@@ -0,0 +1,61 @@
+import json
+import hashlib
+from typing import Any, Awaitable, Callable
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .. import models as models_f
+from core.redis import cache
+from core.settings import config
+
+
+# Списки зависят от любого оффера, поэтому инвалидируются сменой версии,
+#  карточка оффера - удалением своего ключа
+LIST_VERSION = "offers:list"
+
+
+def __list_key(version: int, params: dict) -> str:
+    normalized = json.dumps(params, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return f"{LIST_VERSION}:v{version}:{hashlib.sha1(normalized.encode()).hexdigest()}"
+
+
+def __detail_key(offer_id: int) -> str:
+    return f"offers:detail:{offer_id}"
+
+
+async def get_offer_list(factory: Callable[[], Awaitable[Any]], **params) -> Any:
+    """
+    params - параметры запроса, порядок category_value_ids и регистр поиска не важны
+    """
+    if params.get("category_value_ids"):
+        params["category_value_ids"] = sorted(set(params["category_value_ids"]))
+    if params.get("search_query"):
+        params["search_query"] = params["search_query"].lower()
+
+    version = await cache.get_version(LIST_VERSION)
+    key = __list_key(version, {k: v for k, v in params.items() if v is not None})
+
+    return await cache.get_or_set(key, factory, config.OFFERS_CACHE_TTL)
+
+
+async def get_offer_detail(offer_id: int, factory: Callable[[], Awaitable[Any]]) -> Any:
+    return await cache.get_or_set(__detail_key(offer_id), factory, config.OFFERS_CACHE_TTL)
+
+
+async def invalidate_offers(*offer_ids: int) -> None:
+    """
+    Вызывать после commit, иначе кэш может успеть заполниться старыми данными
+    """
+    await cache.invalidate(
+        versions=[LIST_VERSION], keys=[__detail_key(offer_id) for offer_id in offer_ids]
+    )
+
+
+async def invalidate_user_offers(db_session: AsyncSession, user_id: int) -> None:
+    """
+    Для изменений пользователя, которые видны в его офферах (аватар)
+    """
+    stmt = select(models_f.Offer.id).where(models_f.Offer.user_id == user_id)
+    offer_ids = (await db_session.execute(stmt)).scalars().all()
+    await invalidate_offers(*offer_ids)
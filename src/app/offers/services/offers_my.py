@@ -12,13 +12,13 @@ from .. import models as models_f
 from .. import schemas as schemas_f
 from app.users import models as models_u
 from . import __offer_category_value as __ocv
+from . import __offer_search as __search
+from . import offers_cache
 from app.categories.models import CategoryCarcass, CategoryValue
 from app.categories.services.categories_carcass import get_carcass_names
 from app.categories.services.categories_values import get_many_by_ids, is_on_one_branch
-from app.categories.services.categories_values import (
-    get_value_ids_by_carcass,
-    get_root_values,
-)
+from app.categories.services.categories_values import get_branch_info_by_ids, check_one_branch
+from app.categories.services.categories_values import get_value_ids_by_carcass
 from app.attachment.services import offer_attachment_manager
 from app.attachment.services import category_value_attachment_manager
 
@@ -77,6 +77,7 @@ async def get_mini_by_user_id_offset_limit(
     user_id: int,
     is_descending: bool = None,
     search_query: str = None,
+    by_relevance: bool = False,
     statuses: list[Literal["active", "hidden", "deleted"]] = ["active", "hidden", "deleted"],
 ) -> list[models_f.Offer]:
     stmt = (
@@ -89,7 +90,9 @@ async def get_mini_by_user_id_offset_limit(
         .where(models_f.Offer.user_id == user_id)
         .where(models_f.Offer.status.in_(statuses))
         .order_by(
-            desc(models_f.Offer.updated_at)
+            desc(__search.get_search_rank(search_query))
+            if by_relevance and search_query
+            else desc(models_f.Offer.updated_at)
             if is_descending is None
             else desc(models_f.Offer.price)
             if is_descending
@@ -100,41 +103,26 @@ async def get_mini_by_user_id_offset_limit(
     )
 
     if category_value_ids:
-        stmt = stmt.where(
-            and_(
-                models_f.Offer.category_values.any(
-                    models_f.OfferCategoryValue.category_value_id == cv_id
-                )
-                for cv_id in category_value_ids
-            )
-        )
+        stmt = stmt.where(models_f.Offer.category_value_ids.contains(category_value_ids))
 
     if search_query:
-        stmt = stmt.where(models_f.Offer.name.ilike(f"%{search_query}%"))
+        stmt = stmt.where(__search.get_search_filter(search_query))
 
-    rows = await db_session.execute(stmt)
+    rows = (await db_session.execute(stmt)).all()
+    offer_ids = [row[0] for row in rows]
+
+    category_values = await __ocv.get_category_values_by_offer_ids(db_session, offer_ids)
+    files_offers = await offer_attachment_manager.get_only_files_many(db_session, offer_ids)
 
     result = []
     for row in rows:
-        stmt = select(models_f.OfferCategoryValue.category_value_id).where(
-            models_f.OfferCategoryValue.offer_id == row[0]
-        )
-        values = await db_session.execute(stmt)
-        category_value_ids = [row_[0] for row_ in values.fetchall()]
-        categories = await get_many_by_ids(
-            db_session=db_session, ids=category_value_ids, lazy_load_v=None
-        )
-        category_value = [
-            {"id": category["id"], "value": category["value"]} for category in categories
-        ]
-        files_offer = await offer_attachment_manager.get_only_files(db_session, row[0])
         offer = {
             "id": row[0],
             "name": row[1],
             "description": row[2],
             "price": row[3],
-            "files_offer": files_offer,
-            "category_values": category_value,
+            "files_offer": files_offers.get(row[0]),
+            "category_values": category_values[row[0]],
         }
         result.append(offer)
 
@@ -144,35 +132,44 @@ async def get_mini_by_user_id_offset_limit(
 async def get_root_categories_count_with_offset_limit(
     db_session: AsyncSession, user_id, offset, limit
 ):
-    result = []
-    root_values = await get_root_values(db_session)
-    if not root_values:
-        return None
-
-    for value in root_values:
-        stmt = (
-            select(func.count())
-            .select_from(models_f.Offer)
-            .where(models_f.Offer.user_id == user_id)
-            .where(models_f.OfferCategoryValue.category_value_id == value[0])
-            .where(models_f.Offer.id == models_f.OfferCategoryValue.offer_id)
-            .offset(offset)
-            .limit(limit)
+    """
+    Корневые значения категорий, в которых у пользователя есть офферы, с кол-вом офферов
+    """
+    stmt = (
+        select(
+            CategoryValue.id,
+            CategoryValue.value,
+            CategoryValue.next_carcass_id,
+            func.count(models_f.OfferCategoryValue.offer_id),
+        )
+        .join(CategoryCarcass, CategoryCarcass.id == CategoryValue.carcass_id)
+        .join(
+            models_f.OfferCategoryValue,
+            models_f.OfferCategoryValue.category_value_id == CategoryValue.id,
         )
-        offer_count = (await db_session.execute(stmt)).scalar_one_or_none()
-        if offer_count:
-            files = await category_value_attachment_manager.get_only_files(db_session, value[0])
-            result.append(
-                {
-                    "value_id": value[0],
-                    "value_name": value[1],
-                    "next_carcass_id": value[2],
-                    "offer_count": offer_count,
-                    "files": files,
-                }
-            )
+        .join(models_f.Offer, models_f.Offer.id == models_f.OfferCategoryValue.offer_id)
+        .where(CategoryCarcass.is_root == True)
+        .where(models_f.Offer.user_id == user_id)
+        .group_by(CategoryValue.id)
+        .order_by(CategoryValue.id)
+        .offset(offset)
+        .limit(limit)
+    )
+    rows = (await db_session.execute(stmt)).all()
+    files = await category_value_attachment_manager.get_only_files_many(
+        db_session, [row[0] for row in rows]
+    )
 
-    return result
+    return [
+        {
+            "value_id": row[0],
+            "value_name": row[1],
+            "next_carcass_id": row[2],
+            "offer_count": row[3],
+            "files": files.get(row[0]),
+        }
+        for row in rows
+    ]
 
 
 async def get_offers_by_carcass_id(
@@ -200,11 +197,14 @@ async def get_offers_by_carcass_id(
         .where(CategoryValue.id == models_f.OfferCategoryValue.category_value_id)
     )
 
-    rows = await db_session.execute(stmt)
+    rows = (await db_session.execute(stmt)).all()
+    files_offers = await offer_attachment_manager.get_only_files_many(
+        db_session, [row[0] for row in rows]
+    )
 
     result = []
     for row in rows:
-        files = await offer_attachment_manager.get_only_files(db_session, row[0])
+        files = files_offers.get(row[0])
         offer = {
             "id": row[0],
             "name": row[1],
@@ -268,82 +268,197 @@ async def get_offers_by_value_id(
     return result
 
 
-async def create_offer(
-    db_session: AsyncSession, user_id: int, obj_in: schemas_f.CreateOffer, status: str = None
+# Ограничение на кол-во офферов в одном bulk запросе
+BULK_OFFERS_LIMIT = 500
+
+
+def _build_offer(
+    user_id: int, obj_in: schemas_f.CreateOffer, values: dict, status: str = None
 ) -> models_f.Offer:
-    js_obj = obj_in.model_dump(exclude_unset=True)
+    """
+    values - get_branch_info_by_ids, ветка уже должна быть проверена
+    """
+    js_obj = obj_in.model_dump(exclude_unset=True, exclude={"id"})
     category_ids = js_obj.pop("category_value_ids")
+    is_offer_with_delivery = any(values[id][3] for id in category_ids)
 
-    if not await is_on_one_branch(db_session, category_ids):
-        raise HTTPException(403, "Category value must be on one branch")
-    
-    is_offer_with_delivery_stmt = select(
-        exists(CategoryValue.is_offer_with_delivery)
-        .where(CategoryValue.id.in_(category_ids))
-        .where(CategoryValue.is_offer_with_delivery == True)
-    )
-    is_offer_with_delivery = (await db_session.execute(is_offer_with_delivery_stmt)).scalar_one_or_none()
-    is_autogive_enabled = False if is_offer_with_delivery else None
-    
     db_obj = models_f.Offer(
         user_id=user_id,
-        is_autogive_enabled=is_autogive_enabled,
+        is_autogive_enabled=False if is_offer_with_delivery else None,
         upped_at=int(time.time()),
+        category_value_ids=category_ids,
         **js_obj,
     )
-    
+
     if status:
         db_obj.status = status
 
+    return db_obj
+
+
+def _apply_offer_update(db_obj: models_f.Offer, update_data: dict) -> tuple[list, list]:
+    """
+    Обновляет поля оффера, возвращает (добавленные, удалённые) строки offer_category_value
+    """
+    obj_data = jsonable_encoder(db_obj)
+    for field in obj_data:
+        if field in update_data and field != "category_value_ids":
+            setattr(db_obj, field, update_data[field])
+
+    category_value_ids = update_data.get("category_value_ids")
+    if not category_value_ids:
+        return [], []
+
+    old_ids = [value.category_value_id for value in db_obj.category_values]
+    db_obj.category_value_ids = category_value_ids
+
+    return __ocv.diff_offer_category_values(db_obj.id, old_ids, category_value_ids)
+
+
+def _check_bulk_size(offers_in: list):
+    if len(offers_in) > BULK_OFFERS_LIMIT:
+        raise HTTPException(400, f"No more than {BULK_OFFERS_LIMIT} offers per request")
+
+
+async def create_offer(
+    db_session: AsyncSession,
+    user_id: int,
+    obj_in: schemas_f.CreateOffer,
+    status: str = None,
+    need_commit: bool = True,
+) -> models_f.Offer:
+    values = await get_branch_info_by_ids(db_session, obj_in.category_value_ids)
+    if not check_one_branch(values, obj_in.category_value_ids):
+        raise HTTPException(403, "Category value must be on one branch")
+
+    db_obj = _build_offer(user_id, obj_in, values, status)
     db_session.add(db_obj)
     await db_session.flush()
 
-    for category_id in category_ids:
-        await __ocv.create_offer_category_value(
-            db_session, category_value_id=category_id, offer_id=db_obj.id
-        )
+    await __ocv.create_offer_category_values_many(
+        db_session, [(db_obj.id, category_id) for category_id in obj_in.category_value_ids]
+    )
+
+    if not need_commit:
+        return db_obj
 
     await db_session.commit()
     await db_session.refresh(db_obj)
+    await offers_cache.invalidate_offers(db_obj.id)
     
     return db_obj
 
 
-# ! need refactor...
+async def create_offers_many(
+    db_session: AsyncSession, user_id: int, offers_in: list[schemas_f.CreateOffer]
+) -> list[models_f.Offer]:
+    """
+    Все офферы создаются в одной транзакции, при любой ошибке не создаётся ни один
+    """
+    _check_bulk_size(offers_in)
+
+    values = await get_branch_info_by_ids(
+        db_session, [id for obj_in in offers_in for id in obj_in.category_value_ids]
+    )
+    for index, obj_in in enumerate(offers_in):
+        if not check_one_branch(values, obj_in.category_value_ids):
+            raise HTTPException(403, f"Category value must be on one branch: offers[{index}]")
+
+    db_objs = [_build_offer(user_id, obj_in, values) for obj_in in offers_in]
+    db_session.add_all(db_objs)
+    await db_session.flush()
+
+    await __ocv.create_offer_category_values_many(
+        db_session,
+        [
+            (db_obj.id, category_id)
+            for db_obj, obj_in in zip(db_objs, offers_in)
+            for category_id in obj_in.category_value_ids
+        ],
+    )
+
+    await db_session.commit()
+    await offers_cache.invalidate_offers(*[db_obj.id for db_obj in db_objs])
+
+    return db_objs
+
+
 async def update_offer(
     db_session: AsyncSession, db_obj: models_f.Offer, obj_in: schemas_f.OfferBase, need_commit: bool = True
 ):
-    
-    obj_data = jsonable_encoder(db_obj)
-
+    """
+    need_commit == False - изменения только flush, commit и инвалидация кэша на вызывающем
+    """
     if isinstance(obj_in, dict):
         update_data = obj_in
     else:
         update_data = obj_in.model_dump(exclude_unset=True)
 
+    # Пустой список, как и отсутствие поля - категории не меняются (см. _apply_offer_update)
     category_value_ids = update_data.get("category_value_ids")
-    if not await is_on_one_branch(db_session, category_value_ids):
+    if category_value_ids and not await is_on_one_branch(db_session, category_value_ids):
         raise HTTPException(403, "Category value must be on one branch")
-    
-    for field in obj_data:
-        if field in update_data:
-            setattr(db_obj, field, update_data[field])
 
-    category_value_ids = update_data.get("category_value_ids")
-    if category_value_ids:
-        db_obj.category_values.clear()
-        for value in category_value_ids:
-            await __ocv.create_offer_category_value(
-                    db_session, category_value_id=value, offer_id=db_obj.id
-                )
-        
+    added, removed = _apply_offer_update(db_obj, update_data)
+    await __ocv.delete_offer_category_values_many(db_session, removed)
+    await __ocv.create_offer_category_values_many(db_session, added)
+
     db_session.add(db_obj)
+    if not need_commit:
+        await db_session.flush()
+        return db_obj
+
     await db_session.commit()
     await db_session.refresh(db_obj)
+    await offers_cache.invalidate_offers(db_obj.id)
 
     return db_obj
 
 
+async def update_offers_many(
+    db_session: AsyncSession, user_id: int, offers_in: list[schemas_f.BulkUpdateOffer]
+) -> list[models_f.Offer]:
+    """
+    Все офферы обновляются в одной транзакции, при любой ошибке не меняется ни один
+    """
+    _check_bulk_size(offers_in)
+
+    offer_ids = [obj_in.id for obj_in in offers_in]
+    if len(set(offer_ids)) != len(offer_ids):
+        raise HTTPException(400, "Offer ids must be unique")
+
+    stmt = select(models_f.Offer).where(
+        models_f.Offer.user_id == user_id, models_f.Offer.id.in_(offer_ids)
+    )
+    db_objs = {offer.id: offer for offer in (await db_session.execute(stmt)).scalars().all()}
+    missing_ids = [id for id in offer_ids if id not in db_objs]
+    if missing_ids:
+        raise HTTPException(404, f"Offers not found: {missing_ids}")
+
+    values = await get_branch_info_by_ids(
+        db_session, [id for obj_in in offers_in for id in obj_in.category_value_ids]
+    )
+
+    all_added, all_removed = [], []
+    for index, obj_in in enumerate(offers_in):
+        if not check_one_branch(values, obj_in.category_value_ids):
+            raise HTTPException(403, f"Category value must be on one branch: offers[{index}]")
+
+        added, removed = _apply_offer_update(
+            db_objs[obj_in.id], obj_in.model_dump(exclude_unset=True, exclude={"id"})
+        )
+        all_added.extend(added)
+        all_removed.extend(removed)
+
+    await __ocv.delete_offer_category_values_many(db_session, all_removed)
+    await __ocv.create_offer_category_values_many(db_session, all_added)
+
+    await db_session.commit()
+    await offers_cache.invalidate_offers(*offer_ids)
+
+    return [db_objs[id] for id in offer_ids]
+
+
 async def delete_offer(db_session: AsyncSession, user_id: int, offer_id: int):
     offer = await get_raw_offer_by_user_id(db_session, user_id=user_id, offer_id=offer_id)
 
@@ -352,6 +467,7 @@ async def delete_offer(db_session: AsyncSession, user_id: int, offer_id: int):
 
     await db_session.delete(offer)
     await db_session.commit()
+    await offers_cache.invalidate_offers(offer.id)
 
     return offer
 
@@ -362,6 +478,7 @@ async def up_offer(db_session: AsyncSession, offer: models_f.Offer, interval: fl
         offer.upped_at = datetime.now().timestamp()
         db_session.add(offer)
         await db_session.commit()
+        await offers_cache.invalidate_offers(offer.id)
         return offer
     else:
         wait_seconds = offer.upped_at + unix_interval - datetime.now().timestamp()
@@ -1,21 +1,19 @@
 import time
-from typing import List
+from typing import Any, List
 
-from fastapi import Depends
+from fastapi import Depends, HTTPException
 from fastapi.encoders import jsonable_encoder
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, update, exists, delete, and_, asc, func, desc
+from sqlalchemy import select, update, exists, delete, and_, asc, func, desc, tuple_
 from sqlalchemy.orm import selectinload
 
 from .. import models as models_f
 from .. import schemas as schemas_f
-from app.users import models as models_u
-from . import __offer_category_value as __ocv
+from . import __offer_search as __search
 import app.categories.models as models_c
-from app.attachment.services import offer_attachment_manager
-from app.attachment.services import user_attachment_manager
-from app.categories.services.categories_values import get_many_by_ids
-from app.users.services import get_by_id
+from app.users.models import User
+from core.settings import BASE_FILE_URL
+from core.utils import encode_cursor, decode_cursor
 
 
 # Дублирование кода, можно переписать по нормальному старые методы,
@@ -36,46 +34,61 @@ async def get_raw_offer_by_id(
 async def get_offer_by_id(
     db_session: AsyncSession, id: int,
 ) -> None | dict:
-    stmt = select(models_f.Offer).where(models_f.Offer.id == id).where(models_f.Offer.status == "active")
-    offer: models_f.Offer | None = (await db_session.execute(stmt)).scalar()
+    stmt = (
+        select(
+            models_f.Offer,
+            models_f.Offer.__table__.c.card,
+            User.rating_sum,
+            User.rating_count,
+        )
+        .join(User, User.id == models_f.Offer.user_id)
+        .where(models_f.Offer.id == id)
+        .where(models_f.Offer.status == "active")
+    )
+    row = (await db_session.execute(stmt)).first()
 
-    if not offer:
+    if not row:
         return None
 
-    user = await get_by_id(db_session=db_session, id=offer.user_id)
-    user_files = await user_attachment_manager.get_only_files(
-        db_session=db_session, user_id=user.id
-    )
-    stmt = select(models_f.OfferCategoryValue.category_value_id).where(
-        models_f.OfferCategoryValue.offer_id == offer.id
-    )
-    values = await db_session.execute(stmt)
-    category_value_ids = [row[0] for row in values.fetchall()]
-    categories = await get_many_by_ids(
-        db_session=db_session, ids=category_value_ids, lazy_load_v=None
-    )
-    category_value = [
-        {"id": category["id"], "value": category["value"]} for category in categories
-    ]
-    files = await offer_attachment_manager.get_only_files(db_session, offer.id)
+    offer, card, user_rating_sum, user_rating_count = row
+    card = card or {}
     offer = offer.to_dict()
-    offer["offer_files"] = files
-    offer["username"] = user.username
-    offer["user_files"] = user_files
-    offer["category_values"] = category_value
+    offer["offer_files"] = _render_card_files(card.get("offer_files"))
+    offer["username"] = card.get("username")
+    offer["user_files"] = _render_card_files(card.get("user_files"))
+    offer["user_rating_sum"] = user_rating_sum
+    offer["user_rating_count"] = user_rating_count
+    offer["category_values"] = card.get("category_values", [])
 
     return offer
 
 
-async def get_mini_by_offset_limit(
-    db_session: AsyncSession,
-    *,
-    offset: int,
-    limit: int,
+def _get_mini_sort(
+    is_descending: bool | None,
+    search_query: str = None,
+    by_relevance: bool = False,
+    by_rating: bool = False,
+) -> tuple[str, Any, bool]:
+    """
+    (имя сортировки для курсора, колонка сортировки, по убыванию ли)
+    """
+    if by_relevance and search_query:
+        return "relevance", __search.get_search_rank(search_query), True
+
+    if by_rating:
+        return "rating", models_f.Offer.__table__.c.rating, True
+
+    if is_descending is None:
+        return "upped_at", models_f.Offer.upped_at, True
+
+    return ("price_desc" if is_descending else "price_asc"), models_f.Offer.price, is_descending
+
+
+def _get_mini_stmt(
+    sort_column,
     category_value_ids: list[int] = None,
-    is_descending: bool = None,
     search_query: str = None,
-) -> list[models_f.Offer]:
+):
     stmt = (
         select(
             models_f.Offer.id,
@@ -83,58 +96,129 @@ async def get_mini_by_offset_limit(
             models_f.Offer.description,
             models_f.Offer.price,
             models_f.Offer.user_id,
+            models_f.Offer.__table__.c.card,
+            models_f.Offer.real_count,
+            models_f.Offer.rating_sum,
+            models_f.Offer.rating_count,
+            sort_column,
         )
         .where(models_f.Offer.status == "active")
-        .order_by(
-            desc(models_f.Offer.upped_at)
-            if is_descending is None
-            else desc(models_f.Offer.price)
-            if is_descending
-            else asc(models_f.Offer.price)
-        )
-        .offset(offset)
-        .limit(limit)
     )
 
     if category_value_ids:
-        stmt = stmt.where(
-            and_(
-                models_f.Offer.category_values.any(
-                    models_f.OfferCategoryValue.category_value_id == cv_id
-                )
-                for cv_id in category_value_ids
-            )
-        )
+        stmt = stmt.where(models_f.Offer.category_value_ids.contains(category_value_ids))
 
     if search_query:
-        stmt = stmt.where(models_f.Offer.name.ilike(f"%{search_query}%"))
+        stmt = stmt.where(__search.get_search_filter(search_query))
+
+    return stmt
 
-    rows = await db_session.execute(stmt)
+
+async def get_mini_by_offset_limit(
+    db_session: AsyncSession,
+    *,
+    offset: int,
+    limit: int,
+    category_value_ids: list[int] = None,
+    is_descending: bool = None,
+    search_query: str = None,
+    by_relevance: bool = False,
+    by_rating: bool = False,
+) -> list[dict]:
+    _, sort_column, sort_desc = _get_mini_sort(is_descending, search_query, by_relevance, by_rating)
+    order = desc if sort_desc else asc
+    stmt = (
+        _get_mini_stmt(sort_column, category_value_ids, search_query)
+        .order_by(order(sort_column), order(models_f.Offer.id))
+        .offset(offset)
+        .limit(limit)
+    )
+
+    rows = (await db_session.execute(stmt)).all()
+
+    return _build_offers_mini(rows)
+
+
+async def get_mini_by_cursor_limit(
+    db_session: AsyncSession,
+    *,
+    cursor: str | None,
+    limit: int,
+    category_value_ids: list[int] = None,
+    is_descending: bool = None,
+    search_query: str = None,
+    by_relevance: bool = False,
+    by_rating: bool = False,
+) -> tuple[list[dict], str | None]:
+    """
+    Keyset пагинация: вместо OFFSET ищем строки строго после (ключ сортировки, id)
+     последней строки предыдущей страницы, стоимость страницы не зависит от глубины
+    Возвращает (офферы, курсор следующей страницы или None)
+    """
+    sort_name, sort_column, sort_desc = _get_mini_sort(is_descending, search_query, by_relevance, by_rating)
+    stmt = _get_mini_stmt(sort_column, category_value_ids, search_query)
+
+    if cursor:
+        values = decode_cursor(cursor)
+        if (
+            not values
+            or len(values) != 3
+            or values[0] != sort_name
+            or not isinstance(values[1], (int, float))
+            or not isinstance(values[2], int)
+        ):
+            raise HTTPException(400, "Invalid cursor")
+
+        row_key = tuple_(sort_column, models_f.Offer.id)
+        stmt = stmt.where(row_key < tuple(values[1:]) if sort_desc else row_key > tuple(values[1:]))
+
+    order = desc if sort_desc else asc
+    stmt = stmt.order_by(order(sort_column), order(models_f.Offer.id)).limit(limit + 1)
+
+    rows = (await db_session.execute(stmt)).all()
+    next_cursor = None
+
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last_row = rows[-1]
+        next_cursor = encode_cursor(sort_name, last_row._mapping[sort_column], last_row[0])
+
+    return _build_offers_mini(rows), next_cursor
+
+
+def _render_card_files(files: list | None) -> list[str] | None:
+    """
+    [[hash, attachment_id], ...] из карточки в ссылки, None если файлов нет (как get_only_files)
+    """
+    if not files:
+        return None
+
+    return [
+        BASE_FILE_URL.format(file_hash=file_hash, attachment_id=attachment_id)
+        for file_hash, attachment_id in files
+    ]
+
+
+def _build_offers_mini(rows: list) -> list[dict]:
+    """
+    rows - (id, name, description, price, user_id, card, real_count, rating_sum, rating_count, ...),
+     всё нужное уже лежит в строке оффера
+    """
     result = []
     for row in rows:
-        stmt = select(models_f.OfferCategoryValue.category_value_id).where(
-            models_f.OfferCategoryValue.offer_id == row[0]
-        )
-        values = await db_session.execute(stmt)
-        category_value_ids = [row_[0] for row_ in values.fetchall()]
-        categories = await get_many_by_ids(
-            db_session=db_session, ids=category_value_ids, lazy_load_v=None
-        )
-        category_value = [
-            {"id": category["id"], "value": category["value"]} for category in categories
-        ]
-        files_offer = await offer_attachment_manager.get_only_files(db_session, row[0])
-        files_user = await user_attachment_manager.get_only_files(db_session, row[4])
-        user = await get_by_id(db_session=db_session, id=row[4])
+        card = row[5] or {}
         offer = {
             "id": row[0],
             "name": row[1],
             "description": row[2],
             "price": row[3],
-            "files_offer": files_offer,
-            "files_user": files_user,
-            "username": user.username,
-            "category_values": category_value,
+            "files_offer": _render_card_files(card.get("offer_files")),
+            "files_user": _render_card_files(card.get("user_files")),
+            "username": card.get("username"),
+            "category_values": card.get("category_values", []),
+            "count": row[6],
+            "rating_sum": row[7],
+            "rating_count": row[8],
         }
         result.append(offer)
 
@@ -1 +1,3 @@
-from .purchase import Purchase, Parcel, Review
\ No newline at end of file
+from .purchase import Purchase, Parcel, Review
+from .outbox import PurchaseOutbox
+from .sales_stats import SellerStats, SellerStatusStats, SellerDailyStats, SellerOfferStats
@@ -0,0 +1,41 @@
+from sqlalchemy import Column, Integer, String, text, event
+from sqlalchemy.dialects.postgresql import JSONB
+import sqlalchemy
+
+from core.database import Base
+
+
+class PurchaseOutbox(Base):
+    """
+    Побочные эффекты покупок (чат, системное сообщение, SSE), записываются
+     в той же транзакции что и покупка, отправляются фоновым PurchaseOutboxDispatcher
+    """
+    __tablename__ = "purchase_outbox"
+
+    id = Column(Integer, primary_key=True)
+    event = Column(String, nullable=False)
+    payload = Column(JSONB, nullable=False)
+
+
+# Уведомление приходит только после commit, сами данные диспетчер забирает из таблицы
+notify_purchase_outbox_sql_func = """
+CREATE OR REPLACE FUNCTION notify_purchase_outbox()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM pg_notify('new_purchase_outbox', '');
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+
+@event.listens_for(PurchaseOutbox.__table__, "after_create")
+def create_purchase_outbox_trigger(
+    target: PurchaseOutbox.__table__, connection: sqlalchemy.engine.base.Connection, **kw
+):
+    connection.execute(text(notify_purchase_outbox_sql_func))
+    connection.execute(text("""
+    CREATE OR REPLACE TRIGGER notify_purchase_outbox_trigger
+    AFTER INSERT ON purchase_outbox
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_purchase_outbox();
+    """))
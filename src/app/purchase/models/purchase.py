@@ -1,7 +1,8 @@
 from time import time
 
-from sqlalchemy import Column, Integer, SmallInteger, String, VARCHAR, Boolean, Enum, ForeignKey, CheckConstraint
+from sqlalchemy import Column, Integer, SmallInteger, String, VARCHAR, Boolean, Enum, ForeignKey, CheckConstraint, Index, text, event
 from sqlalchemy.orm import relationship, Mapped
+import sqlalchemy
 
 from core.database import Base
 from app.users.models import User
@@ -12,10 +13,29 @@ from app.offers.models import Offer
 #  хранить в скрытом от пользователей состоянии
 class Purchase(Base):
     __tablename__ = "purchase"
+    __table_args__ = (
+        # Под keyset пагинацию списков покупок (buyer_id), продаж (seller_id) и продаж оффера (offer_id):
+        #  (владелец, ключ сортировки, id)
+        #  status в индекс не входит - по умолчанию выбираются все статусы, а IN по второй
+        #  колонке индекса ломает порядок сортировки
+        Index("ix_purchase_buyer_id_created_at_id", "buyer_id", "created_at", "id"),
+        Index("ix_purchase_buyer_id_updated_at_id", "buyer_id", "updated_at", "id"),
+        Index("ix_purchase_seller_id_created_at_id", "seller_id", "created_at", "id"),
+        Index("ix_purchase_seller_id_updated_at_id", "seller_id", "updated_at", "id"),
+        Index("ix_purchase_offer_id_created_at_id", "offer_id", "created_at", "id"),
+        Index("ix_purchase_offer_id_updated_at_id", "offer_id", "updated_at", "id"),
+        # Автозавершение просроченных review: updated_at - время перехода в review
+        Index(
+            "ix_purchase_review_updated_at_id", "updated_at", "id",
+            postgresql_where=text("status = 'review'"),
+        ),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     buyer_id = Column(Integer, ForeignKey("user.id", ondelete="CASCADE"))
     offer_id = Column(Integer, ForeignKey("offer.id", ondelete="SET NULL"))
+    # Продавец на момент покупки, остаётся после удаления оффера
+    seller_id = Column(Integer, ForeignKey("user.id", ondelete="SET NULL"))
     name = Column(String)
     description = Column(String)
     price = Column(Integer)
@@ -29,10 +49,12 @@ class Purchase(Base):
     status = Column(Enum("process", "review", "completed", "dispute", "refund", name="purchase_status"), default="process")
     # Указывает есть ли отзыв, не путать review в статусе и review - отзыв
     is_reviewed = Column(Boolean, nullable=False, default=False)
+    # Увеличивается при каждой смене статуса, клиент может передать ожидаемую версию
+    version = Column(Integer, nullable=False, default=1)
 
     parcels: Mapped[list["Parcel"]] = relationship(back_populates="purchase", lazy="selectin")
     review: Mapped["Review"] = relationship(back_populates="purchase", lazy="noload")
-    buyer: Mapped["User"] = relationship(lazy="noload")
+    buyer: Mapped["User"] = relationship(foreign_keys=[buyer_id], lazy="noload")
     offer: Mapped["Offer"] = relationship(lazy="noload")
     
     def to_dict(self, *args):
@@ -73,7 +95,86 @@ class Review(Base):
     
     purchase_id = Column(Integer, ForeignKey('purchase.id', ondelete="CASCADE"), primary_key=True)
     offer_id = Column(Integer, ForeignKey('offer.id', ondelete="SET NULL"))
+    # Копия purchase.seller_id - триггер рейтинга продавца не зависит от оффера
+    seller_id = Column(Integer, ForeignKey('user.id', ondelete="SET NULL"))
     rating = Column(SmallInteger, CheckConstraint('rating >= 1 AND rating <= 5', name='check_rating_range'), nullable=False)
     value = Column(VARCHAR(4096), nullable=True)
 
     purchase: Mapped["Purchase"] = relationship(back_populates="review", lazy="noload")
+
+
+# offer.rating_sum/rating_count и те же поля продавца ("user"), statement-level,
+#  изменения по одному офферу/продавцу применяются одним UPDATE. Продавец берётся
+#  из review.seller_id, поэтому отзывы удалённых офферов остаются в его рейтинге
+review_rating_sql_func = """
+CREATE OR REPLACE FUNCTION review_rating_update()
+RETURNS TRIGGER AS $$
+DECLARE
+    direction INTEGER := CASE WHEN TG_OP = 'INSERT' THEN 1 ELSE -1 END;
+BEGIN
+    WITH changed AS (
+        SELECT offer_id, SUM(rating) AS rating_sum, COUNT(*) AS rating_count
+        FROM changed_rows WHERE offer_id IS NOT NULL GROUP BY offer_id
+    )
+    UPDATE offer o SET
+        rating_sum = o.rating_sum + direction * c.rating_sum,
+        rating_count = o.rating_count + direction * c.rating_count
+    FROM changed c WHERE o.id = c.offer_id;
+
+    UPDATE "user" u SET
+        rating_sum = u.rating_sum + direction * s.rating_sum,
+        rating_count = u.rating_count + direction * s.rating_count
+    FROM (
+        SELECT seller_id, SUM(rating) AS rating_sum, COUNT(*) AS rating_count
+        FROM changed_rows WHERE seller_id IS NOT NULL GROUP BY seller_id
+    ) s
+    WHERE u.id = s.seller_id;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+
+# seller_id добавлен в уже существующие таблицы: create_all новые колонки и индексы не добавляет,
+#  поэтому они создаются здесь, колонка заполняется из оффера (для удалённых офферов остаётся NULL)
+purchase_seller_id_sql = [
+    'ALTER TABLE purchase ADD COLUMN IF NOT EXISTS seller_id INTEGER REFERENCES "user"(id) ON DELETE SET NULL',
+    'ALTER TABLE review ADD COLUMN IF NOT EXISTS seller_id INTEGER REFERENCES "user"(id) ON DELETE SET NULL',
+    """
+    UPDATE purchase p SET seller_id = o.user_id
+    FROM offer o WHERE o.id = p.offer_id AND p.seller_id IS NULL
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_purchase_seller_id_created_at_id ON purchase (seller_id, created_at, id)",
+    "CREATE INDEX IF NOT EXISTS ix_purchase_seller_id_updated_at_id ON purchase (seller_id, updated_at, id)",
+    """
+    UPDATE review r SET seller_id = p.seller_id
+    FROM purchase p WHERE p.id = r.purchase_id AND r.seller_id IS NULL AND p.seller_id IS NOT NULL
+    """,
+]
+
+
+# Base.metadata - срабатывает при каждом create_all, в том числе когда таблицы уже есть,
+#  до backfill агрегатов продавца (models/sales_stats.py), которые считаются по seller_id
+@event.listens_for(Base.metadata, "after_create")
+def fill_purchase_seller_id(
+    target: sqlalchemy.MetaData, connection: sqlalchemy.engine.base.Connection, **kw
+):
+    for upgrade_sql in purchase_seller_id_sql:
+        connection.execute(text(upgrade_sql))
+
+
+@event.listens_for(Review.__table__, "after_create")
+def create_review_rating_triggers(
+    target: Review.__table__, connection: sqlalchemy.engine.base.Connection, **kw
+):
+    connection.execute(text(review_rating_sql_func))
+    for event_sql, transition in (
+        ("INSERT", "NEW TABLE AS changed_rows"),
+        ("DELETE", "OLD TABLE AS changed_rows"),
+    ):
+        connection.execute(text(f"""
+        CREATE OR REPLACE TRIGGER review_rating_after_{event_sql.lower()}_trigger
+        AFTER {event_sql} ON review
+        REFERENCING {transition}
+        FOR EACH STATEMENT EXECUTE FUNCTION review_rating_update();
+        """))
@@ -0,0 +1,118 @@
+"""
+Агрегаты для дашборда продавца, обновляются инкрементально в PurchaseManager
+ в той же транзакции что и покупка/отзыв. При создании таблиц заполняются
+ по уже существующим покупкам и отзывам
+"""
+from time import time
+
+from sqlalchemy import Column, Integer, BigInteger, String, ForeignKey, Index, text, event
+import sqlalchemy
+
+from core.database import Base
+
+
+class SellerStats(Base):
+    __tablename__ = "seller_stats"
+
+    seller_id = Column(Integer, ForeignKey("user.id", ondelete="CASCADE"), primary_key=True)
+    purchases_count = Column(Integer, nullable=False, default=0)
+    items_count = Column(BigInteger, nullable=False, default=0)
+    revenue = Column(BigInteger, nullable=False, default=0)
+    reviews_count = Column(Integer, nullable=False, default=0)
+    rating_sum = Column(BigInteger, nullable=False, default=0)
+
+
+class SellerStatusStats(Base):
+    __tablename__ = "seller_status_stats"
+
+    seller_id = Column(Integer, ForeignKey("user.id", ondelete="CASCADE"), primary_key=True)
+    status = Column(String(16), primary_key=True)
+    purchases_count = Column(Integer, nullable=False, default=0)
+
+
+class SellerDailyStats(Base):
+    __tablename__ = "seller_daily_stats"
+
+    seller_id = Column(Integer, ForeignKey("user.id", ondelete="CASCADE"), primary_key=True)
+    # unix время начала дня (UTC) создания покупки
+    day = Column(Integer, primary_key=True)
+    purchases_count = Column(Integer, nullable=False, default=0)
+    items_count = Column(BigInteger, nullable=False, default=0)
+    revenue = Column(BigInteger, nullable=False, default=0)
+
+
+class SellerOfferStats(Base):
+    __tablename__ = "seller_offer_stats"
+    __table_args__ = (
+        # Топ офферов продавца по выручке
+        Index("ix_seller_offer_stats_seller_id_revenue", "seller_id", "revenue"),
+    )
+
+    offer_id = Column(Integer, ForeignKey("offer.id", ondelete="CASCADE"), primary_key=True)
+    seller_id = Column(Integer, ForeignKey("user.id", ondelete="CASCADE"), nullable=False)
+    purchases_count = Column(Integer, nullable=False, default=0)
+    items_count = Column(BigInteger, nullable=False, default=0)
+    revenue = Column(BigInteger, nullable=False, default=0)
+    reviews_count = Column(Integer, nullable=False, default=0)
+    rating_sum = Column(BigInteger, nullable=False, default=0)
+
+
+SECONDS_IN_DAY = 86400
+
+sales_stats_backfill_sql = {
+    "seller_stats": """
+    INSERT INTO seller_stats (seller_id, purchases_count, items_count, revenue, reviews_count, rating_sum, created_at, updated_at)
+    SELECT s.seller_id, SUM(s.purchases_count), SUM(s.items_count), SUM(s.revenue),
+           SUM(s.reviews_count), SUM(s.rating_sum), :now, :now
+    FROM (
+        SELECT seller_id, COUNT(*) AS purchases_count, SUM(count) AS items_count,
+               SUM(price::BIGINT * count) AS revenue, 0 AS reviews_count, 0 AS rating_sum
+        FROM purchase WHERE seller_id IS NOT NULL GROUP BY seller_id
+        UNION ALL
+        SELECT seller_id, 0, 0, 0, COUNT(*), SUM(rating)
+        FROM review WHERE seller_id IS NOT NULL GROUP BY seller_id
+    ) s
+    GROUP BY s.seller_id
+    """,
+    "seller_status_stats": """
+    INSERT INTO seller_status_stats (seller_id, status, purchases_count, created_at, updated_at)
+    SELECT seller_id, status::TEXT, COUNT(*), :now, :now
+    FROM purchase WHERE seller_id IS NOT NULL
+    GROUP BY seller_id, status
+    """,
+    "seller_daily_stats": f"""
+    INSERT INTO seller_daily_stats (seller_id, day, purchases_count, items_count, revenue, created_at, updated_at)
+    SELECT seller_id, created_at / {SECONDS_IN_DAY} * {SECONDS_IN_DAY}, COUNT(*), SUM(count),
+           SUM(price::BIGINT * count), :now, :now
+    FROM purchase WHERE seller_id IS NOT NULL
+    GROUP BY 1, 2
+    """,
+    "seller_offer_stats": """
+    INSERT INTO seller_offer_stats (offer_id, seller_id, purchases_count, items_count, revenue, reviews_count, rating_sum, created_at, updated_at)
+    SELECT o.id, o.user_id, COALESCE(p.purchases_count, 0), COALESCE(p.items_count, 0),
+           COALESCE(p.revenue, 0), COALESCE(r.reviews_count, 0), COALESCE(r.rating_sum, 0), :now, :now
+    FROM offer o
+    LEFT JOIN (
+        SELECT offer_id, COUNT(*) AS purchases_count, SUM(count) AS items_count,
+               SUM(price::BIGINT * count) AS revenue
+        FROM purchase GROUP BY offer_id
+    ) p ON p.offer_id = o.id
+    LEFT JOIN (
+        SELECT offer_id, COUNT(*) AS reviews_count, SUM(rating) AS rating_sum
+        FROM review GROUP BY offer_id
+    ) r ON r.offer_id = o.id
+    WHERE p.offer_id IS NOT NULL OR r.offer_id IS NOT NULL
+    """,
+}
+
+
+# Таблица агрегатов может создаваться раньше review, поэтому заполняем после всех таблиц,
+#  kw["tables"] - только таблицы, созданные этим create_all
+@event.listens_for(Base.metadata, "after_create")
+def backfill_sales_stats(
+    target: sqlalchemy.MetaData, connection: sqlalchemy.engine.base.Connection, **kw
+):
+    created_tables = {table.name for table in kw.get("tables", [])}
+    for table_name, backfill_sql in sales_stats_backfill_sql.items():
+        if table_name in created_tables:
+            connection.execute(text(backfill_sql), {"now": int(time())})
@@ -2,12 +2,15 @@ import logging
 from typing import Literal
 
 import fastapi
-from fastapi import Depends, APIRouter, HTTPException
+from fastapi import Depends, APIRouter, HTTPException, Header
 from fastapi.responses import JSONResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from core.utils import setup_helper
 from core.depends import depends as deps
 from core.database import get_session
+from core.redis import idempotency as redis_idempotency
+from core.settings import config
 from app.tokens import schemas as schemas_t
 from .. import models, schemas, services
 
@@ -16,6 +19,8 @@ logger = logging.getLogger("uvicorn")
 router = APIRouter()
 base_session = deps.UserSession()
 purchase_manager = services.PurchaseManager()
+setup_helper.add_new_coroutine_def(services.purchase_outbox_dispatcher.setup)
+setup_helper.add_new_coroutine_def(services.review_timeout_scheduler.setup)
 
 
 @router.get("/my")
@@ -48,6 +53,8 @@ async def get_all_purchases(
     ] = fastapi.Query(
         default=["process", "review", "completed", "dispute", "refund"], alias="status"
     ),
+    cursor: str = None,
+    use_cursor: bool = False,
     db_session: AsyncSession = Depends(get_session),
     current_session: tuple[schemas_t.JwtPayload, deps.UserSession] = Depends(
         base_session
@@ -65,10 +72,29 @@ async def get_all_purchases(
       * completed - Покупатель подтвердил выполнение (или заказ был с автовыдачей или поддержка решила, что заказ готов)
       * dispute - Покупатель открыл спор по заказу, ждём решение администрации
       * refund - Деньги возвращаются покупателю (по желанию продавца или поддержки)
+
+    Режим курсора (use_cursor == true или передан cursor), offset игнорируется:<br>
+    &nbsp;- ответ имеет вид {"purchases": [...], "next_cursor": "..."}<br>
+    &nbsp;- для следующей страницы передайте next_cursor в cursor с теми же фильтрами и сортировкой<br>
+    &nbsp;- next_cursor == null значит, что страниц больше нет
     """
     token_data, user_context = current_session
     user = await user_context.get_current_active_user(db_session, token_data)
 
+    if use_cursor or cursor:
+        purchases, next_cursor = await purchase_manager.get_all_purchases_by_cursor(
+            db_session=db_session,
+            buyer_id=user.id,
+            cursor=cursor,
+            limit=abs(limit),
+            by_last_udpate=by_last_udpate,
+            search_query=search_query,
+            is_reviewed=is_reviewed,
+            statuses=statuses,
+        )
+
+        return {"purchases": purchases, "next_cursor": next_cursor}
+
     purchases = await purchase_manager.get_all_purchases(
         db_session=db_session,
         buyer_id=user.id,
@@ -86,34 +112,53 @@ async def get_all_purchases(
 @router.post("/my/create")
 async def create_purchase(
     new_purchase_data: schemas.PurchaseCreate,
+    idempotency_key: str | None = Header(default=None, alias="Idempotency-Key", max_length=128),
     db_session: AsyncSession = Depends(get_session),
     current_session: tuple[schemas_t.JwtPayload, deps.UserSession] = Depends(
         base_session
     ),
 ):
+    """
+    Idempotency-Key - необязательный ключ клиента, повтор запроса с тем же ключом
+     возвращает сохранённый ответ без повторного создания покупки и уведомлений
+    """
     token_data, user_context = current_session
-    user = await user_context.get_current_active_user(db_session, token_data)
 
-    purchase = await purchase_manager.create_purchase(
-        db_session, user.id, new_purchase_data
-    )
-    if not purchase:
-        raise HTTPException(404)
+    async def create() -> models.Purchase:
+        user = await user_context.get_current_active_user(db_session, token_data)
 
-    return purchase
+        purchase = await purchase_manager.create_purchase(
+            db_session, user.id, new_purchase_data
+        )
+        if not purchase:
+            raise HTTPException(404)
+
+        return purchase
+
+    if not idempotency_key:
+        return await create()
+
+    return await redis_idempotency.run_once(
+        f"idempotency:purchase_create:{token_data.user_id or token_data.sub}:{idempotency_key}",
+        redis_idempotency.fingerprint(new_purchase_data),
+        create,
+        config.PURCHASE_IDEMPOTENCY_TTL,
+    )
 
 
 @router.post("/my/complete/")
 async def confirm_purchase(
     state: bool,
     purchase_id: int,
+    version: int = None,
     db_session: AsyncSession = Depends(get_session),
     current_session: tuple[schemas_t.JwtPayload, deps.UserSession] = Depends(
         base_session
     ),
 ):
     """
-    Создаёт спор при state = False, при state = True подтверждает выполнение
+    Создаёт спор при state = False, при state = True подтверждает выполнение<br>
+    version - ожидаемая версия покупки, если покупка уже изменилась - 409
     """
     token_data, user_context = current_session
     user = await user_context.get_current_active_user(db_session, token_data)
@@ -123,6 +168,7 @@ async def confirm_purchase(
         purchase_id=purchase_id,
         buyer_id=user.id,
         purchase_completed=state,
+        expected_version=version,
     )
     if not purchase:
         raise HTTPException(404)
@@ -30,6 +30,8 @@ async def get_all_my_sales(
     ] = fastapi.Query(
         default=["process", "review", "completed", "dispute", "refund"], alias="status"
     ),
+    cursor: str = None,
+    use_cursor: bool = False,
     db_session: AsyncSession = Depends(get_session),
     current_session: tuple[schemas_t.JwtPayload, deps.UserSession] = Depends(
         base_session
@@ -37,10 +39,29 @@ async def get_all_my_sales(
 ):
     """
     Получение всех продаж (продавец)
+
+    Режим курсора (use_cursor == true или передан cursor), offset игнорируется:<br>
+    &nbsp;- ответ имеет вид {"sales": [...], "next_cursor": "..."}<br>
+    &nbsp;- для следующей страницы передайте next_cursor в cursor с теми же фильтрами и сортировкой<br>
+    &nbsp;- next_cursor == null значит, что страниц больше нет
     """
     token_data, user_context = current_session
     user = await user_context.get_current_active_user(db_session, token_data)
 
+    if use_cursor or cursor:
+        sells, next_cursor = await purchase_manager.get_all_sells_by_cursor(
+            db_session=db_session,
+            cursor=cursor,
+            limit=abs(limit),
+            seller_id=user.id,
+            by_last_udpate=by_last_udpate,
+            search_query=search_query,
+            is_reviewed=is_reviewed,
+            statuses=statuses,
+        )
+
+        return {"sales": sells, "next_cursor": next_cursor}
+
     sells = await purchase_manager.get_all_sells(
         db_session=db_session, 
         offset=offset, 
@@ -55,6 +76,31 @@ async def get_all_my_sales(
     return sells
 
 
+@router.get("/my/dashboard")
+async def get_my_sales_dashboard(
+    period: Literal["day", "week"] = "day",
+    days: int = fastapi.Query(default=30, ge=1, le=366),
+    top_limit: int = fastapi.Query(default=5, ge=1, le=50),
+    db_session: AsyncSession = Depends(get_session),
+    current_session: tuple[schemas_t.JwtPayload, deps.UserSession] = Depends(
+        base_session
+    ),
+):
+    """
+    Дашборд продавца (продавец)
+     * period - шаг выручки: по дням или неделям (с понедельника), period_start - unix время начала
+     * days - за сколько последних дней считать выручку
+     * top_limit - количество лучших офферов по выручке
+    Выручка - price * count по дате создания покупки, statuses - текущее количество покупок в каждом статусе
+    """
+    token_data, user_context = current_session
+    user = await user_context.get_current_active_user(db_session, token_data)
+
+    return await services.sales_stats_manager.get_dashboard(
+        db_session, user.id, period=period, days=days, top_limit=top_limit
+    )
+
+
 @router.get("/my/byoffer")
 async def get_sales_by_offer(
     offer_id: int,
@@ -81,18 +127,22 @@ async def get_sales_by_offer(
 @router.post("/my/confirmation")
 async def create_confirmation_request(
     purchase_id: int,
+    version: int = None,
     db_session: AsyncSession = Depends(get_session),
     current_session: tuple[schemas_t.JwtPayload, deps.UserSession] = Depends(
         base_session
     ),
 ):
     """
-    Подтверждение выполнения продажи (продавец)
+    Подтверждение выполнения продажи (продавец)<br>
+    version - ожидаемая версия покупки, если покупка уже изменилась - 409
     """
     token_data, user_context = current_session
     user = await user_context.get_current_active_user(db_session, token_data)
 
-    purchase = await purchase_manager.create_confirmation_request(db_session, purchase_id, user.id)
+    purchase = await purchase_manager.create_confirmation_request(
+        db_session, purchase_id, user.id, expected_version=version
+    )
     return purchase
 
 
@@ -1 +1,4 @@
-from .purchase import PurchaseManager
\ No newline at end of file
+from .purchase import PurchaseManager
+from .outbox import purchase_outbox_dispatcher
+from .sales_stats import sales_stats_manager
+from .review_timeout import review_timeout_scheduler
@@ -0,0 +1,203 @@
+import json
+import asyncio
+import logging
+from typing import NoReturn
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, delete
+
+from .. import models as models_p
+from core.database import event_listener, context_get_session
+from app.messages.routers.message import (
+    base_connection_manager as message_connection_manager,
+)
+from app.messages.services import message_manager
+from app.messages.schemas import SystemMessageCreate
+from app.users.routers.users_notifications import user_notification_manager
+
+
+logger = logging.getLogger("uvicorn")
+
+
+def add_outbox_event(
+    db_session: AsyncSession,
+    event: str,
+    buyer_id: int,
+    seller_id: int,
+    data: dict,
+    comment: str,
+    system_message: str,
+    notify_chat: bool = False,
+    coalesce: bool = False,
+) -> None:
+    """
+    Без commit - событие должно попасть в транзакцию вместе с изменением покупки
+    event - имя SSE события для покупателя и продавца
+    notify_chat - дополнительно отправить обоим new_chat с данными диалога
+    coalesce - события с этим event из одной пачки приходят пользователю
+     одним SSE событием, data - список data всех событий
+    """
+    db_session.add(
+        models_p.PurchaseOutbox(
+            event=event,
+            payload={
+                "buyer_id": buyer_id,
+                "seller_id": seller_id,
+                "data": data,
+                "comment": comment,
+                "system_message": system_message,
+                "notify_chat": notify_chat,
+                "coalesce": coalesce,
+            },
+        )
+    )
+
+
+class PurchaseOutboxDispatcher:
+    """
+    Разбирает purchase_outbox пачками: в одной транзакции находит/создаёт диалоги,
+     пишет системные сообщения и удаляет события, после commit рассылает SSE и ws.
+    Просыпается по pg_notify, poll_interval - на случай потерянного уведомления
+    Пачку может забрать любой процесс - SSE и ws публикуются через redis_broker
+     и доставляются процессом, где подключён пользователь.
+    Гарантия только для записей в БД (диалог, системное сообщение - exactly once вместе с
+     удалением события), push-уведомления at-most-once: если процесс упал между commit
+     и рассылкой, уведомление теряется, а системное сообщение остаётся в истории чата
+    """
+    batch_size: int = 100
+    poll_interval: float = 30
+
+    def __init__(self) -> None:
+        self.__wakeup = asyncio.Event()
+
+    async def setup(self) -> NoReturn:
+        await event_listener.add_listener("new_purchase_outbox", self.outbox_callback)
+        logger.info("Purchase outbox dispatcher setup completed!")
+        await self.run()
+
+    async def outbox_callback(self, _, __, ___, ____):
+        self.__wakeup.set()
+
+    async def run(self) -> NoReturn:
+        while True:
+            self.__wakeup.clear()
+            try:
+                while await self.dispatch_batch() == self.batch_size:
+                    pass
+            except Exception as e:
+                logger.error(f"Purchase outbox dispatch failed: {e}")
+
+            try:
+                await asyncio.wait_for(self.__wakeup.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def dispatch_batch(self) -> int:
+        """
+        Возвращает количество обработанных событий
+        """
+        async with context_get_session() as db_session:
+            stmt = (
+                select(models_p.PurchaseOutbox)
+                .order_by(models_p.PurchaseOutbox.id)
+                .limit(self.batch_size)
+                .with_for_update(skip_locked=True)
+            )
+            outbox_events = (await db_session.execute(stmt)).scalars().all()
+            if not outbox_events:
+                return 0
+
+            prepared = []
+            for outbox_event in outbox_events:
+                try:
+                    async with db_session.begin_nested():
+                        prepared.append(
+                            await self.__prepare(db_session, outbox_event)
+                        )
+                except Exception as e:
+                    # Событие не может быть доставлено (например, удалён пользователь),
+                    #  повторять его бессмысленно
+                    logger.warning(
+                        f"Purchase outbox event {outbox_event.id} dropped: {e}"
+                    )
+
+            delete_stmt = delete(models_p.PurchaseOutbox).where(
+                models_p.PurchaseOutbox.id.in_([e.id for e in outbox_events])
+            )
+            await db_session.execute(delete_stmt)
+            await db_session.commit()
+
+        coalesced: dict[tuple[int, str], list] = {}
+        for event, payload, dialog_data, system_message in prepared:
+            await self.__deliver(event, payload, dialog_data, system_message)
+            if payload.get("coalesce"):
+                for user_id in (payload["buyer_id"], payload["seller_id"]):
+                    coalesced.setdefault((user_id, event), []).append(payload["data"])
+
+        for (user_id, event), data in coalesced.items():
+            try:
+                await self.__notify(
+                    [user_id], event=event, data=json.dumps(data), comment=f"{len(data)} events"
+                )
+            except Exception as e:
+                logger.warning(f"Purchase outbox delivery {event} failed: {e}")
+
+        return len(outbox_events)
+
+    async def __prepare(
+        self, db_session: AsyncSession, outbox_event: models_p.PurchaseOutbox
+    ) -> tuple[str, dict, dict, SystemMessageCreate]:
+        payload = outbox_event.payload
+        buyer_id, seller_id = payload["buyer_id"], payload["seller_id"]
+
+        dialog_data = await message_manager.get_dialog_id_by_user_id(
+            db_session, buyer_id, seller_id
+        )
+        if not dialog_data:
+            dialog_data = await message_manager.create_dialog(
+                db_session, buyer_id, seller_id, need_commit=False
+            )
+            if not dialog_data:
+                raise ValueError("User not found")
+
+        system_message = SystemMessageCreate(
+            chat_id=dialog_data["chat_id"], content=payload["system_message"]
+        )
+        await message_manager.create_system_message(
+            db_session, system_message, need_commit=False
+        )
+
+        return outbox_event.event, payload, dialog_data, system_message
+
+    async def __deliver(
+        self,
+        event: str,
+        payload: dict,
+        dialog_data: dict,
+        system_message: SystemMessageCreate,
+    ) -> None:
+        users_ids = [payload["buyer_id"], payload["seller_id"]]
+        try:
+            if payload["notify_chat"]:
+                await self.__notify(
+                    users_ids,
+                    event="new_chat",
+                    data=json.dumps(dialog_data).replace("\n", " "),
+                    comment="new chat with you created",
+                )
+
+            await message_connection_manager.broadcast(
+                system_message.get_message_broadcast(), users_ids
+            )
+            if not payload.get("coalesce"):
+                await self.__notify(
+                    users_ids, event=event, data=payload["data"], comment=payload["comment"]
+                )
+        except Exception as e:
+            logger.warning(f"Purchase outbox delivery {event} failed: {e}")
+
+    async def __notify(self, users_ids: list[int], **event_data) -> None:
+        await user_notification_manager.publish(users_ids, **event_data)
+
+
+purchase_outbox_dispatcher = PurchaseOutboxDispatcher()
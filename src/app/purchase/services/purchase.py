@@ -1,24 +1,19 @@
 import json
-from typing import Any, Literal
+from typing import Any, Callable, Literal
 from inspect import cleandoc
 
 
-from fastapi.encoders import jsonable_encoder
 from fastapi import HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
-from sqlalchemy import insert, select, delete, exists, desc, asc
-from app.offers.services import get_raw_offer_by_id, update_offer
+from sqlalchemy import insert, select, update, delete, exists, desc, asc, literal, literal_column, tuple_
+from core.utils import encode_cursor, decode_cursor
+from app.offers.services import get_raw_offer_by_id, offers_cache
 from .. import schemas as schemas_p, models as models_p
 from app.offers import models as models_f
 from app.users import models as models_u
 from app.attachment.services import offer_attachment_manager, user_attachment_manager
-from app.messages.routers.message import (
-    base_connection_manager as message_connection_manager,
-)
-from app.messages.services import message_manager
-from app.messages.schemas import SystemMessageCreate
-from app.users.routers.users_notifications import user_notification_manager
+from .outbox import add_outbox_event
+from .sales_stats import sales_stats_manager
 
 
 #  мб нужно начать писать более сложные обработчики ошибок,
@@ -55,110 +50,56 @@ class PurchaseManager:
                 403, "Only one purchase can be created at the same time"
             )
 
+        # Быстрый отказ, точная проверка ниже атомарно вместе со списанием
         offer_real_count = await offer.get_real_count(db_session)
 
         if new_purchase_data.count > offer_real_count:
             raise HTTPException(403, "There is not enough quantity")
 
-        if not offer.is_autogive_enabled:
-            await update_offer(
-                db_session,
-                offer,
-                {"count": offer.count - new_purchase_data.count},
-                need_commit=False,
-            )
-
-        # todo добавить логику времени на сделку
         purchase = models_p.Purchase(
             buyer_id=buyer_id,
             offer_id=offer.id,
+            seller_id=offer.user_id,
             name=offer.name,
             description=offer.description,
             price=offer.price,
             count=new_purchase_data.count,
+            status="review" if offer.is_autogive_enabled else "process",
         )
 
         db_session.add(purchase)
         await db_session.flush()
 
         if offer.is_autogive_enabled:
-            subquery = (
-                select(models_f.Delivery.id)
-                .where(models_f.Delivery.offer_id == offer.id)
-                .limit(new_purchase_data.count)
-            )
-            delete_delivery_subquery = (
-                delete(models_f.Delivery)
-                .where(models_f.Delivery.id.in_(subquery))
-                .returning(models_f.Delivery.value)
-            )
-            q = await db_session.execute(delete_delivery_subquery)
-            deleted_deliveries: list[str] = q.scalars().all()
-
-            for delivery_value in deleted_deliveries:
-                create_parcel_stmt = insert(models_p.Parcel).values(
-                    purchase_id=purchase.id, value=delivery_value
-                )
-                await db_session.execute(create_parcel_stmt)
-            
-            await self.__update_purchase(
-                db_session, purchase, {"status": "review"}
-            )
-
-        buyer_notifications = user_notification_manager.sse_managers.get(
-            purchase.buyer_id
-        )
-        seller_notifications = user_notification_manager.sse_managers.get(offer.user_id)
-        dialog_data = await message_manager.get_dialog_id_by_user_id(
-            db_session, buyer_id, offer.user_id
-        )
-        if not dialog_data:
-            dialog_data = await message_manager.create_dialog(
-                db_session, buyer_id, offer.user_id
-            )
-            if not dialog_data:
-                raise HTTPException(404, "User not found, How did you get here?")
-
-        event_data = json.dumps(dialog_data).replace("\n", " ")
-        if buyer_notifications:
-            await buyer_notifications.create_event(
-                event="new_chat",
-                data=event_data,
-                comment="new chat with you created",
+            parcels_count = await self.__claim_deliveries_to_parcels(
+                db_session, offer.id, purchase.id, new_purchase_data.count
             )
+            if parcels_count < new_purchase_data.count:
+                raise HTTPException(403, "There is not enough quantity")
+        elif await self.__take_offer_count(db_session, offer.id, new_purchase_data.count) is None:
+            raise HTTPException(403, "There is not enough quantity")
 
-        if seller_notifications:
-            await seller_notifications.create_event(
-                event="new_chat",
-                data=event_data,
-                comment="new chat with you created",
-            )
+        await db_session.refresh(purchase)
+        await sales_stats_manager.purchase_created(db_session, offer.user_id, purchase)
 
-        purchase_event = (
-            f"{purchase.buyer_id} купил у {offer.user_id} "
-            + f"оффер '{offer.name}' в количестве {purchase.count} на сумму {purchase.price * purchase.count}"
-        )
+        # Чат, системное сообщение и уведомления отправит диспетчер outbox после commit,
+        #  строки оффера/автовыдачи заблокированы до конца транзакции, её держим короткой
         purchase_dict_data = purchase.to_dict("parcels")
-        system_message = SystemMessageCreate(
-            chat_id=dialog_data["chat_id"],
-            content=json.dumps(purchase_dict_data),
-        )
-        await message_connection_manager.send_and_create_system_message(
-            db_session, system_message, [purchase.buyer_id, offer.user_id]
+        add_outbox_event(
+            db_session,
+            "new_purchase",
+            buyer_id=purchase.buyer_id,
+            seller_id=offer.user_id,
+            data=purchase_dict_data,
+            comment=(
+                f"{purchase.buyer_id} купил у {offer.user_id} "
+                + f"оффер '{offer.name}' в количестве {purchase.count} на сумму {purchase.price * purchase.count}"
+            ),
+            system_message=json.dumps(purchase_dict_data),
+            notify_chat=True,
         )
-
-        if buyer_notifications:
-            await buyer_notifications.create_event(
-                event="new_purchase", data=purchase_dict_data, comment=purchase_event
-            )
-
-        if seller_notifications:
-            await seller_notifications.create_event(
-                event="new_purchase", data=purchase_dict_data, comment=purchase_event
-            )
-        
         await db_session.commit()
-        await db_session.refresh(purchase)
+        await offers_cache.invalidate_offers(offer.id)
 
         return purchase
 
@@ -167,55 +108,46 @@ class PurchaseManager:
         db_session: AsyncSession,
         purchase_id: int,
         seller_id: int,
+        expected_version: int | None = None,
     ):
         """
         Продавец после выполнения заказа меняет статус на проверку,
          после этого пользователь должен подтвердить выполнение
         Метод для пользователя
         """
-        purchase = await self.get_sale(db_session, purchase_id, seller_id)
-        if not purchase:
-            raise HTTPException(404, "Sale not found")
+        transition = await self.__transition_status(
+            db_session,
+            purchase_id,
+            "process",
+            "review",
+            models_p.Purchase.seller_id == seller_id,
+            expected_version=expected_version,
+        )
+        if not transition:
+            purchase = await self.get_sale(db_session, purchase_id, seller_id)
+            if not purchase:
+                raise HTTPException(404, "Sale not found")
 
-        if purchase.status != "process":
+            self.__raise_version_conflict(purchase, expected_version)
             raise HTTPException(403, "Sale status not in process")
 
-        purchase = await self.__update_purchase(
-            db_session, purchase, {"status": "review"}
-        )
-
-        buyer_notifications = user_notification_manager.sse_managers.get(
-            purchase.buyer_id
+        purchase, _ = transition
+        await sales_stats_manager.purchase_status_changed(
+            db_session, seller_id, "process", "review"
         )
-        seller_notifications = user_notification_manager.sse_managers.get(seller_id)
 
         # Предполагается, что уже есть чатик (создаётся при создании покупки)
-        dialog_data = await message_manager.get_dialog_id_by_user_id(
-            db_session, seller_id, purchase.buyer_id
-        )
         status_change_event = f"Продавец ({seller_id}) выполнил заказ ({purchase.id}) пользователя ({purchase.buyer_id}) и просит подтверждения.."
-
-        system_message = SystemMessageCreate(
-            chat_id=dialog_data["chat_id"],
-            content=status_change_event,
-        )
-        await message_connection_manager.send_and_create_system_message(
-            db_session, system_message, [seller_id, purchase.buyer_id]
+        add_outbox_event(
+            db_session,
+            "new_purchase_status",
+            buyer_id=purchase.buyer_id,
+            seller_id=seller_id,
+            data=purchase.to_dict(),
+            comment=status_change_event,
+            system_message=status_change_event,
         )
-
-        if buyer_notifications:
-            await buyer_notifications.create_event(
-                event="new_purchase_status",
-                data=purchase.to_dict(),
-                comment=status_change_event,
-            )
-
-        if seller_notifications:
-            await seller_notifications.create_event(
-                event="new_purchase_status",
-                data=purchase.to_dict(),
-                comment=status_change_event,
-            )
+        await db_session.commit()
 
         return purchase
 
@@ -225,63 +157,105 @@ class PurchaseManager:
         purchase_id: int,
         buyer_id: int,
         purchase_completed: bool,
+        expected_version: int | None = None,
     ):
         """
         Меняется статус после подтверждения покупателем,
          можно как одобрить так и запретить
         Метод для пользователя
         """
-
-        purchase = await self.get_purchase(
-            db_session, purchase_id, buyer_id, (selectinload, models_p.Purchase.offer)
+        status = "completed" if purchase_completed else "dispute"
+        transition = await self.__transition_status(
+            db_session,
+            purchase_id,
+            "review",
+            status,
+            models_p.Purchase.buyer_id == buyer_id,
+            expected_version=expected_version,
         )
+        if not transition:
+            purchase = await self.get_purchase(db_session, purchase_id, buyer_id)
+            if not purchase:
+                raise HTTPException(404, "Purchase not found")
 
-        if not purchase:
-            raise HTTPException(404, "Purchase not found")
-
-        if purchase.status != "review":
+            self.__raise_version_conflict(purchase, expected_version)
             raise HTTPException(403, "Purchase status not in review")
 
-        seller_id = purchase.offer.user_id
-        status = "completed" if purchase_completed else "dispute"
-        purchase = await self.__update_purchase(
-            db_session, purchase, {"status": status}
+        purchase, seller_id = transition
+        await sales_stats_manager.purchase_status_changed(
+            db_session, seller_id, "review", status
         )
 
-        buyer_notifications = user_notification_manager.sse_managers.get(
-            purchase.buyer_id
+        status_change_event = f"Покупатель ({purchase.buyer_id}) подтвердил выполнение заказа ({purchase.id}) продавца ({seller_id}) ..."
+        add_outbox_event(
+            db_session,
+            "new_purchase_status",
+            buyer_id=purchase.buyer_id,
+            seller_id=seller_id,
+            data=purchase.to_dict(),
+            comment=status_change_event,
+            system_message=status_change_event,
         )
-        seller_notifications = user_notification_manager.sse_managers.get(seller_id)
+        await db_session.commit()
 
-        # Предполагается, что уже есть чатик (создаётся при создании покупки)
-        dialog_data = await message_manager.get_dialog_id_by_user_id(
-            db_session, seller_id, purchase.buyer_id
-        )
-        status_change_event = f"Покупатель ({purchase.buyer_id}) подтвердил выполнение заказа ({purchase.id}) продавца ({seller_id}) ..."
+        return purchase
 
-        system_message = SystemMessageCreate(
-            chat_id=dialog_data["chat_id"],
-            content=status_change_event,
+    async def complete_expired_reviews(
+        self, db_session: AsyncSession, deadline: int, limit: int
+    ) -> int:
+        """
+        Завершает до limit покупок, которые находятся в review с момента раньше deadline,
+         одним UPDATE по частичному индексу ix_purchase_review_updated_at_id.
+        Строки, которые сейчас меняет покупатель, пропускаются (SKIP LOCKED)
+        Возвращает количество завершённых покупок, делает commit
+        """
+        # status литералом, а не параметром - иначе generic план prepared statement
+        #  не сможет использовать частичный индекс
+        expired = (
+            select(models_p.Purchase.id)
+            .where(models_p.Purchase.status == literal_column("'review'"))
+            .where(models_p.Purchase.updated_at < deadline)
+            .order_by(models_p.Purchase.updated_at, models_p.Purchase.id)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+            .cte("expired")
         )
-        await message_connection_manager.send_and_create_system_message(
-            db_session, system_message, [seller_id, purchase.buyer_id]
+        stmt = (
+            update(models_p.Purchase)
+            .where(models_p.Purchase.id == expired.c.id)
+            .values(status="completed", version=models_p.Purchase.version + 1)
+            .returning(models_p.Purchase, models_p.Purchase.seller_id)
+            .execution_options(synchronize_session=False, populate_existing=True)
         )
-
-        if buyer_notifications:
-            await buyer_notifications.create_event(
-                event="new_purchase_status",
+        completed = (await db_session.execute(stmt)).all()
+        if not completed:
+            return 0
+
+        sellers_counts: dict[int, int] = {}
+        for purchase, seller_id in completed:
+            # Продавец удалён - чата и агрегатов уже нет
+            if seller_id is None:
+                continue
+
+            sellers_counts[seller_id] = sellers_counts.get(seller_id, 0) + 1
+            status_change_event = f"Покупка ({purchase.id}) пользователя ({purchase.buyer_id}) у продавца ({seller_id}) завершена автоматически по истечении времени на проверку"
+            add_outbox_event(
+                db_session,
+                "purchases_auto_completed",
+                buyer_id=purchase.buyer_id,
+                seller_id=seller_id,
                 data=purchase.to_dict(),
                 comment=status_change_event,
+                system_message=status_change_event,
+                coalesce=True,
             )
 
-        if seller_notifications:
-            await seller_notifications.create_event(
-                event="new_purchase_status",
-                data=purchase.to_dict(),
-                comment=status_change_event,
-            )
+        await sales_stats_manager.purchases_status_changed(
+            db_session, sellers_counts, "review", "completed"
+        )
+        await db_session.commit()
 
-        return purchase
+        return len(completed)
 
     async def change_purchase_status(
         self,
@@ -331,36 +305,95 @@ class PurchaseManager:
     ):
         stmt = (
             select(models_p.Purchase)
-            .join(models_f.Offer, models_f.Offer.id == models_p.Purchase.offer_id)
             .where(models_p.Purchase.id == purchase_id)
-            .where(models_f.Offer.user_id == seller_id)
+            .where(models_p.Purchase.seller_id == seller_id)
         )
 
         result = await db_session.execute(stmt)
         return result.scalar_one_or_none()
 
-    async def __update_purchase(
-        self,
-        db_session: AsyncSession,
-        db_obj: models_p.Purchase,
-        obj_in: schemas_p.PurchaseInDB | dict,
-    ):
-        obj_data = jsonable_encoder(db_obj)
+    async def __claim_deliveries_to_parcels(
+        self, db_session: AsyncSession, offer_id: int, purchase_id: int, count: int
+    ) -> int:
+        """
+        Забирает (удаляет) до count значений автовыдачи и сразу создаёт из них parcel
+         одним запросом (WITH claimed AS (DELETE ... RETURNING) INSERT ... SELECT),
+         строки, уже забранные параллельными покупками, пропускаются (SKIP LOCKED).
+        Возвращает количество созданных parcel
+        """
+        claim_subquery = (
+            select(models_f.Delivery.id)
+            .where(models_f.Delivery.offer_id == offer_id)
+            .order_by(models_f.Delivery.id)
+            .limit(count)
+            .with_for_update(skip_locked=True)
+        )
+        claimed = (
+            delete(models_f.Delivery)
+            .where(models_f.Delivery.id.in_(claim_subquery))
+            .returning(models_f.Delivery.id, models_f.Delivery.value)
+            .cte("claimed")
+        )
+        stmt = (
+            insert(models_p.Parcel)
+            .from_select(
+                ["purchase_id", "value"],
+                select(literal(purchase_id), claimed.c.value).order_by(claimed.c.id),
+            )
+            .returning(models_p.Parcel.id)
+        )
+        return len((await db_session.execute(stmt)).scalars().all())
 
-        if isinstance(obj_in, dict):
-            update_data = obj_in
-        else:
-            update_data = obj_in.model_dump(exclude_unset=True)
+    async def __take_offer_count(
+        self, db_session: AsyncSession, offer_id: int, count: int
+    ) -> int | None:
+        """
+        Атомарно уменьшает count оффера, None если количества не хватает
+        """
+        stmt = (
+            update(models_f.Offer)
+            .where(models_f.Offer.id == offer_id)
+            .where(models_f.Offer.count >= count)
+            .values(count=models_f.Offer.count - count)
+            .returning(models_f.Offer.count)
+        )
+        return (await db_session.execute(stmt)).scalar_one_or_none()
 
-        for field in obj_data:
-            if field in update_data:
-                setattr(db_obj, field, update_data[field])
+    async def __transition_status(
+        self,
+        db_session: AsyncSession,
+        purchase_id: int,
+        expected_status: str,
+        new_status: str,
+        *whereclauses: Any,
+        expected_version: int | None = None,
+    ) -> tuple[models_p.Purchase, int] | None:
+        """
+        Смена статуса одним UPDATE ... WHERE status = expected_status RETURNING,
+         из параллельных переходов из одного статуса проходит только один
+        whereclauses - доп. условия доступа (покупатель / продавец по seller_id),
+         оффер не нужен - покупку удалённого оффера можно подтвердить или оспорить
+        Возвращает (покупка, seller_id) или None, если подходящей строки нет
+        """
+        stmt = (
+            update(models_p.Purchase)
+            .where(models_p.Purchase.id == purchase_id)
+            .where(models_p.Purchase.status == expected_status)
+            .where(*whereclauses)
+            .values(status=new_status, version=models_p.Purchase.version + 1)
+            .returning(models_p.Purchase, models_p.Purchase.seller_id)
+            .execution_options(synchronize_session=False, populate_existing=True)
+        )
+        if expected_version is not None:
+            stmt = stmt.where(models_p.Purchase.version == expected_version)
 
-        db_session.add(db_obj)
-        await db_session.commit()
-        await db_session.refresh(db_obj)
+        return (await db_session.execute(stmt)).one_or_none()
 
-        return db_obj
+    def __raise_version_conflict(
+        self, purchase: models_p.Purchase, expected_version: int | None
+    ) -> None:
+        if expected_version is not None and purchase.version != expected_version:
+            raise HTTPException(409, f"Purchase version is {purchase.version}, not {expected_version}")
 
     async def __delete_purchase(
         self,
@@ -370,21 +403,55 @@ class PurchaseManager:
 
         raise NotImplementedError("Просто не юзается (заглушка)")
 
-    async def get_all_purchases(
+    def __get_list_sort(self, by_last_udpate: bool) -> tuple[str, Any]:
+        """
+        (имя ключа сортировки для курсора, колонка)
+        """
+        if by_last_udpate:
+            return "updated_at", models_p.Purchase.updated_at
+
+        return "created_at", models_p.Purchase.created_at
+
+    def __apply_cursor(
+        self, stmt: Any, sort_name: str, sort_column: Any, cursor: str | None, limit: int
+    ) -> Any:
+        """
+        Keyset пагинация: строки строго после (ключ сортировки, id) последней строки
+         предыдущей страницы, берётся limit + 1 строка чтобы понять есть ли следующая
+        """
+        if cursor:
+            values = decode_cursor(cursor)
+            if (
+                not values
+                or len(values) != 3
+                or values[0] != sort_name
+                or not isinstance(values[1], int)
+                or not isinstance(values[2], int)
+            ):
+                raise HTTPException(400, "Invalid cursor")
+
+            row_key = tuple_(sort_column, models_p.Purchase.id)
+            stmt = stmt.where(row_key < tuple(values[1:]))
+
+        return stmt.order_by(desc(sort_column), desc(models_p.Purchase.id)).limit(limit + 1)
+
+    def __cut_cursor_page(
+        self, rows: list, limit: int, sort_name: str, get_key: Callable[[Any], tuple[int, int]]
+    ) -> tuple[list, str | None]:
+        if len(rows) <= limit:
+            return rows, None
+
+        rows = rows[:limit]
+        return rows, encode_cursor(sort_name, *get_key(rows[-1]))
+
+    def __get_purchases_stmt(
         self,
-        db_session: AsyncSession,
         buyer_id: int,
-        offset: int,
-        limit: int,
-        by_last_udpate: bool = False,
-        search_query: str = None,
-        is_reviewed: bool = None,
-        statuses: list[
-            Literal["process", "review", "completed", "dispute", "refund"]
-        ] = ["process", "review", "completed", "dispute", "refund"],
+        sort_column: Any,
+        search_query: str | None,
+        is_reviewed: bool | None,
+        statuses: list[str],
     ):
-        _result = []
-
         stmt = (
             select(
                 models_p.Purchase.name,
@@ -396,18 +463,11 @@ class PurchaseManager:
                 models_u.User.id,  # Seller user_id
                 models_u.User.username,
                 models_p.Purchase.id,
+                sort_column,
             )
-            .join(models_f.Offer, models_f.Offer.id == models_p.Purchase.offer_id)
-            .join(models_u.User, models_u.User.id == models_f.Offer.user_id)
+            .join(models_u.User, models_u.User.id == models_p.Purchase.seller_id)
             .where(models_p.Purchase.buyer_id == buyer_id)
             .where(models_p.Purchase.status.in_(statuses))
-            .order_by(
-                desc(models_p.Purchase.updated_at)
-                if by_last_udpate
-                else desc(models_p.Purchase.created_at)
-            )
-            .offset(offset)
-            .limit(limit)
         )
 
         if search_query:
@@ -416,15 +476,21 @@ class PurchaseManager:
         if is_reviewed is not None:
             stmt = stmt.where(models_p.Purchase.is_reviewed == is_reviewed)
 
-        rows = await db_session.execute(stmt)
+        return stmt
+
+    async def __build_purchases(self, db_session: AsyncSession, rows: list) -> list[dict]:
+        _result = []
+
+        sellers_files = await user_attachment_manager.get_only_files_many(
+            db_session, [row[6] for row in rows]
+        )
+        offers_files = await offer_attachment_manager.get_only_files_many(
+            db_session, [row[5] for row in rows if row[5] is not None]
+        )
 
         for row in rows:
-            seller_files = await user_attachment_manager.get_only_files(
-                db_session, row[6]
-            )
-            offer_files = await offer_attachment_manager.get_only_files(
-                db_session, row[5]
-            )
+            seller_files = sellers_files.get(row[6])
+            offer_files = offers_files.get(row[5])
             purchase_dict = {
                 "id": row[8],
                 "seller_id": row[6],
@@ -442,12 +508,12 @@ class PurchaseManager:
 
         return _result
 
-    async def get_all_sells(
+    async def get_all_purchases(
         self,
         db_session: AsyncSession,
+        buyer_id: int,
         offset: int,
         limit: int,
-        seller_id: int,
         by_last_udpate: bool = False,
         search_query: str = None,
         is_reviewed: bool = None,
@@ -455,30 +521,123 @@ class PurchaseManager:
             Literal["process", "review", "completed", "dispute", "refund"]
         ] = ["process", "review", "completed", "dispute", "refund"],
     ):
+        _, sort_column = self.__get_list_sort(by_last_udpate)
         stmt = (
-            select(models_p.Purchase)
-            .join(models_f.Offer, models_f.Offer.id == models_p.Purchase.offer_id)
-            .join(models_u.User, models_u.User.id == models_f.Offer.user_id)
-            .where(models_u.User.id == seller_id)
-            .where(models_p.Purchase.status.in_(statuses))
-            .order_by(
-                desc(models_p.Purchase.updated_at)
-                if by_last_udpate
-                else desc(models_p.Purchase.created_at)
-            )
+            self.__get_purchases_stmt(buyer_id, sort_column, search_query, is_reviewed, statuses)
+            .order_by(desc(sort_column), desc(models_p.Purchase.id))
             .offset(offset)
             .limit(limit)
         )
 
+        rows = (await db_session.execute(stmt)).all()
+        return await self.__build_purchases(db_session, rows)
+
+    async def get_all_purchases_by_cursor(
+        self,
+        db_session: AsyncSession,
+        buyer_id: int,
+        cursor: str | None,
+        limit: int,
+        by_last_udpate: bool = False,
+        search_query: str = None,
+        is_reviewed: bool = None,
+        statuses: list[
+            Literal["process", "review", "completed", "dispute", "refund"]
+        ] = ["process", "review", "completed", "dispute", "refund"],
+    ) -> tuple[list[dict], str | None]:
+        """
+        Как get_all_purchases, но страницы по курсору, возвращает (покупки, следующий курсор или None)
+        """
+        sort_name, sort_column = self.__get_list_sort(by_last_udpate)
+        stmt = self.__apply_cursor(
+            self.__get_purchases_stmt(buyer_id, sort_column, search_query, is_reviewed, statuses),
+            sort_name,
+            sort_column,
+            cursor,
+            limit,
+        )
+
+        rows = (await db_session.execute(stmt)).all()
+        rows, next_cursor = self.__cut_cursor_page(
+            rows, limit, sort_name, lambda row: (row[9], row[8])
+        )
+        return await self.__build_purchases(db_session, rows), next_cursor
+
+    def __get_sells_stmt(
+        self,
+        seller_id: int,
+        search_query: str | None,
+        is_reviewed: bool | None,
+        statuses: list[str],
+    ):
+        stmt = (
+            select(models_p.Purchase)
+            .where(models_p.Purchase.seller_id == seller_id)
+            .where(models_p.Purchase.status.in_(statuses))
+        )
+
         if search_query:
             stmt = stmt.where(models_p.Purchase.name.ilike(f"%{search_query}%"))
         
         if is_reviewed is not None:
             stmt = stmt.where(models_p.Purchase.is_reviewed == is_reviewed)
+
+        return stmt
+
+    async def get_all_sells(
+        self,
+        db_session: AsyncSession,
+        offset: int,
+        limit: int,
+        seller_id: int,
+        by_last_udpate: bool = False,
+        search_query: str = None,
+        is_reviewed: bool = None,
+        statuses: list[
+            Literal["process", "review", "completed", "dispute", "refund"]
+        ] = ["process", "review", "completed", "dispute", "refund"],
+    ):
+        _, sort_column = self.__get_list_sort(by_last_udpate)
+        stmt = (
+            self.__get_sells_stmt(seller_id, search_query, is_reviewed, statuses)
+            .order_by(desc(sort_column), desc(models_p.Purchase.id))
+            .offset(offset)
+            .limit(limit)
+        )
         
         query = await db_session.execute(stmt)
         return query.scalars().all()
 
+    async def get_all_sells_by_cursor(
+        self,
+        db_session: AsyncSession,
+        cursor: str | None,
+        limit: int,
+        seller_id: int,
+        by_last_udpate: bool = False,
+        search_query: str = None,
+        is_reviewed: bool = None,
+        statuses: list[
+            Literal["process", "review", "completed", "dispute", "refund"]
+        ] = ["process", "review", "completed", "dispute", "refund"],
+    ) -> tuple[list[models_p.Purchase], str | None]:
+        """
+        Как get_all_sells, но страницы по курсору, возвращает (продажи, следующий курсор или None)
+        """
+        sort_name, sort_column = self.__get_list_sort(by_last_udpate)
+        stmt = self.__apply_cursor(
+            self.__get_sells_stmt(seller_id, search_query, is_reviewed, statuses),
+            sort_name,
+            sort_column,
+            cursor,
+            limit,
+        )
+
+        sells = (await db_session.execute(stmt)).scalars().all()
+        return self.__cut_cursor_page(
+            sells, limit, sort_name, lambda sell: (getattr(sell, sort_name), sell.id)
+        )
+
     async def get_all_sells_by_offer(
         self,
         offset: int,
@@ -489,10 +648,9 @@ class PurchaseManager:
     ):
         stmt = (
             select(models_p.Purchase)
-            .join(models_f.Offer, models_f.Offer.id == models_p.Purchase.offer_id)
-            .join(models_u.User, models_u.User.id == models_f.Offer.user_id)
-            .where(models_f.Offer.id == offer_id)
-            .where(models_u.User.id == seller_id)
+            .where(models_p.Purchase.offer_id == offer_id)
+            .where(models_p.Purchase.seller_id == seller_id)
+            .order_by(desc(models_p.Purchase.created_at), desc(models_p.Purchase.id))
             .offset(offset)
             .limit(limit)
         )
@@ -512,20 +670,42 @@ class PurchaseManager:
         # Тоже не знаю нужны ли ревьюшки в refund статусе
         if purchase.status not in ("completed", "refund"):
             raise HTTPException(403, "Purchase status must be equal to completed or refund")
+
+        # Условный UPDATE вместо проверки is_reviewed - два параллельных отзыва не пройдут оба
+        mark_reviewed_stmt = (
+            update(models_p.Purchase)
+            .where(models_p.Purchase.id == purchase.id)
+            .where(models_p.Purchase.is_reviewed == False)
+            .values(is_reviewed=True)
+            .returning(models_p.Purchase.id)
+        )
+        if (await db_session.execute(mark_reviewed_stmt)).scalar_one_or_none() is None:
+            raise HTTPException(403, "Purchase already reviewed")
         
         create_review_stmt = (
             insert(models_p.Review)
             .values(
                 purchase_id=review_data.purchase_id,
                 offer_id=purchase.offer_id,
+                seller_id=purchase.seller_id,
                 rating=review_data.rating,
                 value=review_data.value,
             )
             .returning(models_p.Review)
         )
-        q = await db_session.execute(create_review_stmt)
+        review = (await db_session.execute(create_review_stmt)).scalar_one()
+
+        if purchase.seller_id:
+            await sales_stats_manager.review_created(
+                db_session, purchase.seller_id, purchase.offer_id, review_data.rating
+            )
+
+        await db_session.commit()
+        # Оценка оффера видна в листинге и карточке
+        if purchase.offer_id:
+            await offers_cache.invalidate_offers(purchase.offer_id)
 
-        return q.scalar_one_or_none()
+        return review
 
 
 purchase_manager = PurchaseManager()
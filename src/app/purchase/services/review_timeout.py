@@ -0,0 +1,58 @@
+import time
+import asyncio
+import logging
+from typing import NoReturn
+
+from sqlalchemy import select, func
+
+from .purchase import purchase_manager
+from core.database import context_get_session
+from core.settings import config
+
+
+logger = logging.getLogger("uvicorn")
+
+
+class ReviewTimeoutScheduler:
+    """
+    Раз в PURCHASE_REVIEW_CHECK_INTERVAL завершает покупки, которые дольше
+     PURCHASE_REVIEW_TIMEOUT находятся в review (покупатель не подтвердил и не открыл спор).
+    Запускается в каждом воркере, пачку в один момент обрабатывает только один -
+     транзакционный advisory lock, остальные просто пропускают проверку
+    """
+    batch_size: int = 100
+    # Произвольный, но постоянный ключ advisory lock'а
+    lock_key: int = 7301
+
+    async def setup(self) -> NoReturn:
+        logger.info("Review timeout scheduler setup completed!")
+        await self.run()
+
+    async def run(self) -> NoReturn:
+        while True:
+            try:
+                while await self.complete_expired_batch() == self.batch_size:
+                    pass
+            except Exception as e:
+                logger.error(f"Review timeout completion failed: {e}")
+
+            await asyncio.sleep(config.PURCHASE_REVIEW_CHECK_INTERVAL)
+
+    async def complete_expired_batch(self) -> int:
+        """
+        Возвращает количество завершённых покупок, 0 если lock у другого воркера
+        """
+        async with context_get_session() as db_session:
+            is_locked = (
+                await db_session.execute(select(func.pg_try_advisory_xact_lock(self.lock_key)))
+            ).scalar()
+            if not is_locked:
+                return 0
+
+            deadline = int(time.time()) - config.PURCHASE_REVIEW_TIMEOUT
+            return await purchase_manager.complete_expired_reviews(
+                db_session, deadline, self.batch_size
+            )
+
+
+review_timeout_scheduler = ReviewTimeoutScheduler()
@@ -0,0 +1,219 @@
+from time import time
+from typing import Any, Literal
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy import select, func, desc
+
+from .. import models as models_p
+from ..models.sales_stats import SECONDS_IN_DAY
+from app.offers import models as models_f
+
+
+SECONDS_IN_WEEK = SECONDS_IN_DAY * 7
+# unix 0 - четверг, неделя считается с понедельника
+WEEK_SHIFT = SECONDS_IN_DAY * 3
+
+
+class SalesStatsManager:
+    """
+    Инкрементальное обновление агрегатов продавца (models/sales_stats.py)
+     и дашборд по ним. Методы обновления не делают commit - вызываются
+     в транзакции изменения покупки/отзыва
+    """
+    def __init__(self) -> None:
+        pass
+
+    async def __add(
+        self, db_session: AsyncSession, model: Any, keys: list[str], rows: list[dict]
+    ) -> None:
+        """
+        INSERT ... ON CONFLICT DO UPDATE со сложением счётчиков,
+         строки сортируются по ключу, чтобы параллельные транзакции блокировали их в одном порядке
+        """
+        rows = sorted(rows, key=lambda row: tuple(row[key] for key in keys))
+        stmt = pg_insert(model).values(rows)
+        counters = [column for column in rows[0] if column not in keys]
+        stmt = stmt.on_conflict_do_update(
+            index_elements=keys,
+            set_={
+                **{column: getattr(model, column) + getattr(stmt.excluded, column) for column in counters},
+                "updated_at": int(time()),
+            },
+        )
+        await db_session.execute(stmt)
+
+    async def purchase_created(
+        self, db_session: AsyncSession, seller_id: int, purchase: models_p.Purchase
+    ) -> None:
+        revenue = purchase.price * purchase.count
+        counters = {"purchases_count": 1, "items_count": purchase.count, "revenue": revenue}
+
+        await self.__add(
+            db_session, models_p.SellerStats, ["seller_id"], [{"seller_id": seller_id, **counters}]
+        )
+        await self.__add(
+            db_session,
+            models_p.SellerStatusStats,
+            ["seller_id", "status"],
+            [{"seller_id": seller_id, "status": purchase.status, "purchases_count": 1}],
+        )
+        await self.__add(
+            db_session,
+            models_p.SellerDailyStats,
+            ["seller_id", "day"],
+            [{
+                "seller_id": seller_id,
+                "day": purchase.created_at // SECONDS_IN_DAY * SECONDS_IN_DAY,
+                **counters,
+            }],
+        )
+        await self.__add(
+            db_session,
+            models_p.SellerOfferStats,
+            ["offer_id"],
+            [{"offer_id": purchase.offer_id, "seller_id": seller_id, **counters}],
+        )
+
+    async def purchase_status_changed(
+        self, db_session: AsyncSession, seller_id: int, old_status: str, new_status: str
+    ) -> None:
+        await self.purchases_status_changed(db_session, {seller_id: 1}, old_status, new_status)
+
+    async def purchases_status_changed(
+        self,
+        db_session: AsyncSession,
+        sellers_counts: dict[int, int],
+        old_status: str,
+        new_status: str,
+    ) -> None:
+        """
+        sellers_counts - {seller_id: сколько покупок продавца сменили статус}, одним запросом
+        """
+        if old_status == new_status or not sellers_counts:
+            return
+
+        rows = []
+        for seller_id, purchases_count in sellers_counts.items():
+            rows.append({"seller_id": seller_id, "status": old_status, "purchases_count": -purchases_count})
+            rows.append({"seller_id": seller_id, "status": new_status, "purchases_count": purchases_count})
+
+        await self.__add(db_session, models_p.SellerStatusStats, ["seller_id", "status"], rows)
+
+    async def review_created(
+        self, db_session: AsyncSession, seller_id: int, offer_id: int | None, rating: int
+    ) -> None:
+        """
+        offer_id None - оффер удалён, отзыв учитывается только в агрегатах продавца
+        """
+        counters = {"reviews_count": 1, "rating_sum": rating}
+
+        await self.__add(
+            db_session, models_p.SellerStats, ["seller_id"], [{"seller_id": seller_id, **counters}]
+        )
+        if offer_id is None:
+            return
+
+        await self.__add(
+            db_session,
+            models_p.SellerOfferStats,
+            ["offer_id"],
+            [{"offer_id": offer_id, "seller_id": seller_id, **counters}],
+        )
+
+    def __average_rating(self, rating_sum: int, reviews_count: int) -> float | None:
+        if not reviews_count:
+            return None
+
+        return round(rating_sum / reviews_count, 2)
+
+    async def get_dashboard(
+        self,
+        db_session: AsyncSession,
+        seller_id: int,
+        period: Literal["day", "week"] = "day",
+        days: int = 30,
+        top_limit: int = 5,
+    ) -> dict:
+        """
+        Все данные берутся из агрегатов, таблица purchase не читается
+        period - шаг выручки, days - за сколько последних дней (включая текущий)
+        """
+        stats = await db_session.get(models_p.SellerStats, seller_id)
+
+        statuses_stmt = select(
+            models_p.SellerStatusStats.status, models_p.SellerStatusStats.purchases_count
+        ).where(models_p.SellerStatusStats.seller_id == seller_id)
+        statuses = {
+            status: purchases_count
+            for status, purchases_count in (await db_session.execute(statuses_stmt)).all()
+            if purchases_count
+        }
+
+        day = models_p.SellerDailyStats.day
+        if period == "week":
+            bucket = (day + WEEK_SHIFT) // SECONDS_IN_WEEK * SECONDS_IN_WEEK - WEEK_SHIFT
+        else:
+            bucket = day
+        bucket = bucket.label("period_start")
+        since = (int(time()) // SECONDS_IN_DAY - days + 1) * SECONDS_IN_DAY
+
+        revenue_stmt = (
+            select(
+                bucket,
+                func.sum(models_p.SellerDailyStats.purchases_count),
+                func.sum(models_p.SellerDailyStats.items_count),
+                func.sum(models_p.SellerDailyStats.revenue),
+            )
+            .where(models_p.SellerDailyStats.seller_id == seller_id)
+            .where(day >= since)
+            .group_by(bucket)
+            .order_by(bucket)
+        )
+        revenue = [
+            {
+                "period_start": period_start,
+                "purchases_count": purchases_count,
+                "items_count": items_count,
+                "revenue": revenue,
+            }
+            for period_start, purchases_count, items_count, revenue in (
+                await db_session.execute(revenue_stmt)
+            ).all()
+        ]
+
+        top_offers_stmt = (
+            select(models_p.SellerOfferStats, models_f.Offer.name)
+            .join(models_f.Offer, models_f.Offer.id == models_p.SellerOfferStats.offer_id)
+            .where(models_p.SellerOfferStats.seller_id == seller_id)
+            .order_by(desc(models_p.SellerOfferStats.revenue))
+            .limit(top_limit)
+        )
+        top_offers = [
+            {
+                "offer_id": offer_stats.offer_id,
+                "name": name,
+                "purchases_count": offer_stats.purchases_count,
+                "items_count": offer_stats.items_count,
+                "revenue": offer_stats.revenue,
+                "reviews_count": offer_stats.reviews_count,
+                "average_rating": self.__average_rating(
+                    offer_stats.rating_sum, offer_stats.reviews_count
+                ),
+            }
+            for offer_stats, name in (await db_session.execute(top_offers_stmt)).all()
+        ]
+
+        return {
+            "purchases_count": stats.purchases_count if stats else 0,
+            "items_count": stats.items_count if stats else 0,
+            "revenue": stats.revenue if stats else 0,
+            "reviews_count": stats.reviews_count if stats else 0,
+            "average_rating": self.__average_rating(stats.rating_sum, stats.reviews_count) if stats else None,
+            "statuses": statuses,
+            "revenue_by_period": revenue,
+            "top_offers": top_offers,
+        }
+
+
+sales_stats_manager = SalesStatsManager()
@@ -20,6 +20,9 @@ class User(Base):
         Integer, default=0, nullable=False
     )  # 0-user, 1-mod, 2-arbit, 3-admin
     last_online = Column(Integer)  # Unix - time # ! need ms
+    # Оценки отзывов на офферы пользователя, поддерживаются триггерами на review (см. app/purchase/models)
+    rating_sum = Column(Integer, nullable=False, default=0, server_default="0")
+    rating_count = Column(Integer, nullable=False, default=0, server_default="0")
 
     # Read about lazy arg more here:
     #  https://docs.sqlalchemy.org/en/14/orm/loading_relationships.html
@@ -25,6 +25,7 @@ from core.mail_sender import *
 from core.depends import depends as deps
 from app.tokens import schemas as schemas_t
 from app.attachment.services.user_attachment import user_attachment_manager
+from app.offers.services import offers_cache
 import core.utils as utils
 
 logger = logging.getLogger("uvicorn")
@@ -104,6 +105,8 @@ async def update_user_username(
     updated_user = await UserService.update_user(
         db_session, user, {"username": data_form.username}
     )
+    # Карточки офферов обновил триггер, кэш списков и карточек хранит старое имя продавца
+    await offers_cache.invalidate_user_offers(db_session, user.id)
     return updated_user
 
 
@@ -3,12 +3,14 @@ import logging
 from fastapi import Depends, APIRouter, WebSocket, WebSocketDisconnect, WebSocketException, status
 
 from core import depends as deps
+from core.utils import setup_helper
 from app.users.services import ConnectionContext, OnlineConnectionManager
 
 
 logger = logging.getLogger("uvicorn")
 router = APIRouter()
 base_manager = OnlineConnectionManager()
+setup_helper.add_new_coroutine_def(base_manager.setup)
 
 
 @router.websocket("/online")
@@ -1,19 +1,59 @@
+import json
+import uuid
 import random
-from typing import Any
+import asyncio
+import logging
+from functools import partial
+from typing import Any, NoReturn
 from dataclasses import dataclass
 from json.decoder import JSONDecodeError
 
+import redis.asyncio as aredis
 from pydantic import ValidationError
 from fastapi import Depends, WebSocket, WebSocketException, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from core import depends as deps
 from core.database import get_session
-from core.redis import get_redis_client, get_redis_pipeline
+from core.redis import redis_pool, get_redis_client, get_redis_pipeline, redis_broker
+from core.settings import config
 from app.users import schemas as schemas_u
 from app.tokens import schemas as schemas_t
 
 
+logger = logging.getLogger("uvicorn")
+
+# Соединения пользователя по процессам: online_connections:{user_id} - hash {worker_id: count},
+#  онлайн - пока в hash есть хотя бы одно поле. Скрипты меняют счётчик и online_users атомарно,
+#  возвращают 1 если состояние пользователя (онлайн/офлайн) изменилось
+__redis = aredis.Redis(connection_pool=redis_pool)
+connect_script = __redis.register_script("""
+if redis.call('HINCRBY', KEYS[1], ARGV[1], 1) == 1 and redis.call('HLEN', KEYS[1]) == 1 then
+    return redis.call('SADD', KEYS[2], ARGV[2])
+end
+return 0
+""")
+disconnect_script = __redis.register_script("""
+if redis.call('HINCRBY', KEYS[1], ARGV[1], -1) <= 0 then
+    redis.call('HDEL', KEYS[1], ARGV[1])
+end
+if redis.call('HLEN', KEYS[1]) == 0 then
+    return redis.call('SREM', KEYS[2], ARGV[2])
+end
+return 0
+""")
+# ARGV[1] - user_id, остальные - упавшие процессы, их соединения снимаются целиком
+sweep_script = __redis.register_script("""
+for i = 2, #ARGV do
+    redis.call('HDEL', KEYS[1], ARGV[i])
+end
+if redis.call('HLEN', KEYS[1]) == 0 then
+    return redis.call('SREM', KEYS[2], ARGV[1])
+end
+return 0
+""")
+
+
 @dataclass(frozen=True)
 class ConnectionContext:
     """
@@ -28,10 +68,14 @@ class ConnectionContext:
 
 
 class OnlineConnectionManager:
+    """
+    Процесс жив, пока есть ключ online_worker:{worker_id} - он истекает через ONLINE_WORKER_TTL
+     и продлевается heartbeat. Соединения упавшего процесса снимает sweep другого процесса
+    """
     ws_connections: dict[int, set[WebSocket]] = {}
 
     def __init__(self):
-        pass
+        self.worker_id = uuid.uuid4().hex
 
     async def __call__(
         self,
@@ -58,29 +102,41 @@ class OnlineConnectionManager:
         await conn_context.websocket.accept()
         if conn_context.unique_id not in self.ws_connections:
             self.ws_connections[conn_context.unique_id] = set()
+            await redis_broker.subscribe(
+                f"online:{conn_context.unique_id}",
+                partial(self.__deliver, conn_context.unique_id),
+            )
 
         self.ws_connections[conn_context.unique_id].add(conn_context.websocket)
 
+        subscribers = None
         async with get_redis_client() as redis_client:
-            if conn_context.is_auth_user:
-                await redis_client.sadd("online_users", conn_context.unique_id)
+            if conn_context.is_auth_user and await connect_script(
+                keys=[f"online_connections:{conn_context.unique_id}", "online_users"],
+                args=[self.worker_id, conn_context.unique_id],
+                client=redis_client,
+            ):
                 subscribers = await redis_client.smembers(
                     f"pub:{conn_context.unique_id}"
                 )
 
-        if conn_context.is_auth_user and subscribers:
-            await self.broadcast(True, subscribers, conn_context)
+        if subscribers:
+            await self.broadcast(True, subscribers, conn_context.unique_id)
 
     async def disconnect(self, conn_context: ConnectionContext):
         all_current_connections = self.ws_connections[conn_context.unique_id]
         all_current_connections.remove(conn_context.websocket)
         if len(all_current_connections) == 0:
             del self.ws_connections[conn_context.unique_id]
-            
+            await redis_broker.unsubscribe(f"online:{conn_context.unique_id}")
 
+        subscribers = None
         async with get_redis_client() as redis_client:
-            if conn_context.is_auth_user:
-                await redis_client.srem("online_users", conn_context.unique_id)
+            if conn_context.is_auth_user and await disconnect_script(
+                keys=[f"online_connections:{conn_context.unique_id}", "online_users"],
+                args=[self.worker_id, conn_context.unique_id],
+                client=redis_client,
+            ):
                 subscribers = await redis_client.smembers(
                     f"pub:{conn_context.unique_id}"
                 )
@@ -94,16 +150,85 @@ class OnlineConnectionManager:
             for key in keys_to_delete:
                 await redis_client.srem(f"pub:{int(key)}", conn_context.unique_id)
 
-        if conn_context.is_auth_user and subscribers:
-            await self.broadcast(False, subscribers, conn_context)
+        if subscribers:
+            await self.broadcast(False, subscribers, conn_context.unique_id)
 
-    async def broadcast(
-        self, state: bool, subscribers: list[bytes], conn_context: ConnectionContext
-    ):
+    async def broadcast(self, state: bool, subscribers: list[bytes], unique_id: int):
+        """
+        Подписчики могут быть подключены к любому процессу - событие публикуется
+         в их каналы, доставляет процесс с их соединениями
+        """
+        data = json.dumps({int(unique_id): state})
         for client in subscribers:
-            all_current_connections = self.ws_connections[int(client)]
-            for ws in all_current_connections:
-                await ws.send_json({int(conn_context.unique_id): state})
+            await redis_broker.publish(f"online:{int(client)}", data)
+
+    async def setup(self) -> NoReturn:
+        # Экземпляр создаётся при импорте, до fork воркеров (--preload), id у каждого процесса свой
+        self.worker_id = uuid.uuid4().hex
+        logger.info(f"Online heartbeat setup completed (worker {self.worker_id})!")
+        await self.run_heartbeat()
+
+    async def run_heartbeat(self) -> NoReturn:
+        while True:
+            try:
+                async with get_redis_client() as redis_client:
+                    await redis_client.set(
+                        f"online_worker:{self.worker_id}", 1, ex=config.ONLINE_WORKER_TTL
+                    )
+                await self.sweep_dead_workers()
+            except Exception as e:
+                logger.error(f"Online heartbeat failed: {e}")
+
+            await asyncio.sleep(config.ONLINE_HEARTBEAT_INTERVAL)
+
+    async def sweep_dead_workers(self) -> list[int]:
+        """
+        Снимает соединения процессов, чей online_worker ключ истёк, и рассылает офлайн.
+        За интервал проверку делает только один процесс, возвращает ушедших в офлайн
+        """
+        offline_ids = []
+        async with get_redis_client() as redis_client:
+            if not await redis_client.set(
+                "online_sweep_lock", self.worker_id, nx=True, ex=config.ONLINE_HEARTBEAT_INTERVAL
+            ):
+                return offline_ids
+
+            async for user_id in redis_client.sscan_iter("online_users"):
+                user_id = int(user_id)
+                worker_ids = await redis_client.hkeys(f"online_connections:{user_id}")
+                is_alive = await redis_client.mget(
+                    [f"online_worker:{worker_id.decode()}" for worker_id in worker_ids]
+                ) if worker_ids else []
+                dead_worker_ids = [
+                    worker_id for worker_id, alive in zip(worker_ids, is_alive) if alive is None
+                ]
+                if worker_ids and not dead_worker_ids:
+                    continue
+
+                if await sweep_script(
+                    keys=[f"online_connections:{user_id}", "online_users"],
+                    args=[user_id, *dead_worker_ids],
+                    client=redis_client,
+                ):
+                    offline_ids.append(user_id)
+
+            subscribers = [
+                await redis_client.smembers(f"pub:{user_id}") for user_id in offline_ids
+            ]
+
+        for user_id, user_subscribers in zip(offline_ids, subscribers):
+            if user_subscribers:
+                await self.broadcast(False, user_subscribers, user_id)
+
+        return offline_ids
+
+    async def __deliver(self, unique_id: int, data: bytes):
+        text_data = data.decode()
+        for ws in list(self.ws_connections.get(unique_id, ())):
+            try:
+                await ws.send_text(text_data)
+            except Exception as e:
+                logger.warning(f"Online delivery to {unique_id} failed: {e}")
 
     async def start_listening(self, conn_context: ConnectionContext):
         while True:
@@ -1,3 +1,5 @@
 from .client import pool as redis_pool, get_redis_client, get_redis_pipeline
+from . import cache, idempotency
+from .broker import redis_broker
 
 # https://redis.readthedocs.io/en/stable/examples/asyncio_examples.html
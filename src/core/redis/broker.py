@@ -0,0 +1,113 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable
+
+import redis.asyncio as aredis
+from redis.asyncio.client import PubSub
+from redis.exceptions import RedisError
+
+from .client import pool, get_redis_client
+
+
+logger = logging.getLogger("uvicorn")
+
+
+class RedisBroker:
+    """
+    Рассылка событий между процессами через redis pub/sub.
+    Процесс подписывается только на каналы своих соединений (например chat:{user_id}),
+     publish отправляет событие один раз, обработчик канала доставляет его локальным сокетам.
+    Одно pubsub соединение на процесс, reader - фоновая задача (start/close в lifespan)
+    """
+    poll_timeout: float = 1.0
+
+    def __init__(self) -> None:
+        self.__pubsub: PubSub | None = None
+        self.__reader: asyncio.Task | None = None
+        # handlers: {channel, async handler(data)}
+        self.__handlers: dict[str, Callable[[bytes], Awaitable[None]]] = {}
+
+    @property
+    def is_running(self) -> bool:
+        return self.__reader is not None and not self.__reader.done()
+
+    async def start(self) -> None:
+        self.__pubsub = aredis.Redis(connection_pool=pool).pubsub(
+            ignore_subscribe_messages=True
+        )
+        await self.__pubsub.connect()
+        self.__reader = asyncio.create_task(self.__read())
+        logger.info("Redis broker started!")
+
+    async def close(self) -> None:
+        if self.__reader:
+            self.__reader.cancel()
+            try:
+                await self.__reader
+            except asyncio.CancelledError:
+                pass
+            self.__reader = None
+
+        if self.__pubsub:
+            await self.__pubsub.aclose()
+            self.__pubsub = None
+
+        self.__handlers.clear()
+        logger.info("Redis broker closed.")
+
+    async def subscribe(
+        self, channel: str, handler: Callable[[bytes], Awaitable[None]]
+    ) -> None:
+        """
+        Один обработчик на канал, повторная подписка заменяет обработчик
+        """
+        is_new = channel not in self.__handlers
+        self.__handlers[channel] = handler
+        if is_new and self.__pubsub:
+            await self.__pubsub.subscribe(channel)
+
+    async def unsubscribe(self, channel: str) -> None:
+        if self.__handlers.pop(channel, None) and self.__pubsub:
+            await self.__pubsub.unsubscribe(channel)
+
+    async def publish(self, channel: str, data: bytes | str) -> None:
+        """
+        Без запущенного broker (тесты, один процесс без redis) событие
+         доставляется только локальному обработчику
+        """
+        if not self.is_running:
+            if handler := self.__handlers.get(channel):
+                await handler(data.encode() if isinstance(data, str) else data)
+            return
+
+        async with get_redis_client() as redis:
+            await redis.publish(channel, data)
+
+    async def __read(self) -> None:
+        while True:
+            try:
+                message = await self.__pubsub.get_message(
+                    ignore_subscribe_messages=True, timeout=self.poll_timeout
+                )
+            except asyncio.CancelledError:
+                raise
+            except (RedisError, OSError) as e:
+                # pubsub сам переподключается и восстанавливает подписки
+                logger.warning(f"Redis broker read failed: {e}")
+                await asyncio.sleep(self.poll_timeout)
+                continue
+
+            if not message or message["type"] != "message":
+                continue
+
+            channel = message["channel"].decode()
+            if not (handler := self.__handlers.get(channel)):
+                continue
+
+            try:
+                await handler(message["data"])
+            except Exception as e:
+                logger.warning(f"Redis broker handler {channel} failed: {e}")
+
+
+redis_broker = RedisBroker()
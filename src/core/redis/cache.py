@@ -0,0 +1,138 @@
+import json
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable
+
+from fastapi.encoders import jsonable_encoder
+from redis.exceptions import RedisError
+
+from .client import get_redis_client
+
+
+logger = logging.getLogger("uvicorn")
+# Запросы одного процесса за одним и тем же ключом ждут одно вычисление
+_inflight: dict[str, asyncio.Future] = {}
+# Сколько секунд другие процессы ждут значение от держателя лока, дальше считают сами
+LOCK_WAIT_TIMEOUT = 2
+
+
+async def get_or_set(
+    key: str,
+    factory: Callable[[], Awaitable[Any]],
+    ttl: int,
+    lock_ttl: int = 10,
+) -> Any:
+    """
+    Достаёт значение из кэша, при промахе вычисляет его через factory ровно один раз:
+     внутри процесса - через общий future, между процессами - через SET NX лок,
+     остальные ждут появления ключа не дольше LOCK_WAIT_TIMEOUT. Недоступность redis не ломает запрос
+    """
+    try:
+        async with get_redis_client() as redis:
+            cached = await redis.get(key)
+        if cached is not None:
+            return json.loads(cached)
+    except RedisError as e:
+        logger.warning(f"cache get {key}: {e}")
+        return await factory()
+
+    if key in _inflight:
+        return await asyncio.shield(_inflight[key])
+
+    future = asyncio.get_running_loop().create_future()
+    _inflight[key] = future
+    try:
+        value = await __compute(key, factory, ttl, lock_ttl)
+        future.set_result(value)
+        return value
+    except Exception as e:
+        future.set_exception(e)
+        # Ожидающих может не быть, исключение всё равно надо "забрать"
+        future.exception()
+        raise
+    finally:
+        if not future.done():
+            future.cancel()
+        del _inflight[key]
+
+
+async def __compute(
+    key: str, factory: Callable[[], Awaitable[Any]], ttl: int, lock_ttl: int
+) -> Any:
+    lock_key = f"{key}:lock"
+    is_locked = False
+    try:
+        async with get_redis_client() as redis:
+            is_locked = await redis.set(lock_key, 1, nx=True, ex=lock_ttl)
+        if not is_locked:
+            # Значение уже считает другой процесс
+            cached = await __wait_value(key, lock_key)
+            if cached is not None:
+                return json.loads(cached)
+    except RedisError as e:
+        logger.warning(f"cache lock {key}: {e}")
+
+    try:
+        value = jsonable_encoder(await factory())
+        async with get_redis_client() as redis:
+            await redis.set(key, json.dumps(value), ex=ttl)
+    except RedisError as e:
+        logger.warning(f"cache set {key}: {e}")
+    finally:
+        if is_locked:
+            try:
+                async with get_redis_client() as redis:
+                    await redis.delete(lock_key)
+            except RedisError:
+                pass
+
+    return value
+
+
+async def __wait_value(key: str, lock_key: str) -> bytes | None:
+    """
+    Ждёт значение не дольше LOCK_WAIT_TIMEOUT, соединение берётся из пула только
+     на время каждой проверки. None - не дождались или лок снят без значения
+     (вычисление упало), тогда вызывающий считает значение сам
+    """
+    delay = 0.02
+    deadline = asyncio.get_running_loop().time() + LOCK_WAIT_TIMEOUT
+    while asyncio.get_running_loop().time() < deadline:
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, 0.2)
+
+        async with get_redis_client() as redis:
+            cached, is_locked = await redis.mget(key, lock_key)
+        if cached is not None or is_locked is None:
+            return cached
+
+    return None
+
+
+async def get_version(name: str) -> int:
+    """
+    Версия группы ключей, входит в сами ключи. Смена версии = инвалидация всей группы
+    """
+    try:
+        async with get_redis_client() as redis:
+            version = await redis.get(f"{name}:version")
+    except RedisError as e:
+        logger.warning(f"cache version {name}: {e}")
+        return 0
+
+    return int(version) if version else 0
+
+
+async def invalidate(versions: list[str] = None, keys: list[str] = None) -> None:
+    versions = versions or []
+    keys = keys or []
+    try:
+        async with get_redis_client() as redis:
+            async with redis.pipeline(transaction=False) as pipe:
+                for name in versions:
+                    pipe.incr(f"{name}:version")
+                if keys:
+                    pipe.delete(*keys)
+                await pipe.execute()
+    except RedisError as e:
+        logger.warning(f"cache invalidate {versions} {keys}: {e}")
@@ -0,0 +1,100 @@
+import json
+import hashlib
+import logging
+from typing import Any, Awaitable, Callable
+
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+from redis.exceptions import RedisError
+
+from .client import get_redis_client
+
+
+logger = logging.getLogger("uvicorn")
+
+
+def fingerprint(data: Any) -> str:
+    """
+    Отпечаток тела запроса - один и тот же ключ нельзя использовать с другими данными
+    """
+    return hashlib.sha256(
+        json.dumps(jsonable_encoder(data), sort_keys=True).encode()
+    ).hexdigest()
+
+
+async def run_once(
+    key: str,
+    request_fingerprint: str,
+    factory: Callable[[], Awaitable[Any]],
+    ttl: int,
+    lock_ttl: int = 30,
+) -> Any:
+    """
+    Выполняет factory один раз для ключа и хранит сериализованный ответ ttl секунд,
+     повтор с тем же ключом получает сохранённый ответ (или ту же 4xx ошибку).
+    Пока первый запрос выполняется - 409, ключ с другим телом запроса - 422.
+    Ошибки 5xx и прочие исключения ответ не сохраняют, запрос можно повторить.
+    Недоступность redis не ломает запрос, но и не защищает от повтора
+    """
+    processing = json.dumps({"fingerprint": request_fingerprint})
+    try:
+        async with get_redis_client() as redis:
+            is_new = await redis.set(key, processing, nx=True, ex=lock_ttl)
+            stored = None if is_new else await redis.get(key)
+    except RedisError as e:
+        logger.warning(f"idempotency {key}: {e}")
+        return await factory()
+
+    if not is_new:
+        return __replay(stored, request_fingerprint)
+
+    try:
+        value = jsonable_encoder(await factory())
+    except HTTPException as e:
+        if e.status_code >= 500:
+            await __forget(key)
+            raise
+        await __store(
+            key,
+            {"fingerprint": request_fingerprint, "status_code": e.status_code, "detail": e.detail},
+            ttl,
+        )
+        raise
+    except BaseException:
+        await __forget(key)
+        raise
+
+    await __store(key, {"fingerprint": request_fingerprint, "response": value}, ttl)
+    return value
+
+
+def __replay(stored: bytes | None, request_fingerprint: str) -> Any:
+    if stored is None:
+        # Ключ истёк между SET и GET - первый запрос только что упал или был забыт
+        raise HTTPException(409, "Request with this Idempotency-Key is being processed")
+
+    stored = json.loads(stored)
+    if stored["fingerprint"] != request_fingerprint:
+        raise HTTPException(422, "Idempotency-Key was used with another request")
+    if "status_code" in stored:
+        raise HTTPException(stored["status_code"], stored["detail"])
+    if "response" not in stored:
+        raise HTTPException(409, "Request with this Idempotency-Key is being processed")
+
+    return stored["response"]
+
+
+async def __store(key: str, record: dict, ttl: int) -> None:
+    try:
+        async with get_redis_client() as redis:
+            await redis.set(key, json.dumps(record), ex=ttl)
+    except RedisError as e:
+        logger.warning(f"idempotency store {key}: {e}")
+
+
+async def __forget(key: str) -> None:
+    try:
+        async with get_redis_client() as redis:
+            await redis.delete(key)
+    except RedisError as e:
+        logger.warning(f"idempotency forget {key}: {e}")
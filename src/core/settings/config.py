@@ -110,7 +110,22 @@ TG_LOG_TOKEN: str = os.getenv("TG_LOG_TOKEN")
 TG_ERROR_LOG_CHANNEL: int = os.getenv("TG_ERROR_LOG_CHANNEL")
 TG_INFO_LOG_CHANNEL: int = os.getenv("TG_INFO_LOG_CHANNEL")
 
+# ONLINE
+
+# Процесс считается упавшим, если не продлевал свой ключ ONLINE_WORKER_TTL секунд
+ONLINE_WORKER_TTL: int = int(os.getenv("ONLINE_WORKER_TTL"))
+ONLINE_HEARTBEAT_INTERVAL: float = float(os.getenv("ONLINE_HEARTBEAT_INTERVAL"))
+
 # OFFER
 
 OFFER_UP_INTERVAL: float = float(os.getenv("OFFER_UP_INTERVAL"))
+OFFERS_CACHE_TTL: int = int(os.getenv("OFFERS_CACHE_TTL"))
+
+# PURCHASE
+
+# Через сколько секунд в статусе review покупка завершается автоматически
+PURCHASE_REVIEW_TIMEOUT: int = int(os.getenv("PURCHASE_REVIEW_TIMEOUT"))
+PURCHASE_REVIEW_CHECK_INTERVAL: float = float(os.getenv("PURCHASE_REVIEW_CHECK_INTERVAL"))
+# Сколько секунд хранится ответ на создание покупки по Idempotency-Key
+PURCHASE_IDEMPOTENCY_TTL: int = int(os.getenv("PURCHASE_IDEMPOTENCY_TTL"))
 
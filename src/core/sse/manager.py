@@ -1,4 +1,7 @@
+import json
+import logging
 from dataclasses import dataclass
+from functools import partial
 from uuid import uuid4
 
 from fastapi.responses import StreamingResponse
@@ -7,11 +10,13 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from core.sse.queue import SseQueue
 from core.database import get_session
+from core.redis import redis_broker
 from core.settings import config
 from core import depends as deps
 from app.tokens import schemas as schemas_t
 
 
+logger = logging.getLogger("uvicorn")
 default_session = deps.UserSession()
 
 
@@ -47,6 +52,12 @@ class SseManagerContext:
 
 
 class BaseNotificationManager:
+    """
+    SSE соединения пользователя живут в одном процессе, события публикуются через
+     redis_broker в канал {channel_prefix}:{user_id} - доставляет процесс с соединениями
+    """
+    channel_prefix: str = "notifications"
+
     def __init__(self) -> None:
         self.sse_managers: dict[int, SseManagerContext] = {}
 
@@ -67,6 +78,9 @@ class BaseNotificationManager:
         context = self.sse_managers.get(user_id)
         if not context:
             context = SseManagerContext.get_new_manager()
+            await redis_broker.subscribe(
+                f"{self.channel_prefix}:{user_id}", partial(self.__deliver, user_id)
+            )
 
         user_uuid = context.create_listener()
         self.sse_managers[user_id] = context
@@ -90,7 +104,7 @@ class BaseNotificationManager:
         listener = context.get_listener(user_uuid)
 
         bd_tasks = BackgroundTasks()
-        bd_tasks.add_task(context.delete_listener, user_uuid)
+        bd_tasks.add_task(self.remove_listener, user_id, user_uuid)
         response = StreamingResponse(
             content=listener.get_events(),
             media_type="text/event-stream",
@@ -100,3 +114,26 @@ class BaseNotificationManager:
         response.headers["Connection"] = "keep-alive"
 
         return response
+
+    async def remove_listener(self, user_id: int, user_uuid: str) -> None:
+        context = self.sse_managers.get(user_id)
+        if not context:
+            return
+
+        context.delete_listener(user_uuid)
+        if not context.listeners:
+            del self.sse_managers[user_id]
+            await redis_broker.unsubscribe(f"{self.channel_prefix}:{user_id}")
+
+    async def publish(self, users_ids: list[int], **event_data) -> None:
+        """
+        event_data - как у SseManagerContext.create_event, без гарантии доставки:
+         пользователь без открытых соединений событие не получит
+        """
+        data = json.dumps(event_data)
+        for user_id in users_ids:
+            await redis_broker.publish(f"{self.channel_prefix}:{int(user_id)}", data)
+
+    async def __deliver(self, user_id: int, data: bytes) -> None:
+        if context := self.sse_managers.get(user_id):
+            await context.create_event(**json.loads(data))
@@ -1,3 +1,4 @@
 from .utils import check_dir_exists, AppStatus
 from .telegram import send_telegram_message
 from .setup_helper import setup_helper
+from .cursor import encode_cursor, decode_cursor
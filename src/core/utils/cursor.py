@@ -0,0 +1,28 @@
+import json
+import base64
+import binascii
+from typing import Any
+
+
+def encode_cursor(*values: Any) -> str:
+    """
+    Упаковывает значения ключа сортировки в непрозрачную для клиента строку
+    """
+    raw = json.dumps(values, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> list | None:
+    """
+    Обратное к encode_cursor, при битом курсоре возвращает None
+    """
+    padding = "=" * (-len(cursor) % 4)
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + padding))
+    except (binascii.Error, ValueError):
+        return None
+
+    if not isinstance(values, list):
+        return None
+
+    return values
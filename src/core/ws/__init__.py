@@ -0,0 +1 @@
+from .sender import WsSender
@@ -0,0 +1,74 @@
+import asyncio
+import logging
+
+from fastapi import WebSocket, status
+
+
+logger = logging.getLogger("uvicorn")
+
+
+class WsSender:
+    """
+    Отправка в один websocket через ограниченную очередь и отдельную задачу-писателя,
+     send не ждёт клиента - медленный сокет не тормозит рассылку остальным.
+    Политика: очередь переполнена или отправка дольше send_timeout -
+     сокет закрывается с 1013 (Try Again Later), клиент переподключается и
+     догружает историю по курсору
+    """
+    max_queue_size: int = 256
+    send_timeout: float = 10
+
+    def __init__(self, websocket: WebSocket) -> None:
+        self.websocket = websocket
+        self.__queue: asyncio.Queue[str] = asyncio.Queue(self.max_queue_size)
+        self.__writer = asyncio.create_task(self.__write())
+        self.__is_closed = False
+
+    def send(self, data: str) -> bool:
+        """
+        Ставит уже сериализованное сообщение в очередь, False - сокет закрывается
+        """
+        if self.__is_closed:
+            return False
+
+        try:
+            self.__queue.put_nowait(data)
+        except asyncio.QueueFull:
+            self.__abort("Send queue overflow")
+            return False
+
+        return True
+
+    def close(self) -> None:
+        """
+        Без закрытия самого сокета - вызывается когда он уже отключён
+        """
+        self.__is_closed = True
+        self.__writer.cancel()
+
+    async def __write(self) -> None:
+        while True:
+            data = await self.__queue.get()
+            try:
+                await asyncio.wait_for(self.websocket.send_text(data), self.send_timeout)
+            except asyncio.TimeoutError:
+                self.__abort("Send timeout")
+                return
+            except Exception:
+                # Сокет уже закрыт, отключение обработает слушатель
+                self.close()
+                return
+
+    def __abort(self, reason: str) -> None:
+        logger.warning(f"Websocket dropped: {reason}")
+        self.close()
+        self.__closing = asyncio.create_task(self.__close_websocket(reason))
+
+    async def __close_websocket(self, reason: str) -> None:
+        try:
+            await asyncio.wait_for(
+                self.websocket.close(status.WS_1013_TRY_AGAIN_LATER, reason),
+                self.send_timeout,
+            )
+        except Exception:
+            pass
@@ -14,7 +14,7 @@ from fastapi.openapi.utils import get_openapi
 import core.settings as conf
 from core.database import event_listener, init_models, context_get_session
 
-from core.redis import redis_pool, get_redis_client
+from core.redis import redis_pool, redis_broker, get_redis_client
 from core.logging import InfoHandlerTG, WarningHandlerTG, ErrorHandlerTG
 from core.utils import check_dir_exists, setup_helper
 from app.users import users_routers
@@ -60,6 +60,7 @@ async def lifespan(app: FastAPI):
 
     async with get_redis_client() as client:
         logger.info(f"Redis ping returned with: {await client.ping()}.")
+    await redis_broker.start()
 
     await check_dir_exists(conf.DATA_PATH, auto_create=True)
     
@@ -68,6 +69,7 @@ async def lifespan(app: FastAPI):
     yield
     
     await event_listener.close_listener_connection()
+    await redis_broker.close()
     await redis_pool.aclose()
     logger.info("RedisPool closed.")
 
@@ -0,0 +1,159 @@
+import json
+import time
+
+from sqlalchemy import update
+
+from tests.conftest import async_session
+
+from app.messages.services import message_manager, ChatConnectionManager
+from app.messages.schemas import MessageCreate, SystemMessageCreate
+from app.messages.models import SystemMessage
+from app.users.services.users_base import create_user
+from app.users.schemas.users import UserSignUp
+
+from core.database.preload_data import preload_db_main
+from core.redis import redis_broker
+
+
+test_password = "12341234"
+test_user_ids = []
+test_users_count = 4
+
+
+async def test_init_test_db():
+    async with async_session() as session:
+        await preload_db_main(session)
+
+    async with async_session() as session:
+        for i in range(test_users_count):
+            user = await create_user(
+                db_session=session,
+                obj_in=UserSignUp(
+                    password=test_password,
+                    email=f"chatuser{i}@example.com",
+                    username=f"chatuser{i}",
+                ),
+                additional_fields={"is_verified": True},
+            )
+            test_user_ids.append(user.id)
+
+    assert len(test_user_ids) == test_users_count
+
+
+async def test_dialogs_with_last_message():
+    user_id, *interlocutor_ids = test_user_ids
+    async with async_session() as session:
+        chat_ids = [
+            (await message_manager.create_dialog(session, user_id, interlocutor_id))["chat_id"]
+            for interlocutor_id in interlocutor_ids
+        ]
+
+        await message_manager.create_message_by_sender_id(
+            session, user_id, MessageCreate(chat_id=chat_ids[0], content="first")
+        )
+        await message_manager.create_message_by_sender_id(
+            session, interlocutor_ids[1], MessageCreate(chat_id=chat_ids[1], content="second")
+        )
+        system_message = await message_manager.create_system_message(
+            session, SystemMessageCreate(chat_id=chat_ids[1], content="system")
+        )
+        # Системное сообщение позже всех, диалог chat_ids[2] без сообщений
+        stmt = (
+            update(SystemMessage)
+            .where(SystemMessage.id == system_message.id)
+            .values(created_at=SystemMessage.created_at + 10)
+        )
+        await session.execute(stmt)
+        await session.commit()
+
+        dialogs = await message_manager.get_all_user_dialogs_ids_by_user_id_with_last_message_with_sort(
+            session, user_id
+        )
+        assert [dialog["chat_id"] for dialog in dialogs] == [chat_ids[1], chat_ids[0], chat_ids[2]]
+        assert dialogs[0]["interlocutor_id"] == interlocutor_ids[1]
+        assert dialogs[0]["last_message"]["content"] == "system"
+        assert dialogs[0]["last_message"]["user_id"] == -1
+        assert dialogs[1]["last_message"]["content"] == "first"
+        assert dialogs[1]["message_count"] == 1
+        assert dialogs[2]["last_message"] is None
+
+        page = await message_manager.get_all_user_dialogs_ids_by_user_id_with_last_message_with_sort(
+            session, user_id, offset=1, limit=1
+        )
+        assert [dialog["chat_id"] for dialog in page] == [chat_ids[0]]
+
+
+async def test_messages_cursor_pagination():
+    user_id, interlocutor_id = test_user_ids[0], test_user_ids[1]
+    async with async_session() as session:
+        chat_id = (await message_manager.get_dialog_id_by_user_id(session, user_id, interlocutor_id))["chat_id"]
+        for i in range(7):
+            await message_manager.create_message_by_sender_id(
+                session, user_id if i % 2 else interlocutor_id, MessageCreate(chat_id=chat_id, content=f"m{i}")
+            )
+        await message_manager.create_system_message(
+            session, SystemMessageCreate(chat_id=chat_id, content="system")
+        )
+
+        all_messages = await message_manager.get_messages_by_chat_id_user_id(
+            session, chat_id, user_id, 0, 100
+        )
+        assert len({message["id"] for message in all_messages}) == len(all_messages)
+
+        pages = []
+        page = await message_manager.get_messages_by_chat_id_user_id(session, chat_id, user_id, 0, 3)
+        while page:
+            pages = page + pages
+            page = await message_manager.get_messages_by_chat_id_user_id(
+                session, chat_id, user_id, 0, 3, before_id=page[0]["id"]
+            )
+        assert pages == all_messages
+
+        newer = await message_manager.get_messages_by_chat_id_user_id(
+            session, chat_id, user_id, 0, 100, after_id=all_messages[2]["id"]
+        )
+        assert newer == all_messages[3:]
+
+        # Курсор на системном сообщении (id < 0)
+        system_index = next(i for i, message in enumerate(all_messages) if message["id"] < 0)
+        older = await message_manager.get_messages_by_chat_id_user_id(
+            session, chat_id, user_id, 0, 100, before_id=all_messages[system_index]["id"]
+        )
+        assert older == all_messages[:system_index]
+        newer = await message_manager.get_messages_by_chat_id_user_id(
+            session, chat_id, user_id, 0, 100, after_id=all_messages[system_index]["id"]
+        )
+        assert newer == all_messages[system_index + 1:]
+
+
+async def test_files_attached_broadcast():
+    user_id, interlocutor_id = test_user_ids[0], test_user_ids[1]
+    received = []
+
+    async def handler(data: bytes):
+        received.append(json.loads(data))
+
+    async with async_session() as session:
+        chat_id = (await message_manager.get_dialog_id_by_user_id(session, user_id, interlocutor_id))["chat_id"]
+        message = await message_manager.create_message_by_sender_id(
+            session, user_id, MessageCreate(chat_id=chat_id, content="with files", need_wait=5)
+        )
+
+        await redis_broker.subscribe(f"chat:{interlocutor_id}", handler)
+        try:
+            # Файлы прикрепил не автор - события нет
+            await ChatConnectionManager().files_attached_callback(session, message.id, interlocutor_id)
+            assert received == []
+
+            await ChatConnectionManager().files_attached_callback(session, message.id, user_id)
+        finally:
+            await redis_broker.unsubscribe(f"chat:{interlocutor_id}")
+
+    assert received == [{
+        "event": "files_attached",
+        "id": message.id,
+        "chat_id": chat_id,
+        "user_id": user_id,
+        "files": None,
+    }]
+    assert message.created_at <= int(time.time())
@@ -21,6 +21,15 @@ async def test_get_all(async_client: AsyncClient):
     assert response.status_code == 200
 
 
+async def test_get_all_offers_with_cursor(async_client: AsyncClient):
+    response = await async_client.get(base_endpoint + "getall/", params={"use_cursor": True, "limit": 1})
+    assert response.status_code == 200
+    assert "next_cursor" in response.json()
+
+    response = await async_client.get(base_endpoint + "getall/", params={"cursor": "invalid"})
+    assert response.status_code == 400
+
+
 async def test_get_offer_by_id(async_client: AsyncClient):
     response = await async_client.get(base_endpoint + "1/")
     assert response.status_code == 200
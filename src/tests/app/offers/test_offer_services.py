@@ -1,3 +1,9 @@
+import io
+import asyncio
+
+from fastapi import UploadFile
+
+from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from tests.conftest import async_session
@@ -5,6 +11,8 @@ from tests.conftest import async_session
 from app.offers.services.offers_my import *
 from app.offers.schemas.offers import *
 from app.offers.services.offers_public import *
+from app.offers.services.delivery_my import *
+from app.offers.services import offers_cache
 from app.offers.models import Offer
 
 from core.database.preload_data import preload_db_main
@@ -45,6 +53,16 @@ async def test_offer_create():
         assert offer.name == test_offer_name
         assert offer.description == test_offer_description
         assert offer.user_id == test_offer_user_id
+        assert offer.category_value_ids == test_category_value_ids
+
+
+async def test_offer_card():
+    async with async_session() as session:
+        stmt = select(Offer.__table__.c.card).where(Offer.id == test_offer_id)
+        card: dict = (await session.execute(stmt)).scalar_one()
+        assert card["username"]
+        assert [value["id"] for value in card["category_values"]] == test_category_value_ids
+        assert card["offer_files"] == []
 
 
 async def test_get_raw_offer_by_user_id():
@@ -83,6 +101,95 @@ async def test_get_mini_by_user_id_offset_limit():
         assert test_offer_description in [offer["description"] for offer in offers] 
 
 
+async def test_get_mini_by_user_id_offset_limit_category_filter():
+    async with async_session() as session:
+        offers: list[dict] = await get_mini_by_user_id_offset_limit(
+            db_session=session,
+            offset=0,
+            limit=50,
+            user_id=test_offer_user_id,
+            category_value_ids=test_category_value_ids[1:],
+        )
+        assert test_offer_id in [offer["id"] for offer in offers]
+        for offer in offers:
+            offer_value_ids = [value["id"] for value in offer["category_values"]]
+            assert set(test_category_value_ids[1:]) <= set(offer_value_ids)
+
+
+async def test_get_mini_by_offset_limit():
+    async with async_session() as session:
+        offers: list[dict] = await get_mini_by_offset_limit(
+            db_session=session,
+            offset=0,
+            limit=50,
+        )
+        assert offers
+        for offer in offers:
+            assert offer["username"]
+            assert offer["category_values"]
+            assert "files_offer" in offer and "files_user" in offer
+
+
+async def test_get_mini_by_cursor_limit():
+    async with async_session() as session:
+        all_offers = await get_mini_by_offset_limit(db_session=session, offset=0, limit=50, is_descending=False)
+
+        offers, cursor = [], None
+        while True:
+            page, cursor = await get_mini_by_cursor_limit(
+                db_session=session, cursor=cursor, limit=2, is_descending=False
+            )
+            offers.extend(page)
+            if not cursor:
+                break
+
+        assert [offer["id"] for offer in offers] == [offer["id"] for offer in all_offers]
+
+
+async def test_get_mini_by_user_id_offset_limit_search():
+    async with async_session() as session:
+        offers: list[dict] = await get_mini_by_user_id_offset_limit(
+            db_session=session,
+            offset=0,
+            limit=50,
+            user_id=test_offer_user_id,
+            search_query=test_offer_description,
+            by_relevance=True,
+        )
+        assert offers
+        assert offers[0]["description"] == test_offer_description
+
+
+async def test_get_offer_list_cache():
+    calls = 0
+
+    async def get_offers():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.1)
+        return [{"id": test_offer_id}]
+
+    await offers_cache.invalidate_offers(test_offer_id)
+    results = await asyncio.gather(
+        *[offers_cache.get_offer_list(get_offers, limit=10, category_value_ids=[2, 1]) for _ in range(10)]
+    )
+    cached = await offers_cache.get_offer_list(get_offers, limit=10, category_value_ids=[1, 2])
+
+    assert calls == 1
+    assert all(result == [{"id": test_offer_id}] for result in results)
+    assert cached == [{"id": test_offer_id}]
+
+
+async def test_get_root_categories_count_with_offset_limit():
+    async with async_session() as session:
+        categories: list[dict] = await get_root_categories_count_with_offset_limit(
+            db_session=session, user_id=test_offer_user_id, offset=0, limit=10
+        )
+        assert categories
+        assert test_category_value_ids[0] in [category["value_id"] for category in categories]
+        assert all(category["offer_count"] > 0 for category in categories)
+
+
 async def test_get_offer_by_carcass_id():
     async with async_session() as session:
         offers: list  = await get_offers_by_carcass_id(db_session=session, user_id=test_offer_user_id, carcass_id=1, offset=0, limit=10)
@@ -107,6 +214,83 @@ async def test_update_offer():
         ))
         assert offer.name == test_offer_name_second
 
+        # Пустой список категорий - категории остаются прежними
+        offer = await update_offer(db_session=session, db_obj=offer, obj_in={"category_value_ids": []})
+        assert sorted(value.category_value_id for value in offer.category_values) == test_category_value_ids
+
+
+async def test_create_and_update_offers_many():
+    async with async_session() as session:
+        offers: list[Offer] = await create_offers_many(
+            db_session=session,
+            user_id=test_offer_user_id,
+            offers_in=[
+                CreateOffer(
+                    name=f"{test_offer_name}{i}",
+                    description=test_offer_description,
+                    price=test_offer_price,
+                    count=test_offer_count,
+                    category_value_ids=test_category_value_ids,
+                )
+                for i in range(3)
+            ],
+        )
+        assert len(offers) == 3
+
+        offers: list[Offer] = await update_offers_many(
+            db_session=session,
+            user_id=test_offer_user_id,
+            offers_in=[
+                BulkUpdateOffer(
+                    id=offer.id,
+                    name=test_offer_name_second,
+                    description=test_offer_description,
+                    price=test_offer_price,
+                    count=test_offer_count,
+                    category_value_ids=test_category_value_ids[:2],
+                )
+                for offer in offers
+            ],
+        )
+        assert all(offer.name == test_offer_name_second for offer in offers)
+        assert all(offer.category_value_ids == test_category_value_ids[:2] for offer in offers)
+
+        for offer in offers:
+            await delete_offer(db_session=session, user_id=test_offer_user_id, offer_id=offer.id)
+
+
+async def test_import_and_delete_deliveries():
+    async with async_session() as session:
+        file = UploadFile(io.BytesIO(("key1\r\nkey2\n\n" + "x" * 501).encode()), filename="keys.txt")
+        result = await import_deliveries(session, offer_id=test_offer_id, file=file)
+        assert result == {"inserted": 2, "rejected": 1}
+        delivery_count_stmt = select(Offer.delivery_count).where(Offer.id == test_offer_id)
+        assert (await session.execute(delivery_count_stmt)).scalar_one() == 2
+
+        deliveries = await get_deliveries_by_offer_id(session, offer_id=test_offer_id, offset=0, limit=10)
+        assert [delivery["value"] for delivery in deliveries] == ["key1", "key2"]
+
+        deleted_ids = await delete_deliveries_many(
+            session, user_id=test_offer_user_id, delivery_ids=[delivery["id"] for delivery in deliveries]
+        )
+        assert len(deleted_ids) == 2
+        assert (await session.execute(delivery_count_stmt)).scalar_one() == 0
+
+
+async def test_import_csv_deliveries_with_quoted_newlines():
+    async with async_session() as session:
+        data = 'key1,a\r\n"multi\r\nline",b\n"x""y",c\n\n"unterminated'
+        file = UploadFile(io.BytesIO(data.encode()), filename="keys.csv")
+        result = await import_deliveries(session, offer_id=test_offer_id, file=file)
+        assert result == {"inserted": 3, "rejected": 1}
+
+        deliveries = await get_deliveries_by_offer_id(session, offer_id=test_offer_id, offset=0, limit=10)
+        assert sorted(delivery["value"] for delivery in deliveries) == sorted(["key1", "multi\nline", 'x"y'])
+
+        await delete_deliveries_many(
+            session, user_id=test_offer_user_id, delivery_ids=[delivery["id"] for delivery in deliveries]
+        )
+
 
 async def test_delete_offer():
     async with async_session() as session:
@@ -0,0 +1,355 @@
+import io
+import time
+import asyncio
+
+import pytest
+
+from fastapi import HTTPException, UploadFile
+from sqlalchemy import select, func, update, delete
+
+from tests.conftest import async_session
+
+from app.offers.services import create_offer, update_offer, delete_offer, import_deliveries
+from app.offers.schemas import CreateOffer
+from app.offers.models import Offer
+from app.purchase.services.purchase import purchase_manager
+from app.purchase.services import purchase_outbox_dispatcher, sales_stats_manager
+from app.purchase.models import PurchaseOutbox, Purchase, Review
+from app.purchase.schemas import PurchaseCreate, ReviewCreate
+from app.users.models import User
+from app.users.services.users_base import create_user
+from app.users.schemas.users import UserSignUp
+
+from core.database.preload_data import preload_db_main
+from core.redis import idempotency
+
+
+test_seller_id = 1
+test_category_value_ids = [1, 2, 3]
+test_buyers_count = 30
+test_stock = 20
+test_password = "12341234"
+test_buyer_ids = []
+
+
+async def test_init_test_db():
+    async with async_session() as session:
+        await preload_db_main(session)
+
+    async with async_session() as session:
+        for i in range(test_buyers_count):
+            user = await create_user(
+                db_session=session,
+                obj_in=UserSignUp(
+                    password=test_password,
+                    email=f"concurrentbuyer{i}@example.com",
+                    username=f"buyer{i}",
+                ),
+                additional_fields={"is_verified": True},
+            )
+            test_buyer_ids.append(user.id)
+
+    assert len(test_buyer_ids) == test_buyers_count
+
+
+async def __create_test_offer(is_autogive_enabled: bool) -> int:
+    async with async_session() as session:
+        offer: Offer = await create_offer(
+            db_session=session,
+            user_id=test_seller_id,
+            obj_in=CreateOffer(
+                name="CONCURRENT",
+                description="CONCURRENT",
+                price=100,
+                count=test_stock,
+                category_value_ids=test_category_value_ids,
+            ),
+        )
+        offer = await update_offer(
+            session, offer, {"status": "active", "is_autogive_enabled": is_autogive_enabled}
+        )
+
+        if is_autogive_enabled:
+            values = "\n".join(f"key{i}" for i in range(test_stock))
+            file = UploadFile(io.BytesIO(values.encode()), filename="keys.txt")
+            await import_deliveries(session, offer_id=offer.id, file=file)
+
+        return offer.id
+
+
+async def __buy_concurrently(offer_id: int) -> tuple[list, list, float]:
+    async def buy(buyer_id: int):
+        async with async_session() as session:
+            return await purchase_manager.create_purchase(
+                session, buyer_id, PurchaseCreate(offer_id=offer_id, count=1)
+            )
+
+    started_at = time.perf_counter()
+    results = await asyncio.gather(
+        *[buy(buyer_id) for buyer_id in test_buyer_ids], return_exceptions=True
+    )
+    elapsed = time.perf_counter() - started_at
+
+    purchases = [result for result in results if not isinstance(result, BaseException)]
+    errors = [result for result in results if isinstance(result, BaseException)]
+    return purchases, errors, elapsed
+
+
+async def test_concurrent_autogive_purchases():
+    offer_id = await __create_test_offer(is_autogive_enabled=True)
+    purchases, errors, elapsed = await __buy_concurrently(offer_id)
+    print(f"{test_buyers_count} concurrent autogive purchases: {elapsed:.3f}s")
+
+    assert len(purchases) == test_stock
+    assert all(isinstance(error, HTTPException) and error.status_code == 403 for error in errors)
+
+    parcel_values = [parcel.value for purchase in purchases for parcel in purchase.parcels]
+    assert len(parcel_values) == len(set(parcel_values)) == test_stock
+
+    async with async_session() as session:
+        stmt = select(Offer.delivery_count).where(Offer.id == offer_id)
+        assert (await session.execute(stmt)).scalar_one() == 0
+
+
+async def test_concurrent_count_purchases():
+    offer_id = await __create_test_offer(is_autogive_enabled=False)
+    purchases, errors, elapsed = await __buy_concurrently(offer_id)
+    print(f"{test_buyers_count} concurrent count purchases: {elapsed:.3f}s")
+
+    assert len(purchases) == test_stock
+    assert all(isinstance(error, HTTPException) and error.status_code == 403 for error in errors)
+
+    async with async_session() as session:
+        stmt = select(Offer.count).where(Offer.id == offer_id)
+        assert (await session.execute(stmt)).scalar_one() == 0
+
+
+async def test_purchase_outbox_dispatch():
+    async with async_session() as session:
+        stmt = select(func.count()).select_from(PurchaseOutbox)
+        assert (await session.execute(stmt)).scalar_one() >= test_stock * 2
+
+    while await purchase_outbox_dispatcher.dispatch_batch():
+        pass
+
+    async with async_session() as session:
+        stmt = select(func.count()).select_from(PurchaseOutbox)
+        assert (await session.execute(stmt)).scalar_one() == 0
+
+
+async def test_sells_cursor_pagination():
+    async with async_session() as session:
+        sells = await purchase_manager.get_all_sells(
+            session, offset=0, limit=1000, seller_id=test_seller_id
+        )
+
+        cursor, paged_ids = None, []
+        while True:
+            page, cursor = await purchase_manager.get_all_sells_by_cursor(
+                session, cursor=cursor, limit=7, seller_id=test_seller_id
+            )
+            paged_ids.extend(sell.id for sell in page)
+            if not cursor:
+                break
+
+    assert paged_ids == [sell.id for sell in sells]
+    assert len(paged_ids) >= test_stock * 2
+
+
+async def test_sales_dashboard_matches_purchases():
+    async with async_session() as session:
+        dashboard = await sales_stats_manager.get_dashboard(
+            session, test_seller_id, period="week", days=7
+        )
+
+        stmt = (
+            select(Purchase.status, func.count(), func.sum(Purchase.price * Purchase.count))
+            .join(Offer, Offer.id == Purchase.offer_id)
+            .where(Offer.user_id == test_seller_id)
+            .group_by(Purchase.status)
+        )
+        rows = (await session.execute(stmt)).all()
+
+    assert dashboard["statuses"] == {status: count for status, count, _ in rows}
+    assert dashboard["purchases_count"] == sum(count for _, count, _ in rows)
+    assert dashboard["revenue"] == sum(revenue for _, _, revenue in rows)
+    assert sum(period["revenue"] for period in dashboard["revenue_by_period"]) == dashboard["revenue"]
+    assert dashboard["top_offers"][0]["revenue"] >= dashboard["top_offers"][-1]["revenue"]
+
+
+async def test_concurrent_status_transition():
+    async with async_session() as session:
+        stmt = (
+            select(Purchase.id, Purchase.version)
+            .join(Offer, Offer.id == Purchase.offer_id)
+            .where(Offer.user_id == test_seller_id)
+            .where(Purchase.status == "process")
+            .limit(1)
+        )
+        purchase_id, version = (await session.execute(stmt)).one()
+
+    async def confirm():
+        async with async_session() as session:
+            return await purchase_manager.create_confirmation_request(
+                session, purchase_id, test_seller_id
+            )
+
+    results = await asyncio.gather(*[confirm() for _ in range(10)], return_exceptions=True)
+    confirmed = [result for result in results if not isinstance(result, BaseException)]
+    errors = [result for result in results if isinstance(result, BaseException)]
+
+    assert len(confirmed) == 1
+    assert confirmed[0].status == "review" and confirmed[0].version == version + 1
+    assert all(isinstance(error, HTTPException) and error.status_code == 403 for error in errors)
+
+    async with async_session() as session:
+        try:
+            await purchase_manager.create_confirmation_request(
+                session, purchase_id, test_seller_id, expected_version=version
+            )
+        except HTTPException as e:
+            assert e.status_code == 409
+        else:
+            assert False
+
+
+async def test_confirm_purchase_after_offer_deleted():
+    offer_id = await __create_test_offer(is_autogive_enabled=False)
+    buyer_id = test_buyer_ids[0]
+    async with async_session() as session:
+        purchase = await purchase_manager.create_purchase(
+            session, buyer_id, PurchaseCreate(offer_id=offer_id, count=1)
+        )
+        await purchase_manager.create_confirmation_request(session, purchase.id, test_seller_id)
+        assert await delete_offer(session, test_seller_id, offer_id)
+
+    # offer_id стал NULL, покупатель всё равно может подтвердить, продажа видна продавцу
+    async with async_session() as session:
+        completed = await purchase_manager.change_confirmation_request_status(
+            session, purchase.id, buyer_id, purchase_completed=True
+        )
+        assert completed.status == "completed" and completed.offer_id is None
+
+        sale = await purchase_manager.get_sale(session, purchase.id, test_seller_id)
+        assert sale is not None and sale.seller_id == test_seller_id
+
+
+async def test_review_updates_rating_aggregates():
+    async with async_session() as session:
+        stmt = (
+            select(Purchase.id, Purchase.buyer_id, Purchase.offer_id)
+            .join(Offer, Offer.id == Purchase.offer_id)
+            .where(Offer.user_id == test_seller_id)
+            .where(Purchase.status == "review")
+            .limit(1)
+        )
+        purchase_id, buyer_id, offer_id = (await session.execute(stmt)).one()
+        offer_before = (await session.execute(
+            select(Offer.rating_sum, Offer.rating_count).where(Offer.id == offer_id)
+        )).one()
+        seller_before = (await session.execute(
+            select(User.rating_sum, User.rating_count).where(User.id == test_seller_id)
+        )).one()
+
+        await purchase_manager.change_confirmation_request_status(
+            session, purchase_id, buyer_id, purchase_completed=True
+        )
+        await purchase_manager.create_review(
+            buyer_id, ReviewCreate(purchase_id=purchase_id, rating=4), session
+        )
+
+        with pytest.raises(HTTPException):
+            await purchase_manager.create_review(
+                buyer_id, ReviewCreate(purchase_id=purchase_id, rating=5), session
+            )
+
+    async with async_session() as session:
+        offer_after = (await session.execute(
+            select(Offer.rating_sum, Offer.rating_count).where(Offer.id == offer_id)
+        )).one()
+        seller_after = (await session.execute(
+            select(User.rating_sum, User.rating_count).where(User.id == test_seller_id)
+        )).one()
+
+    assert tuple(offer_after) == (offer_before[0] + 4, offer_before[1] + 1)
+    assert tuple(seller_after) == (seller_before[0] + 4, seller_before[1] + 1)
+
+
+async def test_review_without_offer_keeps_seller_rating():
+    async with async_session() as session:
+        stmt = select(Review).where(Review.seller_id == test_seller_id).limit(1)
+        review = (await session.execute(stmt)).scalar_one()
+        seller_before = (await session.execute(
+            select(User.rating_sum, User.rating_count).where(User.id == test_seller_id)
+        )).one()
+
+        # Оффер удалён (offer_id -> NULL), отзыв всё равно снимается с рейтинга продавца
+        await session.execute(
+            update(Review).where(Review.purchase_id == review.purchase_id).values(offer_id=None)
+        )
+        await session.execute(delete(Review).where(Review.purchase_id == review.purchase_id))
+        await session.commit()
+
+        seller_after = (await session.execute(
+            select(User.rating_sum, User.rating_count).where(User.id == test_seller_id)
+        )).one()
+
+    assert tuple(seller_after) == (seller_before[0] - review.rating, seller_before[1] - 1)
+
+
+async def test_complete_expired_reviews():
+    async with async_session() as session:
+        stmt = select(func.count()).select_from(Purchase).where(Purchase.status == "review")
+        review_count = (await session.execute(stmt)).scalar_one()
+
+        deadline = int(time.time()) + 1
+        completed = await purchase_manager.complete_expired_reviews(session, deadline, 1000)
+        assert completed == review_count
+        assert (await session.execute(stmt)).scalar_one() == 0
+
+    while await purchase_outbox_dispatcher.dispatch_batch():
+        pass
+
+
+async def test_idempotent_purchase_create():
+    offer_id = await __create_test_offer(is_autogive_enabled=False)
+    buyer_id = test_buyer_ids[0]
+    key = f"idempotency:test:{buyer_id}:{time.time_ns()}"
+    calls = 0
+
+    def create(count: int):
+        async def factory():
+            nonlocal calls
+            calls += 1
+            async with async_session() as session:
+                return await purchase_manager.create_purchase(
+                    session, buyer_id, PurchaseCreate(offer_id=offer_id, count=count)
+                )
+        return factory
+
+    purchase_data = PurchaseCreate(offer_id=offer_id, count=1)
+    fingerprint = idempotency.fingerprint(purchase_data)
+    results = await asyncio.gather(
+        *[idempotency.run_once(key, fingerprint, create(1), ttl=60) for _ in range(5)],
+        return_exceptions=True,
+    )
+    responses = [result for result in results if not isinstance(result, BaseException)]
+    errors = [result for result in results if isinstance(result, BaseException)]
+
+    assert calls == 1
+    assert all(isinstance(error, HTTPException) and error.status_code == 409 for error in errors)
+
+    retried = await idempotency.run_once(key, fingerprint, create(1), ttl=60)
+    assert calls == 1
+    assert all(response["id"] == retried["id"] for response in responses)
+
+    with pytest.raises(HTTPException) as e:
+        await idempotency.run_once(
+            key, idempotency.fingerprint(PurchaseCreate(offer_id=offer_id, count=2)), create(2), ttl=60
+        )
+    assert e.value.status_code == 422
+    assert calls == 1
+
+    async with async_session() as session:
+        stmt = select(func.count()).select_from(Purchase).where(Purchase.offer_id == offer_id)
+        assert (await session.execute(stmt)).scalar_one() == 1
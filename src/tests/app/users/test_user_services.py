@@ -8,6 +8,8 @@ from app.users.models import User
 from app.users.schemas.users_online import *
 from app.users.schemas.users import *
 
+from core.redis import get_redis_client
+
 
 test_password = "12341234"
 test_email = "kropkaalutiytest@gmail.com"
@@ -104,3 +106,49 @@ async def test_user_get_role_id():
 async def test_delete_user():
     async with async_session() as session:
         await delete_user(db_session=session, email=second_test_email)
+
+
+async def test_online_connections_counter():
+    user_id, key = 10**6, f"online_connections:{10**6}"
+    async with get_redis_client() as redis_client:
+        await redis_client.delete(key)
+        await redis_client.srem("online_users", user_id)
+
+        # Онлайн меняется только на первом и последнем соединении, в любом процессе
+        args = ["worker1", user_id]
+        assert await connect_script(keys=[key, "online_users"], args=args) == 1
+        assert await connect_script(keys=[key, "online_users"], args=["worker2", user_id]) == 0
+        assert await disconnect_script(keys=[key, "online_users"], args=args) == 0
+        assert await disconnect_script(keys=[key, "online_users"], args=["worker2", user_id]) == 1
+        assert not await redis_client.exists(key)
+        assert not await redis_client.sismember("online_users", user_id)
+
+
+async def test_online_sweep_dead_workers():
+    manager = OnlineConnectionManager()
+    assert OnlineConnectionManager().worker_id != manager.worker_id
+    alive_user_id, dead_user_id = 10**6 + 1, 10**6 + 2
+    async with get_redis_client() as redis_client:
+        await redis_client.delete("online_sweep_lock")
+        await redis_client.set(f"online_worker:{manager.worker_id}", 1, ex=30)
+        await connect_script(
+            keys=[f"online_connections:{alive_user_id}", "online_users"],
+            args=[manager.worker_id, alive_user_id],
+        )
+        # Процесс dead_worker упал, его ключ online_worker истёк
+        await connect_script(
+            keys=[f"online_connections:{dead_user_id}", "online_users"],
+            args=["dead_worker", dead_user_id],
+        )
+
+        offline_ids = await manager.sweep_dead_workers()
+        assert dead_user_id in offline_ids and alive_user_id not in offline_ids
+        assert await redis_client.sismember("online_users", alive_user_id)
+        assert not await redis_client.sismember("online_users", dead_user_id)
+        # Проверку за интервал делает один процесс
+        assert await manager.sweep_dead_workers() == []
+
+        await disconnect_script(
+            keys=[f"online_connections:{alive_user_id}", "online_users"],
+            args=[manager.worker_id, alive_user_id],
+        )
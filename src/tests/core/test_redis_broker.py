@@ -0,0 +1,42 @@
+import asyncio
+
+from core.redis.broker import RedisBroker
+
+
+async def test_broker_local_delivery_without_redis():
+    broker = RedisBroker()
+    received = []
+
+    async def handler(data: bytes):
+        received.append(data)
+
+    await broker.subscribe("test:local", handler)
+    await broker.publish("test:local", "hello")
+    await broker.publish("test:other", "ignored")
+
+    assert received == [b"hello"]
+
+
+async def test_broker_pubsub_between_instances():
+    # Два broker - как два процесса: публикует один, доставляет подписанный
+    publisher, subscriber = RedisBroker(), RedisBroker()
+    await publisher.start()
+    await subscriber.start()
+    received = asyncio.Queue()
+
+    try:
+        await subscriber.subscribe("test:pubsub", received.put)
+        # Подписка применяется асинхронно
+        await asyncio.sleep(0.2)
+        await publisher.publish("test:pubsub", '{"id": 1}')
+
+        assert await asyncio.wait_for(received.get(), 2) == b'{"id": 1}'
+
+        await subscriber.unsubscribe("test:pubsub")
+        await asyncio.sleep(0.2)
+        await publisher.publish("test:pubsub", "after")
+        await asyncio.sleep(0.2)
+        assert received.empty()
+    finally:
+        await publisher.close()
+        await subscriber.close()
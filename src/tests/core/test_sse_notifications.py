@@ -0,0 +1,20 @@
+import asyncio
+
+from core.sse.manager import BaseNotificationManager
+
+
+async def test_notifications_published_through_broker():
+    manager = BaseNotificationManager()
+    await manager.add_user(1)
+    [listener_uuid] = manager.sse_managers[1].listeners
+    listener = manager.sse_managers[1].get_listener(listener_uuid)
+
+    # Событие публикуется в канал пользователя, а не в локальный sse_managers
+    await manager.publish([1, 2], event="new_purchase", data="{}")
+
+    events = []
+    while not any("event: new_purchase" in event for event in events):
+        events.append(await asyncio.wait_for(listener.get_event(), 1))
+
+    await manager.remove_listener(1, listener_uuid)
+    assert 1 not in manager.sse_managers
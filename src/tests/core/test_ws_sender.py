@@ -0,0 +1,64 @@
+import asyncio
+
+from fastapi import status
+
+from core.ws import WsSender
+
+
+class FakeWebSocket:
+    def __init__(self, delay: float = 0) -> None:
+        self.delay = delay
+        self.sent = []
+        self.close_code = None
+
+    async def send_text(self, data: str):
+        await asyncio.sleep(self.delay)
+        self.sent.append(data)
+
+    async def close(self, code: int, reason: str | None = None):
+        self.close_code = code
+
+
+class FastSender(WsSender):
+    max_queue_size = 3
+    send_timeout = 0.1
+
+
+async def test_ws_sender_keeps_order():
+    websocket = FakeWebSocket()
+    sender = FastSender(websocket)
+    for i in range(3):
+        assert sender.send(str(i))
+
+    await asyncio.sleep(0.05)
+    assert websocket.sent == ["0", "1", "2"]
+    assert websocket.close_code is None
+    sender.close()
+
+
+async def test_ws_sender_slow_socket_does_not_block_others():
+    slow, fast = FakeWebSocket(delay=1), FakeWebSocket()
+    slow_sender, fast_sender = FastSender(slow), FastSender(fast)
+
+    started_at = asyncio.get_running_loop().time()
+    results = [slow_sender.send(str(i)) for i in range(5)]
+    fast_sender.send("fast")
+    assert asyncio.get_running_loop().time() - started_at < 0.05
+
+    # Очередь медленного сокета переполнена - он закрывается, быстрый получает сообщение
+    assert results[-1] is False
+    await asyncio.sleep(0.05)
+    assert fast.sent == ["fast"]
+    assert slow.close_code == status.WS_1013_TRY_AGAIN_LATER
+    assert not slow_sender.send("after close")
+    fast_sender.close()
+
+
+async def test_ws_sender_send_timeout():
+    websocket = FakeWebSocket(delay=1)
+    sender = FastSender(websocket)
+    assert sender.send("slow")
+
+    await asyncio.sleep(0.2)
+    assert websocket.close_code == status.WS_1013_TRY_AGAIN_LATER
+    assert websocket.sent == []